@@ -0,0 +1 @@
+"""Бенчмарки архивации и хеширования."""
@@ -0,0 +1,89 @@
+"""
+Бенчмарк Database: операций в секунду для add_file_record, add_file_records и is_file_uploaded.
+
+Сравнивает постоянное соединение потока (WAL, synchronous=NORMAL) с прежним
+поведением - новое соединение на каждый вызов, журнал DELETE, synchronous=FULL.
+
+Пример:
+    python benchmarks/bench_database.py --dir /var/tmp --records 2000 --lookups 20000
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.core.database import Database  # noqa: E402
+from src.models import FileRecord  # noqa: E402
+
+
+class _PerCallDatabase(Database):
+    """Прежнее поведение: соединение открывается на каждый вызов."""
+
+    def _get_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=DELETE")
+        return conn
+
+
+def _measure(db: Database, records: int, lookups: int) -> dict[str, float]:
+    """Операций в секунду для каждой операции."""
+    targets = ["target-a", "target-b"]
+    start = time.perf_counter()
+    for i in range(records):
+        db.add_file_record(FileRecord(
+            backup_point_id="point", file_path=f"/backup/archive_{i}.zip", file_hash=f"{i:064x}",
+            file_size=i, hash_algorithm="sha256", targets=targets,
+        ))
+    add_rate = records / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    db.add_file_records([
+        FileRecord(
+            backup_point_id="point", file_path=f"/backup/batch_{i}.zip", file_hash=f"{records + i:064x}",
+            file_size=i, hash_algorithm="sha256", targets=targets,
+        ) for i in range(records)
+    ])
+    batch_rate = records / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(lookups):
+        db.is_file_uploaded(f"{i % (records * 4):064x}", targets[i % 2], "sha256")
+    lookup_rate = lookups / (time.perf_counter() - start)
+    return {"add_file_record": add_rate, "add_file_records": batch_rate, "is_file_uploaded": lookup_rate}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Рабочая папка (диск, который проверяем)")
+    parser.add_argument("--records", type=int, default=2000, help="Число add_file_record")
+    parser.add_argument("--lookups", type=int, default=20000, help="Число is_file_uploaded")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_db_", dir=args.dir)
+    try:
+        before_db = _PerCallDatabase(os.path.join(work_dir, "per_call.db"))
+        before = _measure(before_db, args.records, args.lookups)
+        after_db = Database(os.path.join(work_dir, "pooled.db"))
+        after = _measure(after_db, args.records, args.lookups)
+        after_db.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'operation':<18} {'per-call ops/s':>15} {'pooled ops/s':>14} {'speedup':>9}")
+    for operation in before:
+        print(
+            f"{operation:<18} {before[operation]:>15.0f} {after[operation]:>14.0f} "
+            f"{after[operation] / before[operation]:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
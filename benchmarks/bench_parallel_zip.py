@@ -0,0 +1,115 @@
+"""
+Проверка параллельного ZIP на множестве мелких файлов разного размера.
+
+Параллельный режим не должен быть медленнее последовательного: раньше
+каждый новый размер файла стоил склейки CRC на Python в главном процессе.
+Архивы обоих режимов проверяются на целостность (CRC каждого файла),
+включая файл из нескольких блоков параллельного сжатия. Код выхода 1 -
+параллельный режим медленнее допустимого или архив поврежден.
+
+Пример:
+    python benchmarks/bench_parallel_zip.py --files 3000 --workers 2
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.trees import FILES_PER_DIR, _WORDS  # noqa: E402
+from src.core.archive_utils import ArchiveUtils  # noqa: E402
+
+
+def _make_tree(root: str, count: int, seed: int):
+    """
+    Мелкие текстовые файлы: у каждого свой размер.
+
+    Размеры от 8 KB, чтобы сжимаемых данных хватило на параллельный режим
+    (ArchiveUtils.PARALLEL_MIN_BYTES) уже на 3000 файлах.
+    """
+    rng = random.Random(seed)
+    for i in range(count):
+        directory = Path(root, f"d{i // FILES_PER_DIR:04d}")
+        directory.mkdir(parents=True, exist_ok=True)
+        size = 8 * 1024 + i
+        text = " ".join(rng.choice(_WORDS) for _ in range(size // 3)).encode()
+        (directory / f"f{i:06d}.txt").write_bytes(text[:size])
+
+
+def _check_archive(path: str, expected_files: int) -> str | None:
+    """Текст ошибки, если архив поврежден или неполон."""
+    with zipfile.ZipFile(path) as zf:
+        bad = zf.testzip()
+        if bad is not None:
+            return f"{os.path.basename(path)}: неверный CRC у {bad}"
+        if len(zf.infolist()) != expected_files:
+            return f"{os.path.basename(path)}: файлов {len(zf.infolist())} из {expected_files}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Рабочая папка")
+    parser.add_argument("--files", type=int, default=3000, help="Число мелких файлов")
+    parser.add_argument("--workers", type=int, default=2, help="Число процессов параллельного режима")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="Допустимое замедление параллельного режима (по умолчанию 0.1, а если ядер меньше "
+                             "--workers - 0.5: процессы делят ядро и платят за запуск пула)")
+    args = parser.parse_args()
+    if args.threshold is None:
+        args.threshold = 0.1 if (os.cpu_count() or 1) >= args.workers else 0.5
+
+    work_dir = tempfile.mkdtemp(prefix="bench_parallel_zip_", dir=args.dir)
+    failed = False
+    try:
+        tree = os.path.join(work_dir, "tree")
+        _make_tree(tree, args.files, args.seed)
+
+        print(f"{'mode':<12} {'files':>7} {'seconds':>9}")
+        # Замер в этом же процессе: пул стартует так же, как в приложении
+        # (в процессе, запущенном через spawn, и пул запускался бы через spawn)
+        wall = {}
+        for mode, workers in (("serial", 1), ("parallel", args.workers)):
+            output = os.path.join(work_dir, f"{mode}.zip")
+            start = time.perf_counter()
+            ArchiveUtils.create_zip_archive(tree, output, workers=workers)
+            wall[mode] = time.perf_counter() - start
+            print(f"{mode:<12} {args.files:>7} {wall[mode]:>9.2f}")
+            error = _check_archive(output, args.files)
+            if error:
+                print(f"  {error}")
+                failed = True
+
+        if wall["parallel"] > wall["serial"] * (1 + args.threshold):
+            print(f"Параллельный режим медленнее последовательного в {wall['parallel'] / wall['serial']:.1f} раза")
+            failed = True
+
+        # Файл из нескольких блоков: CRC склеивается из CRC блоков
+        big = os.path.join(work_dir, "big")
+        os.makedirs(big)
+        block = os.urandom(1024 * 1024)
+        with open(os.path.join(big, "big.bin"), "wb") as f:
+            for i in range(ArchiveUtils.PARALLEL_BLOCK_SIZE * 5 // 2 // len(block)):
+                f.write(i.to_bytes(8, "little") + block[8:])
+        output = os.path.join(work_dir, "big.zip")
+        ArchiveUtils.create_zip_archive(big, output, workers=args.workers)
+        error = _check_archive(output, 1)
+        print(f"{'multi-block':<12} {1:>7} {'ok' if error is None else error:>9}")
+        failed |= error is not None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Бенчмарк split_file / merge_files: пропускная способность и пиковая память.
+
+Каждая операция выполняется в отдельном процессе, чтобы пиковая память
+отражала только ее. По умолчанию входной файл - 4 GB, части по 2 GB
+(лимит Telegram).
+
+Пример:
+    python benchmarks/bench_split.py --dir /var/tmp --size 4096 --part 2048
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import peak_rss_bytes  # noqa: E402
+from src.core.archive_utils import ArchiveUtils  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def _make_file(path: str, size_mb: int):
+    """Создать файл заданного размера из повторяющегося случайного блока (не разреженный)."""
+    block = os.urandom(MB)
+    with open(path, "wb") as f:
+        for i in range(size_mb):
+            # Меняем начало блока, чтобы части не дедуплицировались файловой системой
+            f.write(i.to_bytes(8, "little") + block[8:])
+
+
+def _max_rss_mb() -> float:
+    """Пиковая память текущего процесса, MB."""
+    return peak_rss_bytes() / MB
+
+
+def _run(operation: str, source: str, work_dir: str, part_size: int, queue):
+    """Выполнить операцию в дочернем процессе и вернуть (время, пиковая память)."""
+    baseline = _max_rss_mb()
+    start = time.perf_counter()
+    if operation == "split":
+        ArchiveUtils.split_file(source, os.path.join(work_dir, "split"), part_size)
+    elif operation == "split_nohash":
+        ArchiveUtils.split_file(source, os.path.join(work_dir, "split_nohash"), part_size, compute_hashes=False)
+    elif operation == "merge":
+        parts = sorted(str(p) for p in Path(work_dir, "split").iterdir())
+        ArchiveUtils.merge_files(parts, os.path.join(work_dir, "merged.bin"))
+    elif operation == "hash":
+        ArchiveUtils.calculate_file_hash(source)
+    queue.put((time.perf_counter() - start, _max_rss_mb(), baseline))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Рабочая папка")
+    parser.add_argument("--size", type=int, default=4096, help="Размер входного файла, MB")
+    parser.add_argument("--part", type=int, default=2048, help="Размер части, MB")
+    parser.add_argument("--max-rss", type=float, default=64.0, help="Допустимый прирост пиковой памяти, MB")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_split_", dir=args.dir)
+    source = os.path.join(work_dir, "source.bin")
+    failed = False
+    try:
+        _make_file(source, args.size)
+        context = multiprocessing.get_context("spawn")
+
+        print(f"{'operation':<14} {'seconds':>9} {'MB/s':>9} {'peak RSS':>10} {'growth':>9}")
+        for operation in ("hash", "split", "split_nohash", "merge"):
+            queue = context.Queue()
+            process = context.Process(target=_run, args=(operation, source, work_dir, args.part * MB, queue))
+            process.start()
+            elapsed, peak, baseline = queue.get()
+            process.join()
+
+            growth = peak - baseline
+            failed |= growth > args.max_rss
+            print(
+                f"{operation:<14} {elapsed:>9.2f} {args.size / elapsed:>9.0f} "
+                f"{peak:>8.1f}MB {growth:>7.1f}MB"
+            )
+
+        merged = os.path.join(work_dir, "merged.bin")
+        if ArchiveUtils.calculate_file_hash(merged) != ArchiveUtils.calculate_file_hash(source):
+            print("ОШИБКА: собранный файл не совпадает с исходным")
+            failed = True
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Замеры времени, CPU, памяти и ввода-вывода для бенчмарков."""
+
+import multiprocessing
+import queue as queue_module
+import resource
+import sys
+import time
+from typing import Any, Callable
+
+
+def peak_rss_bytes(who: int = resource.RUSAGE_SELF) -> int:
+    """
+    Пиковая память процесса.
+
+    На Linux для текущего процесса берется VmHWM: ru_maxrss переживает exec
+    и после spawn содержит пик родителя, а не дочернего процесса.
+    """
+    if who == resource.RUSAGE_SELF:
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    rss = resource.getrusage(who).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def cpu_seconds() -> float:
+    """Процессорное время текущего процесса и завершенных дочерних (пулы сжатия)."""
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def io_counters() -> dict[str, int] | None:
+    """Байты, прочитанные и записанные системными вызовами (/proc/self/io, только Linux)."""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+    except OSError:
+        return None
+    return {"read": int(fields["rchar"]), "written": int(fields["wchar"])}
+
+
+def _measure_child(func: Callable, args: tuple, queue):
+    """Выполнить функцию и отправить замеры родителю (в дочернем процессе)."""
+    try:
+        io_before = io_counters()
+        cpu_before = cpu_seconds()
+        start = time.perf_counter()
+        func(*args)
+        wall = time.perf_counter() - start
+        cpu = cpu_seconds() - cpu_before
+        io_after = io_counters()
+        queue.put({
+            "wall": wall,
+            "cpu": cpu,
+            "peak_rss": max(peak_rss_bytes(), peak_rss_bytes(resource.RUSAGE_CHILDREN)),
+            "read_bytes": io_after["read"] - io_before["read"] if io_before else None,
+            "written_bytes": io_after["written"] - io_before["written"] if io_before else None,
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_measured(func: Callable, *args) -> dict[str, Any]:
+    """
+    Выполнить функцию в отдельном процессе и вернуть замеры.
+
+    Отдельный процесс нужен, чтобы пиковая память относилась только к
+    замеряемой операции. Функция должна быть объявлена на уровне модуля.
+
+    Returns:
+        wall, cpu (секунды), peak_rss, read_bytes, written_bytes (байты) или error
+    """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure_child, args=(func, args, queue))
+    process.start()
+    try:
+        while True:
+            try:
+                return queue.get(timeout=1)
+            except queue_module.Empty:
+                # Процесс упал, не успев отправить результат (например, OOM killer)
+                if not process.is_alive():
+                    return {"error": f"Процесс завершился с кодом {process.exitcode}"}
+    finally:
+        process.join()
@@ -0,0 +1,188 @@
+"""
+Бенчмарк ArchiveUtils на синтетических деревьях с сравнением с базовой линией.
+
+Пример быстрого прогона и сохранения базовой линии:
+    python benchmarks/run.py --scale 0.01 --output baseline.json
+
+Сравнение нового прогона с базовой линией (код выхода 1 при регрессии):
+    python benchmarks/run.py --scale 0.01 --output current.json --baseline baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import run_measured  # noqa: E402
+from benchmarks.trees import TREE_SHAPES, generate_tree, tree_size  # noqa: E402
+from src.core.archive_utils import ArchiveUtils  # noqa: E402
+
+MB = 1024 * 1024
+COMPARED_METRICS = ("wall", "cpu", "peak_rss")
+
+
+# Операции объявлены на уровне модуля - их выполняет дочерний процесс
+
+def op_directory_size(tree: str, work_dir: str, part_size: int):
+    ArchiveUtils.get_directory_size(tree)
+
+
+def op_zip(tree: str, work_dir: str, part_size: int):
+    ArchiveUtils.create_zip_archive(tree, os.path.join(work_dir, "archive.zip"))
+
+
+def op_zip_parallel(tree: str, work_dir: str, part_size: int):
+    ArchiveUtils.create_zip_archive(tree, os.path.join(work_dir, "archive_parallel.zip"), workers=None)
+
+
+def op_split_zip(tree: str, work_dir: str, part_size: int):
+    ArchiveUtils.create_split_zip_archive(tree, os.path.join(work_dir, "split_zip"), part_size)
+
+
+def op_hash(tree: str, work_dir: str, part_size: int):
+    ArchiveUtils.calculate_file_hash(os.path.join(work_dir, "archive.zip"))
+
+
+def op_split_file(tree: str, work_dir: str, part_size: int):
+    ArchiveUtils.split_file(os.path.join(work_dir, "archive.zip"), os.path.join(work_dir, "split_file"), part_size)
+
+
+def op_merge(tree: str, work_dir: str, part_size: int):
+    parts = sorted(str(p) for p in Path(work_dir, "split_file").iterdir())
+    ArchiveUtils.merge_files(parts, os.path.join(work_dir, "merged.zip"))
+
+
+# Порядок важен: hash, split_file и merge работают с архивом из op_zip
+OPERATIONS = {
+    "get_directory_size": op_directory_size,
+    "create_zip_archive": op_zip,
+    "create_zip_archive[parallel]": op_zip_parallel,
+    "create_split_zip_archive": op_split_zip,
+    "calculate_file_hash": op_hash,
+    "split_file": op_split_file,
+    "merge_files": op_merge,
+}
+
+
+def run_benchmarks(args) -> dict:
+    """Прогнать выбранные операции на выбранных деревьях."""
+    results = []
+    for shape_name in args.shape or list(TREE_SHAPES):
+        shape = TREE_SHAPES[shape_name].scaled(args.scale)
+        print(f"== {shape.name}: {shape.total_files} файлов, {ArchiveUtils.format_size(shape.total_bytes)}", flush=True)
+        tree = generate_tree(shape, args.trees_dir, args.seed)
+        assert tree_size(tree) == shape.total_bytes, "Дерево сгенерировано не полностью"
+
+        work_dir = tempfile.mkdtemp(prefix=f"bench_{shape.name}_", dir=args.work_dir)
+        try:
+            for op_name in args.operation or list(OPERATIONS):
+                measured = run_measured(OPERATIONS[op_name], tree, work_dir, args.part_size * MB)
+                measured.update(shape=shape.name, operation=op_name, files=shape.total_files, bytes=shape.total_bytes)
+                results.append(measured)
+                _print_result(measured)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "scale": args.scale,
+            "seed": args.seed,
+            "part_size": args.part_size * MB,
+        },
+        "results": results,
+    }
+
+
+def _print_result(result: dict):
+    if "error" in result:
+        print(f"  {result['operation']:<30} ОШИБКА: {result['error']}")
+        return
+    io_info = ""
+    if result["read_bytes"] is not None:
+        io_info = (
+            f" read {ArchiveUtils.format_size(result['read_bytes'])}"
+            f" written {ArchiveUtils.format_size(result['written_bytes'])}"
+        )
+    print(
+        f"  {result['operation']:<30} wall {result['wall']:8.2f}s cpu {result['cpu']:8.2f}s"
+        f" rss {ArchiveUtils.format_size(result['peak_rss']):>10}{io_info}",
+        flush=True,
+    )
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """
+    Сравнить прогон с базовой линией.
+
+    Args:
+        current: Текущие результаты
+        baseline: Базовая линия
+        threshold: Допустимое ухудшение, доля (0.1 = 10%)
+
+    Returns:
+        True если есть регрессии
+    """
+    if current["meta"]["scale"] != baseline["meta"]["scale"]:
+        print("Внимание: масштаб деревьев отличается от базовой линии")
+
+    base = {(r["shape"], r["operation"]): r for r in baseline["results"] if "error" not in r}
+    regressed = False
+    print(f"\n{'shape':<16} {'operation':<30} " + " ".join(f"{m:>10}" for m in COMPARED_METRICS))
+    for result in current["results"]:
+        old = base.get((result["shape"], result["operation"]))
+        if old is None or "error" in result:
+            continue
+        cells = []
+        for metric in COMPARED_METRICS:
+            delta = (result[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            mark = "!" if delta > threshold else " "
+            regressed |= delta > threshold
+            cells.append(f"{delta:+9.1%}{mark}")
+        print(f"{result['shape']:<16} {result['operation']:<30} " + " ".join(cells))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shape", action="append", choices=list(TREE_SHAPES), help="Форма дерева (можно несколько)")
+    parser.add_argument("--operation", action="append", choices=list(OPERATIONS), help="Операция (можно несколько)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Масштаб деревьев (0.01 - быстрый прогон)")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора деревьев")
+    parser.add_argument("--part-size", type=int, default=512, help="Размер части для split операций, MB")
+    parser.add_argument("--trees-dir", default=os.path.join(tempfile.gettempdir(), "backuper_bench_trees"),
+                        help="Кэш сгенерированных деревьев")
+    parser.add_argument("--work-dir", default=None, help="Папка для архивов (по умолчанию временная)")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    parser.add_argument("--baseline", help="JSON базовой линии для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Допустимое ухудшение (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    current = run_benchmarks(args)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(current, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nРезультаты сохранены: {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if compare(current, baseline, args.threshold):
+            print("\nЕсть регрессии (отмечены '!')")
+            sys.exit(1)
+
+    if any("error" in result for result in current["results"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
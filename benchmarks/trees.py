@@ -0,0 +1,151 @@
+"""Детерминированные синтетические деревья файлов для бенчмарков."""
+
+import json
+import os
+import random
+import shutil
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+MB = 1024 * 1024
+FILES_PER_DIR = 1000
+
+_WORDS = (
+    "INFO WARN ERROR DEBUG request response user session backup archive upload part "
+    "timeout retry connection telegram s3 ftp ssh drive local hash size bytes ok failed"
+).split()
+
+
+@dataclass
+class FileGroup:
+    """Группа одинаковых по размеру и содержимому файлов."""
+
+    count: int
+    size: int
+    content: str  # random | text | mixed
+
+
+@dataclass
+class TreeShape:
+    """Форма дерева: набор групп файлов."""
+
+    name: str
+    description: str
+    groups: list[FileGroup]
+
+    def scaled(self, scale: float) -> "TreeShape":
+        """
+        Уменьшить дерево для быстрых прогонов.
+
+        Многочисленные группы (от 100 файлов) уменьшаются по числу файлов,
+        малочисленные - по размеру, чтобы форма дерева сохранялась.
+        """
+        groups = []
+        for group in self.groups:
+            if group.count >= 100:
+                groups.append(FileGroup(max(1, round(group.count * scale)), group.size, group.content))
+            else:
+                groups.append(FileGroup(group.count, max(1, round(group.size * scale)), group.content))
+        return TreeShape(self.name, self.description, groups)
+
+    @property
+    def total_files(self) -> int:
+        return sum(group.count for group in self.groups)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(group.count * group.size for group in self.groups)
+
+
+TREE_SHAPES = {
+    shape.name: shape for shape in [
+        TreeShape("tiny", "1M файлов по 100 байт", [FileGroup(1_000_000, 100, "text")]),
+        TreeShape("medium", "10k файлов по 1 MB", [FileGroup(10_000, MB, "mixed")]),
+        TreeShape("huge", "3 файла по 10 GB", [FileGroup(3, 10 * 1024 * MB, "mixed")]),
+        TreeShape("incompressible", "1k файлов по 4 MB случайных данных", [FileGroup(1_000, 4 * MB, "random")]),
+        TreeShape("compressible", "1k текстовых файлов по 4 MB", [FileGroup(1_000, 4 * MB, "text")]),
+        TreeShape("mixed", "Смесь мелких, средних, сжимаемых и несжимаемых файлов", [
+            FileGroup(100_000, 2 * 1024, "text"),
+            FileGroup(2_000, MB, "text"),
+            FileGroup(500, 4 * MB, "random"),
+            FileGroup(2, 2 * 1024 * MB, "mixed"),
+        ]),
+    ]
+}
+
+
+def _text_block(rng: random.Random, size: int) -> bytes:
+    """Блок, похожий на лог: хорошо сжимается, но не тривиально."""
+    lines = []
+    length = 0
+    while length < size:
+        line = f"{rng.randrange(10**9):09d} " + " ".join(rng.choice(_WORDS) for _ in range(rng.randrange(4, 12)))
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines).encode()[:size]
+
+
+def _write_file(path: Path, size: int, content: str, rng: random.Random, text_pool: list[bytes]):
+    """Записать файл блоками по 1 MB."""
+    with open(path, "wb") as f:
+        written = 0
+        block_index = 0
+        while written < size:
+            length = min(MB, size - written)
+            use_random = content == "random" or (content == "mixed" and block_index % 2)
+            if use_random:
+                f.write(rng.randbytes(length))
+            else:
+                block = text_pool[rng.randrange(len(text_pool))]
+                f.write(block[:length])
+            written += length
+            block_index += 1
+
+
+def generate_tree(shape: TreeShape, root: str, seed: int = 42) -> str:
+    """
+    Сгенерировать дерево (или переиспользовать уже сгенерированное с той же формой).
+
+    Args:
+        shape: Форма дерева
+        root: Папка для деревьев
+        seed: Зерно генератора - одно и то же зерно дает побайтно одинаковое дерево
+
+    Returns:
+        Путь к корню дерева
+    """
+    tree_dir = Path(root) / f"{shape.name}-{shape.total_files}-{shape.total_bytes}"
+    marker = tree_dir / ".complete"
+    spec = json.dumps({"shape": asdict(shape), "seed": seed}, sort_keys=True)
+    if marker.exists() and marker.read_text() == spec:
+        return str(tree_dir / "data")
+
+    shutil.rmtree(tree_dir, ignore_errors=True)
+    data_dir = tree_dir / "data"
+    rng = random.Random(seed)
+    text_pool = [_text_block(rng, MB) for _ in range(8)]
+
+    index = 0
+    for group_number, group in enumerate(shape.groups):
+        extension = {"random": "bin", "text": "log", "mixed": "dat"}[group.content]
+        for _ in range(group.count):
+            file_dir = data_dir / f"g{group_number}" / f"d{index // FILES_PER_DIR:05d}"
+            if index % FILES_PER_DIR == 0 or not file_dir.exists():
+                file_dir.mkdir(parents=True, exist_ok=True)
+            if group.size <= 4096:
+                # Мелкие файлы - срез общего блока, без генерации на каждый файл
+                offset = rng.randrange(MB - group.size)
+                (file_dir / f"f{index:07d}.{extension}").write_bytes(text_pool[index % 8][offset:offset + group.size])
+            else:
+                _write_file(file_dir / f"f{index:07d}.{extension}", group.size, group.content, rng, text_pool)
+            index += 1
+
+    marker.write_text(spec)
+    return str(data_dir)
+
+
+def tree_size(path: str) -> int:
+    """Размер дерева на диске по os.walk (независимо от тестируемого кода)."""
+    return sum(
+        os.path.getsize(os.path.join(dirpath, name)) for dirpath, _, names in os.walk(path) for name in names
+    )
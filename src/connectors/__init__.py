@@ -1,7 +1,8 @@
 """Коннекторы для различных хранилищ."""
 
 from .base import BaseConnector
+from .factory import create_connector
 from .local import LocalConnector
 from .telegram import TelegramConnector
 
-__all__ = ["BaseConnector", "LocalConnector", "TelegramConnector"]
+__all__ = ["BaseConnector", "LocalConnector", "TelegramConnector", "create_connector"]
@@ -1,6 +1,7 @@
 """Базовый класс для всех коннекторов хранилищ."""
 
 from abc import ABC, abstractmethod
+from datetime import timedelta
 from typing import Any
 
 
@@ -8,6 +9,11 @@ class BaseConnector(ABC):
     """Базовый класс для коннекторов."""
 
     MAX_FILE_SIZE = None
+    MAX_PARALLEL_DOWNLOADS = 1  # Сколько частей можно скачивать одновременно
+    SUPPORTS_RANGE_READ = False  # Умеет ли read_range читать часть объекта без скачивания целиком
+    MAX_PARALLEL_DELETES = 1  # Сколько объектов можно удалять одновременно
+    SUPPORTS_DELETE = False  # Умеет ли delete_file удалять объекты
+    DELETE_MAX_AGE: timedelta | None = None  # Сколько после загрузки объект еще можно удалить (None - всегда)
 
     def __init__(self, config: dict[str, Any]):
         self.config = config
@@ -34,6 +40,48 @@ class BaseConnector(ABC):
     def upload_data(self, data: bytes, remote_name: str) -> tuple[bool, str]:
         pass
 
+    def download_to_file(self, remote_ref: str, file_path: str) -> tuple[bool, str]:
+        """
+        Скачать объект, загруженный upload_file, сразу на диск.
+
+        Args:
+            remote_ref: Ссылка, которую вернул upload_file
+            file_path: Локальный путь для сохранения
+
+        Returns:
+            (успех, путь к файлу или текст ошибки)
+        """
+        return False, "Скачивание не поддерживается"
+
+    def read_range(self, remote_ref: str, offset: int, length: int) -> tuple[bool, bytes | str]:
+        """
+        Прочитать диапазон байт объекта, загруженного upload_file.
+
+        Args:
+            remote_ref: Ссылка, которую вернул upload_file
+            offset: Смещение от начала объекта
+            length: Число байт (у конца объекта может вернуться меньше)
+
+        Returns:
+            (успех, данные или текст ошибки)
+        """
+        return False, "Чтение диапазона не поддерживается"
+
+    def delete_file(self, remote_ref: str) -> tuple[bool, str]:
+        """
+        Удалить объект, загруженный upload_file.
+
+        Args:
+            remote_ref: Ссылка, которую вернул upload_file
+
+        Returns:
+            (успех, ссылка или текст ошибки)
+        """
+        return False, "Удаление не поддерживается"
+
+    def close(self):
+        """Закрыть соединение, если коннектор его держит."""
+
     def get_max_file_size(self) -> int | None:
         return self.MAX_FILE_SIZE
 
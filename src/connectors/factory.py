@@ -0,0 +1,37 @@
+"""Создание коннекторов по настройкам подключения."""
+
+import importlib
+
+from ..models import ConnectionConfig, ConnectionType
+from .base import BaseConnector
+
+# Модули импортируются при первом использовании: зависимости хранилищ,
+# которые не настроены, не нужны для работы остальных
+_CONNECTOR_CLASSES = {
+    ConnectionType.LOCAL: ("local", "LocalConnector"),
+    ConnectionType.TELEGRAM: ("telegram", "TelegramConnector"),
+    ConnectionType.FTP: ("ftp", "FTPConnector"),
+    ConnectionType.SSH: ("ssh", "SSHConnector"),
+    ConnectionType.S3: ("s3", "S3Connector"),
+    ConnectionType.R2: ("s3", "S3Connector"),
+    ConnectionType.GOOGLE_DRIVE: ("google_drive", "GoogleDriveConnector"),
+    ConnectionType.EMAIL: ("email", "EmailConnector"),
+}
+
+
+def create_connector(config: ConnectionConfig) -> BaseConnector | None:
+    """
+    Создать экземпляр коннектора для подключения.
+
+    Args:
+        config: Настройки подключения
+
+    Returns:
+        Коннектор или None для неизвестного типа
+    """
+    entry = _CONNECTOR_CLASSES.get(config.type)
+    if entry is None:
+        return None
+    module_name, class_name = entry
+    module = importlib.import_module(f".{module_name}", __package__)
+    return getattr(module, class_name)(config.config)
@@ -12,6 +12,7 @@ class FTPConnector(BaseConnector):
     """Коннектор для загрузки файлов по FTP."""
 
     MAX_FILE_SIZE = None
+    SUPPORTS_DELETE = True
 
     def __init__(self, config: dict[str, Any]):
         super().__init__(config)
@@ -92,6 +93,24 @@ class FTPConnector(BaseConnector):
         except Exception as e:
             return False, str(e)
 
+    def download_to_file(self, remote_ref: str, file_path: str) -> tuple[bool, str]:
+        """Скачать файл с FTP."""
+        try:
+            ftp = self._get_ftp_connection()
+            with open(file_path, "wb") as f:
+                ftp.retrbinary(f"RETR {remote_ref}", f.write)
+            return True, file_path
+        except Exception as e:
+            return False, str(e)
+
+    def delete_file(self, remote_ref: str) -> tuple[bool, str]:
+        """Удалить файл с FTP."""
+        try:
+            self._get_ftp_connection().delete(remote_ref)
+            return True, remote_ref
+        except Exception as e:
+            return False, str(e)
+
     def upload_data(self, data: bytes, remote_name: str) -> tuple[bool, str]:
         """Загрузить данные на FTP."""
         try:
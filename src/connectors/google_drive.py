@@ -7,7 +7,7 @@ from typing import Any
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 
 from .base import BaseConnector
 
@@ -16,6 +16,7 @@ class GoogleDriveConnector(BaseConnector):
     """Коннектор для Google Drive."""
 
     MAX_FILE_SIZE = 15 * 1024**3  # 15 GB per account
+    SUPPORTS_DELETE = True
 
     def __init__(self, config: dict[str, Any]):
         super().__init__(config)
@@ -76,6 +77,32 @@ class GoogleDriveConnector(BaseConnector):
         except Exception as e:
             return False, str(e)
 
+    def download_to_file(self, remote_ref: str, file_path: str) -> tuple[bool, str]:
+        """Скачать файл из Google Drive."""
+        try:
+            service = self._get_service()
+            request = service.files().get_media(fileId=remote_ref.removeprefix("file_"))
+            with open(file_path, "wb") as f:
+                downloader = MediaIoBaseDownload(f, request, chunksize=16 * 1024 * 1024)
+                done = False
+                while not done:
+                    _, done = downloader.next_chunk()
+            return True, file_path
+        except HttpError as e:
+            return False, f"Ошибка Google Drive: {e}"
+        except Exception as e:
+            return False, str(e)
+
+    def delete_file(self, remote_ref: str) -> tuple[bool, str]:
+        """Удалить файл из Google Drive."""
+        try:
+            self._get_service().files().delete(fileId=remote_ref.removeprefix("file_")).execute()
+            return True, remote_ref
+        except HttpError as e:
+            return False, f"Ошибка Google Drive: {e}"
+        except Exception as e:
+            return False, str(e)
+
     def upload_data(self, data: bytes, remote_name: str) -> tuple[bool, str]:
         """Загрузить данные в Google Drive."""
         try:
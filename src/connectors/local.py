@@ -12,6 +12,10 @@ class LocalConnector(BaseConnector):
     """Коннектор для копирования файлов в локальную папку."""
 
     MAX_FILE_SIZE = None  # Без ограничений
+    MAX_PARALLEL_DOWNLOADS = 4
+    SUPPORTS_RANGE_READ = True
+    MAX_PARALLEL_DELETES = 8
+    SUPPORTS_DELETE = True
 
     @property
     def name(self) -> str:
@@ -59,6 +63,31 @@ class LocalConnector(BaseConnector):
         except Exception as e:
             return False, str(e)
 
+    def download_to_file(self, remote_ref: str, file_path: str) -> tuple[bool, str]:
+        """Скопировать файл из целевой папки."""
+        try:
+            shutil.copyfile(remote_ref, file_path)
+            return True, file_path
+        except Exception as e:
+            return False, str(e)
+
+    def read_range(self, remote_ref: str, offset: int, length: int) -> tuple[bool, bytes | str]:
+        """Прочитать диапазон байт файла в целевой папке."""
+        try:
+            with open(remote_ref, "rb") as f:
+                f.seek(offset)
+                return True, f.read(length)
+        except Exception as e:
+            return False, str(e)
+
+    def delete_file(self, remote_ref: str) -> tuple[bool, str]:
+        """Удалить файл из целевой папки."""
+        try:
+            Path(remote_ref).unlink(missing_ok=True)
+            return True, remote_ref
+        except Exception as e:
+            return False, str(e)
+
     def upload_data(self, data: bytes, remote_name: str) -> tuple[bool, str]:
         """Записать данные в файл."""
         target_dir = self.config.get("local_path", "")
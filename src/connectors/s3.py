@@ -14,6 +14,10 @@ class S3Connector(BaseConnector):
     """Коннектор для S3-совместимых хранилищ (AWS S3, Cloudflare R2)."""
 
     MAX_FILE_SIZE = None  # Поддерживает multipart upload
+    MAX_PARALLEL_DOWNLOADS = 4
+    SUPPORTS_RANGE_READ = True
+    MAX_PARALLEL_DELETES = 16
+    SUPPORTS_DELETE = True
 
     def __init__(self, config: dict[str, Any]):
         super().__init__(config)
@@ -182,6 +186,39 @@ class S3Connector(BaseConnector):
         except Exception:
             return None
 
+    def download_to_file(self, remote_ref: str, file_path: str) -> tuple[bool, str]:
+        """Скачать объект на диск (boto3 качает большие объекты параллельными range-запросами)."""
+        try:
+            client = self._get_client()
+            bucket = self.config.get("bucket", "")
+            key = remote_ref.removeprefix(f"s3://{bucket}/")
+            client.download_file(bucket, key, file_path)
+            return True, file_path
+        except Exception as e:
+            return False, str(e)
+
+    def read_range(self, remote_ref: str, offset: int, length: int) -> tuple[bool, bytes | str]:
+        """Прочитать диапазон байт объекта (GET с заголовком Range)."""
+        try:
+            client = self._get_client()
+            bucket = self.config.get("bucket", "")
+            key = remote_ref.removeprefix(f"s3://{bucket}/")
+            response = client.get_object(Bucket=bucket, Key=key, Range=f"bytes={offset}-{offset + length - 1}")
+            return True, response["Body"].read()
+        except Exception as e:
+            return False, str(e)
+
+    def delete_file(self, remote_ref: str) -> tuple[bool, str]:
+        """Удалить объект из бакета."""
+        try:
+            client = self._get_client()
+            bucket = self.config.get("bucket", "")
+            key = remote_ref.removeprefix(f"s3://{bucket}/")
+            client.delete_object(Bucket=bucket, Key=key)
+            return True, remote_ref
+        except Exception as e:
+            return False, str(e)
+
     def close(self):
         """Закрыть соединение."""
         self._client = None
@@ -12,6 +12,8 @@ class SSHConnector(BaseConnector):
     """Коннектор для загрузки файлов по SSH/SCP."""
 
     MAX_FILE_SIZE = None
+    SUPPORTS_RANGE_READ = True
+    SUPPORTS_DELETE = True
 
     def __init__(self, config: dict[str, Any]):
         super().__init__(config)
@@ -82,6 +84,33 @@ class SSHConnector(BaseConnector):
         except Exception as e:
             return False, str(e)
 
+    def download_to_file(self, remote_ref: str, file_path: str) -> tuple[bool, str]:
+        """Скачать файл по SFTP."""
+        try:
+            self._get_sftp().get(remote_ref, file_path)
+            return True, file_path
+        except Exception as e:
+            return False, str(e)
+
+    def read_range(self, remote_ref: str, offset: int, length: int) -> tuple[bool, bytes | str]:
+        """Прочитать диапазон байт файла по SFTP."""
+        try:
+            with self._get_sftp().open(remote_ref, "rb") as f:
+                f.seek(offset)
+                return True, f.read(length)
+        except Exception as e:
+            return False, str(e)
+
+    def delete_file(self, remote_ref: str) -> tuple[bool, str]:
+        """Удалить файл по SFTP."""
+        try:
+            self._get_sftp().remove(remote_ref)
+            return True, remote_ref
+        except FileNotFoundError:
+            return True, remote_ref
+        except Exception as e:
+            return False, str(e)
+
     def upload_data(self, data: bytes, remote_name: str) -> tuple[bool, str]:
         """Загрузить данные по SFTP."""
         try:
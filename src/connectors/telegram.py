@@ -2,6 +2,7 @@
 
 import os
 import time
+from datetime import timedelta
 from pathlib import Path
 from typing import Any
 
@@ -14,6 +15,11 @@ from .base import BaseConnector
 class TelegramConnector(BaseConnector):
     """Коннектор для загрузки файлов в Telegram."""
 
+    MAX_PARALLEL_DOWNLOADS = 4
+    MAX_PARALLEL_DELETES = 4
+    SUPPORTS_DELETE = True
+    DELETE_MAX_AGE = timedelta(hours=48)  # Бот может удалить свое сообщение только в течение 48 часов
+
     def __init__(self, config: dict[str, Any]):
         super().__init__(config)
         self._bot: Bot | None = None
@@ -75,7 +81,8 @@ class TelegramConnector(BaseConnector):
                     timeout=300,
                 )
 
-            return True, f"message_{message.message_id}"
+            # file_id нужен для скачивания: Bot API не отдает сообщения по ID
+            return True, f"message_{message.message_id}:{message.document.file_id}"
         except TelegramError as e:
             return False, f"Ошибка Telegram: {e}"
         except Exception as e:
@@ -105,7 +112,7 @@ class TelegramConnector(BaseConnector):
                         filename=remote_name,
                         timeout=300,
                     )
-                return True, f"message_{message.message_id}"
+                return True, f"message_{message.message_id}:{message.document.file_id}"
             finally:
                 temp_file.unlink(missing_ok=True)
 
@@ -122,7 +129,7 @@ class TelegramConnector(BaseConnector):
             if not chat_id:
                 return None
 
-            message_id = message_id.replace("message_", "")
+            message_id = message_id.replace("message_", "").partition(":")[0]
             message = bot.get_message(chat_id, int(message_id))
 
             if message.document:
@@ -133,7 +140,30 @@ class TelegramConnector(BaseConnector):
         except Exception:
             return None
 
-    def delete_file(self, message_id: str) -> tuple[bool, str]:
-        """Удалить файл из Telegram."""
-        # Telegram не позволяет удалять сообщения бота
-        return False, "Удаление сообщений не поддерживается"
+    def download_to_file(self, remote_ref: str, file_path: str) -> tuple[bool, str]:
+        """Скачать документ из Telegram сразу на диск."""
+        try:
+            _, _, file_id = remote_ref.partition(":")
+            if not file_id:
+                return False, "В ссылке нет file_id (файл загружен старой версией)"
+            file = self._get_bot().get_file(file_id)
+            file.download_to_drive(custom_path=file_path)
+            return True, file_path
+        except TelegramError as e:
+            return False, f"Ошибка Telegram: {e}"
+        except Exception as e:
+            return False, str(e)
+
+    def delete_file(self, remote_ref: str) -> tuple[bool, str]:
+        """Удалить сообщение с файлом из Telegram."""
+        try:
+            chat_id = self.config.get("chat_id", "")
+            if not chat_id:
+                return False, "Chat ID не указан"
+            message_id = remote_ref.removeprefix("message_").partition(":")[0]
+            self._get_bot().delete_message(chat_id=chat_id, message_id=int(message_id))
+            return True, remote_ref
+        except TelegramError as e:
+            return False, f"Ошибка Telegram: {e}"
+        except Exception as e:
+            return False, str(e)
@@ -1,6 +1,28 @@
 """Ядро приложения."""
 
 from .database import Database
-from .archive_utils import ArchiveUtils
+from .archive_utils import ArchiveResult, ArchiveUtils
+from .backup_engine import BackupEngine, BackupRunResult
+from .chunk_store import ChunkStore, ContentDefinedChunker
+from .exclude_matcher import ExcludeMatcher
+from .history_writer import HistoryWriter
+from .incremental import IncrementalBackup, IncrementalPlan
+from .restore import RestoreEngine
+from .retention import RetentionEngine, RetentionResult
 
-__all__ = ["Database", "ArchiveUtils"]
+__all__ = [
+    "Database",
+    "ArchiveResult",
+    "ArchiveUtils",
+    "BackupEngine",
+    "BackupRunResult",
+    "ChunkStore",
+    "ContentDefinedChunker",
+    "ExcludeMatcher",
+    "HistoryWriter",
+    "IncrementalBackup",
+    "IncrementalPlan",
+    "RestoreEngine",
+    "RetentionEngine",
+    "RetentionResult",
+]
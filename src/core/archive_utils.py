@@ -1,11 +1,372 @@
 """Утилиты для архивации и разбиения файлов."""
 
+import errno
+import functools
+import gzip
 import hashlib
+import io
+import json
+import lzma
 import os
-import shutil
+import stat
+import struct
+import tarfile
+import time
 import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Callable
+from typing import BinaryIO, Callable, Iterator
+
+from ..models import ArchiveMember
+from .exclude_matcher import ExcludeMatcher
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    zstd = None
+
+_DATA_DESCRIPTOR_FLAG = 0x08
+_DATA_DESCRIPTOR_SIGNATURE = 0x08074B50
+
+# Алгоритмы хеширования. MD5 оставлен для записей, созданных до появления выбора
+HASH_ALGORITHMS = {
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "blake2b": hashlib.blake2b,
+}
+# SHA-256 на процессорах с SHA-NI быстрее и MD5, и BLAKE2b (см. benchmarks/bench_hash.py)
+DEFAULT_HASH_ALGORITHM = "sha256"
+
+
+def _new_hash(algorithm: str | None = None):
+    """Создать объект хеша по имени алгоритма из HASH_ALGORITHMS."""
+    algorithm = algorithm or DEFAULT_HASH_ALGORITHM
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(f"Неизвестный алгоритм хеширования: {algorithm}")
+    return HASH_ALGORITHMS[algorithm]()
+
+
+@dataclass
+class ArchiveResult:
+    """
+    Результат записи архива: части и их хеши, посчитанные во время записи.
+    """
+
+    parts: list[str]
+    file_hash: str
+    part_hashes: list[str] = field(default_factory=list)
+    size: int = 0
+    hash_algorithm: str = DEFAULT_HASH_ALGORITHM
+    stored_bytes: int = 0  # Исходные байты, записанные без сжатия
+    compressed_bytes: int = 0  # Исходные байты, сжатые deflate
+    part_size: int = 0  # Размер частей (0 - архив не разбивался)
+    members: list[ArchiveMember] = field(default_factory=list)  # Каталог ZIP (пустой для tar)
+
+    @property
+    def path(self) -> str:
+        """Путь к архиву (первая часть, если архив не разбит)."""
+        return self.parts[0]
+
+
+@dataclass(slots=True)
+class TreeEntry:
+    """
+    Файл из обхода дерева вместе с результатом stat.
+    """
+
+    path: str
+    rel_path: str  # POSIX-путь относительно корня обхода
+    size: int
+    mtime_ns: int
+    inode: int
+    mode: int
+
+    @classmethod
+    def from_stat(cls, path: str, rel_path: str, st: os.stat_result) -> "TreeEntry":
+        return cls(path, rel_path, st.st_size, st.st_mtime_ns, st.st_ino, st.st_mode)
+
+
+@dataclass
+class TreeScan:
+    """
+    Результат однопроходного обхода дерева.
+    """
+
+    entries: list[TreeEntry] = field(default_factory=list)
+    total_bytes: int = 0
+
+    @property
+    def total_files(self) -> int:
+        return len(self.entries)
+
+
+class _HashingWriter(io.RawIOBase):
+    """
+    Поток записи в файл с подсчетом хеша записанных данных.
+
+    Поток не поддерживает seek - zipfile в этом случае пишет data descriptor
+    и не возвращается к уже записанным заголовкам, так что хеш считается
+    ровно по итоговому содержимому файла.
+    """
+
+    def __init__(self, output_path: str, hash_algorithm: str | None = None):
+        super().__init__()
+        self.output_path = output_path
+        self.hash_algorithm = hash_algorithm or DEFAULT_HASH_ALGORITHM
+        self._hash = _new_hash(self.hash_algorithm)
+        self._file = open(output_path, "wb")
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        self._file.write(data)
+        self._hash.update(data)
+        size = memoryview(data).nbytes
+        self._position += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+    def result(self) -> ArchiveResult:
+        file_hash = self._hash.hexdigest()
+        return ArchiveResult(
+            parts=[self.output_path], file_hash=file_hash, part_hashes=[file_hash], size=self._position,
+            hash_algorithm=self.hash_algorithm,
+        )
+
+
+class _SplitFileWriter(io.RawIOBase):
+    """
+    Поток записи, раскладывающий данные по частям partNNN.
+
+    Новая часть начинается, как только текущая достигает max_part_size,
+    поэтому части совпадают с результатом split_file и собираются merge_files.
+    Хеши всего потока и каждой части считаются во время записи. Как и
+    _HashingWriter, поток не поддерживает seek. hash_seconds и split_seconds
+    накапливают время хеширования и записи частей на диск.
+    """
+
+    def __init__(
+        self, output_dir: str, stem: str, extension: str, max_part_size: int, hash_algorithm: str | None = None
+    ):
+        if max_part_size <= 0:
+            raise ValueError("Размер части должен быть больше нуля")
+        super().__init__()
+        self.output_dir = output_dir
+        self.hash_algorithm = hash_algorithm or DEFAULT_HASH_ALGORITHM
+        self.max_part_size = max_part_size
+        self.parts: list[str] = []
+        self.part_hashes: list[str] = []
+        self._stem = stem
+        self._ext = extension
+        self._current = None
+        self._current_size = 0
+        self._position = 0
+        self._hash = _new_hash(self.hash_algorithm)
+        self._part_hash = None
+        self.hash_seconds = 0.0
+        self.split_seconds = 0.0
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        view = memoryview(data).cast("B")
+        written = 0
+        hash_seconds = 0.0
+        start = time.perf_counter()
+        while written < len(view):
+            if self._current is None or self._current_size >= self.max_part_size:
+                self._next_part()
+            size = min(len(view) - written, self.max_part_size - self._current_size)
+            chunk = view[written:written + size]
+            self._current.write(chunk)
+            hashed = time.perf_counter()
+            self._part_hash.update(chunk)
+            hash_seconds += time.perf_counter() - hashed
+            self._current_size += size
+            written += size
+        hashed = time.perf_counter()
+        self._hash.update(view)
+        end = time.perf_counter()
+        hash_seconds += end - hashed
+        self.hash_seconds += hash_seconds
+        self.split_seconds += end - start - hash_seconds
+        self._position += written
+        return written
+
+    def _next_part(self):
+        """Закрыть текущую часть и открыть следующую."""
+        self._close_part()
+        part_path = os.path.join(
+            self.output_dir, f"{self._stem}.part{len(self.parts) + 1:03d}{self._ext}"
+        )
+        self._current = open(part_path, "wb")
+        self._current_size = 0
+        self._part_hash = _new_hash(self.hash_algorithm)
+        self.parts.append(part_path)
+
+    def _close_part(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+            self.part_hashes.append(self._part_hash.hexdigest())
+
+    def close(self):
+        if not self.closed:
+            self._close_part()
+        super().close()
+
+    def result(self) -> ArchiveResult:
+        return ArchiveResult(
+            parts=list(self.parts), file_hash=self._hash.hexdigest(),
+            part_hashes=list(self.part_hashes), size=self._position, hash_algorithm=self.hash_algorithm,
+        )
+
+
+# Ошибки, при которых ядро не умеет копировать между этими файлами - переходим к следующему способу
+_COPY_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF, errno.ENOTSOCK}
+_COPY_BLOCK_SIZE = 64 * 1024 * 1024  # Объем одного системного вызова копирования
+_COPY_BUFFER_SIZE = 1024 * 1024  # Буфер для копирования через Python
+
+
+def _copy_file_range(
+    src_fd: int, dst_fd: int, offset: int, count: int, progress: Callable[[int], None] | None = None
+) -> int:
+    """
+    Скопировать count байт из src_fd начиная с offset в текущую позицию dst_fd.
+
+    Сначала copy_file_range (копирование внутри ядра, на CoW-системах - reflink),
+    затем sendfile, и только потом чтение в один переиспользуемый буфер.
+
+    Args:
+        src_fd: Дескриптор источника
+        dst_fd: Дескриптор приемника
+        offset: Смещение в источнике
+        count: Число байт
+        progress: Колбэк с числом байт, скопированных очередным вызовом
+
+    Returns:
+        Число скопированных байт
+    """
+    copied = 0
+    methods = []
+    if hasattr(os, "copy_file_range"):
+        methods.append(lambda pos, size: os.copy_file_range(src_fd, dst_fd, size, pos))
+    if hasattr(os, "sendfile"):
+        methods.append(lambda pos, size: os.sendfile(dst_fd, src_fd, pos, size))
+
+    for method in methods:
+        try:
+            while copied < count:
+                size = method(offset + copied, min(_COPY_BLOCK_SIZE, count - copied))
+                if not size:
+                    raise OSError(f"Источник закончился раньше ожидаемого: {copied} из {count} байт")
+                copied += size
+                if progress:
+                    progress(size)
+            return copied
+        except OSError as e:
+            # Уже скопированное оставляем, остаток - следующим способом
+            if e.errno not in _COPY_UNSUPPORTED:
+                raise
+
+    view = memoryview(bytearray(min(_COPY_BUFFER_SIZE, max(count - copied, 1))))
+    src = io.FileIO(src_fd, "rb", closefd=False)
+    src.seek(offset + copied)
+    while copied < count:
+        size = src.readinto(view[:min(len(view), count - copied)])
+        if not size:
+            raise OSError(f"Источник закончился раньше ожидаемого: {copied} из {count} байт")
+        written = 0
+        while written < size:
+            written += os.write(dst_fd, view[written:size])
+        copied += size
+        if progress:
+            progress(size)
+    return copied
+
+
+def _deflate_blocks(blocks: list[tuple[str, int, int, bool]], compression_level: int) -> list[tuple[bytes, int, int]]:
+    """
+    Сжать блоки файлов в независимые raw deflate потоки (выполняется в процессе пула).
+
+    Промежуточные блоки завершаются Z_SYNC_FLUSH без признака последнего блока,
+    поэтому их конкатенация с финальным блоком образует корректный deflate поток.
+
+    Args:
+        blocks: Список (путь, смещение, длина, последний ли блок файла)
+        compression_level: Уровень сжатия
+
+    Returns:
+        Список (сжатые данные, CRC32 исходных данных, длина исходных данных)
+    """
+    results = []
+    for path, offset, length, final in blocks:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read() if final else f.read(length)
+        compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed = compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        results.append((compressed, zlib.crc32(data), len(data)))
+    return results
+
+
+def _gf2_matrix_times(matrix: list[int], vector: int) -> int:
+    result = 0
+    index = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[index]
+        vector >>= 1
+        index += 1
+    return result
+
+
+def _gf2_matrix_square(matrix: list[int]) -> list[int]:
+    return [_gf2_matrix_times(matrix, row) for row in matrix]
+
+
+@functools.lru_cache(maxsize=16)
+def _crc32_zeros_operator(length: int) -> tuple[int, ...]:
+    """Матрица, дописывающая к CRC32 length нулевых байт (как crc32_combine в zlib)."""
+    operator = [0xEDB88320] + [1 << n for n in range(31)]  # один нулевой бит
+    for _ in range(3):
+        operator = _gf2_matrix_square(operator)  # 2, 4, 8 бит
+    result = [1 << n for n in range(32)]
+    while length:
+        if length & 1:
+            result = [_gf2_matrix_times(operator, row) for row in result]
+        length >>= 1
+        if length:
+            operator = _gf2_matrix_square(operator)
+    return tuple(result)
+
+
+def _crc32_combine(crc1: int, crc2: int, length2: int) -> int:
+    """CRC32 конкатенации двух блоков по их CRC и длине второго блока."""
+    return _gf2_matrix_times(_crc32_zeros_operator(length2), crc1) ^ crc2
 
 
 class ArchiveUtils:
@@ -14,36 +375,79 @@ class ArchiveUtils:
     """
 
     CHUNK_SIZE = 1024 * 1024  # 1 MB для чтения файлов
+    DEFAULT_HASH_ALGORITHM = DEFAULT_HASH_ALGORITHM
+    PARALLEL_BLOCK_SIZE = 8 * 1024 * 1024  # 8 MB - блок параллельного сжатия
+    PARALLEL_MIN_BYTES = 2 * PARALLEL_BLOCK_SIZE  # Меньше сжимаемых данных - запуск пула дороже выигрыша
+    PARALLEL_BATCH_FILES = 256  # Больше файлов в пакет не кладем, чтобы мелкие файлы делились между процессами
+    TOMBSTONE_NAME = ".backuper/deleted.json"  # Список удаленных файлов инкремента
+    ARCHIVE_FORMATS = {
+        "zip": ".zip",
+        "tar": ".tar",
+        "tar.gz": ".tar.gz",
+        "tar.xz": ".tar.xz",
+        "tar.zst": ".tar.zst",
+    }
+    SAMPLE_SIZE = 64 * 1024  # Проба для оценки сжимаемости
+    MIN_SAMPLED_SIZE = 16 * 1024  # Файлы меньше всегда сжимаются
+    INCOMPRESSIBLE_RATIO = 0.97  # Проба сжалась хуже - файл пишется без сжатия
+    INCOMPRESSIBLE_EXTENSIONS = frozenset({
+        ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif",
+        ".mp4", ".mkv", ".mov", ".avi", ".webm", ".m4v",
+        ".mp3", ".aac", ".ogg", ".opus", ".flac", ".m4a",
+        ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".lz4", ".7z", ".rar",
+        ".jar", ".apk", ".docx", ".xlsx", ".pptx", ".odt", ".ods",
+        ".gpg", ".pgp", ".age", ".enc",
+    })
 
     @staticmethod
-    def calculate_file_hash(file_path: str) -> str:
+    def calculate_file_hash(file_path: str, algorithm: str | None = None, buffer_size: int | None = None) -> str:
         """
-        Вычислить MD5 хеш файла.
+        Вычислить хеш файла.
+
+        По умолчанию используется hashlib.file_digest - чтение идет в
+        переиспользуемый буфер без создания bytes на каждый блок.
 
         Args:
             file_path: Путь к файлу
+            algorithm: Алгоритм из HASH_ALGORITHMS (по умолчанию DEFAULT_HASH_ALGORITHM)
+            buffer_size: Размер буфера чтения (по умолчанию - выбор file_digest)
 
         Returns:
-            MD5 хеш в виде строки
+            Хеш в виде hex-строки
         """
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            while chunk := f.read(ArchiveUtils.CHUNK_SIZE):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        hash_obj = _new_hash(algorithm)
+        with open(file_path, "rb", buffering=0) as f:
+            if buffer_size is None and hasattr(hashlib, "file_digest"):
+                return hashlib.file_digest(f, lambda: hash_obj).hexdigest()
+            ArchiveUtils._hash_stream(f, hash_obj, buffer_size or ArchiveUtils.CHUNK_SIZE)
+        return hash_obj.hexdigest()
+
+    @staticmethod
+    def _hash_stream(stream: BinaryIO, hash_obj, buffer_size: int) -> int:
+        """Прогнать поток через хеш блоками readinto в один буфер. Возвращает число байт."""
+        buffer = bytearray(buffer_size)
+        view = memoryview(buffer)
+        total = 0
+        while size := stream.readinto(buffer):
+            hash_obj.update(view[:size])
+            total += size
+        return total
 
     @staticmethod
-    def calculate_data_hash(data: bytes) -> str:
+    def calculate_data_hash(data: bytes, algorithm: str | None = None) -> str:
         """
-        Вычислить MD5 хеш данных в памяти.
+        Вычислить хеш данных в памяти.
 
         Args:
             data: Байты данных
+            algorithm: Алгоритм из HASH_ALGORITHMS (по умолчанию DEFAULT_HASH_ALGORITHM)
 
         Returns:
-            MD5 хеш в виде строки
+            Хеш в виде hex-строки
         """
-        return hashlib.md5(data).hexdigest()
+        hash_obj = _new_hash(algorithm)
+        hash_obj.update(data)
+        return hash_obj.hexdigest()
 
     @staticmethod
     def get_file_size(file_path: str) -> int:
@@ -80,19 +484,28 @@ class ArchiveUtils:
         output_dir: str,
         max_chunk_size: int,
         progress_callback: Callable[[int, int], None] | None = None,
-    ) -> list[str]:
+        hash_algorithm: str | None = None,
+        compute_hashes: bool = True,
+    ) -> ArchiveResult:
         """
         Разбить файл на части.
 
+        Память не зависит от размера части: с хешами данные идут через
+        один буфер CHUNK_SIZE, без хешей копирует ядро (copy_file_range/sendfile).
+
         Args:
             file_path: Путь к исходному файлу
             output_dir: Директория для сохранения частей
             max_chunk_size: Максимальный размер части в байтах
             progress_callback: Колбэк для отображения прогресса (current, total)
+            hash_algorithm: Алгоритм хеширования (по умолчанию DEFAULT_HASH_ALGORITHM)
+            compute_hashes: Считать хеши файла и частей (без них file_hash пустой)
 
         Returns:
-            Список путей к созданным частям
+            Части и хеши исходного файла и каждой части
         """
+        if max_chunk_size <= 0:
+            raise ValueError("Размер части должен быть больше нуля")
         Path(output_dir).mkdir(parents=True, exist_ok=True)
 
         file_size = os.path.getsize(file_path)
@@ -100,25 +513,44 @@ class ArchiveUtils:
         file_ext = Path(file_path).suffix
 
         parts = []
-        part_num = 1
+        part_hashes = []
+        hash_algorithm = hash_algorithm or DEFAULT_HASH_ALGORITHM
+        file_hash = _new_hash(hash_algorithm) if compute_hashes else None
+        buffer = memoryview(bytearray(ArchiveUtils.CHUNK_SIZE)) if compute_hashes else None
+        offset = 0
 
-        with open(file_path, "rb") as f:
-            while True:
-                chunk = f.read(max_chunk_size)
-                if not chunk:
-                    break
+        with open(file_path, "rb", buffering=0) as f:
+            while offset < file_size:
+                part_size = min(max_chunk_size, file_size - offset)
+                part_path = os.path.join(output_dir, f"{file_name}.part{len(parts) + 1:03d}{file_ext}")
 
-                part_path = os.path.join(output_dir, f"{file_name}.part{part_num:03d}{file_ext}")
-                with open(part_path, "wb") as part_file:
-                    part_file.write(chunk)
+                with open(part_path, "wb", buffering=0) as part_file:
+                    if compute_hashes:
+                        part_hash = _new_hash(hash_algorithm)
+                        remaining = part_size
+                        while remaining:
+                            size = f.readinto(buffer[:min(remaining, len(buffer))])
+                            if not size:
+                                raise OSError(f"Файл {file_path} укорочен во время разбиения")
+                            data = buffer[:size]
+                            part_file.write(data)
+                            file_hash.update(data)
+                            part_hash.update(data)
+                            remaining -= size
+                        part_hashes.append(part_hash.hexdigest())
+                    else:
+                        _copy_file_range(f.fileno(), part_file.fileno(), offset, part_size)
 
                 parts.append(part_path)
-                part_num += 1
+                offset += part_size
 
                 if progress_callback:
-                    progress_callback(f.tell(), file_size)
+                    progress_callback(offset, file_size)
 
-        return parts
+        return ArchiveResult(
+            parts=parts, file_hash=file_hash.hexdigest() if file_hash else "", part_hashes=part_hashes,
+            size=file_size, hash_algorithm=hash_algorithm,
+        )
 
     @staticmethod
     def merge_files(
@@ -129,6 +561,9 @@ class ArchiveUtils:
         """
         Собрать файл из частей.
 
+        Данные копирует ядро (copy_file_range, затем sendfile), через Python
+        байты идут только если файловая система не поддерживает ни то, ни другое.
+
         Args:
             parts: Список путей к частям (в порядке)
             output_path: Путь к результату
@@ -137,14 +572,164 @@ class ArchiveUtils:
         total_size = sum(os.path.getsize(p) for p in parts)
         current_size = 0
 
-        with open(output_path, "wb") as out:
+        def on_copied(size: int):
+            nonlocal current_size
+            current_size += size
+            if progress_callback:
+                progress_callback(current_size, total_size)
+
+        with open(output_path, "wb", buffering=0) as out:
             for part_path in parts:
-                with open(part_path, "rb") as part:
-                    while chunk := part.read(ArchiveUtils.CHUNK_SIZE):
-                        out.write(chunk)
-                        current_size += len(chunk)
-                        if progress_callback:
-                            progress_callback(current_size, total_size)
+                with open(part_path, "rb", buffering=0) as part:
+                    _copy_file_range(part.fileno(), out.fileno(), 0, os.fstat(part.fileno()).st_size, on_copied)
+
+    @staticmethod
+    def available_formats() -> list[str]:
+        """Форматы архивов, доступные в текущем окружении."""
+        return [fmt for fmt in ArchiveUtils.ARCHIVE_FORMATS if fmt != "tar.zst" or zstd is not None]
+
+    @staticmethod
+    def archive_extension(archive_format: str) -> str:
+        """
+        Расширение файла для формата архива.
+
+        Args:
+            archive_format: Формат (ключ ARCHIVE_FORMATS)
+
+        Returns:
+            Расширение вместе с точкой, например ".tar.gz"
+        """
+        if archive_format not in ArchiveUtils.ARCHIVE_FORMATS:
+            raise ValueError(f"Неизвестный формат архива: {archive_format}")
+        if archive_format == "tar.zst" and zstd is None:
+            raise RuntimeError("Формат tar.zst требует модуль compression.zstd (Python 3.14+)")
+        return ArchiveUtils.ARCHIVE_FORMATS[archive_format]
+
+    @staticmethod
+    def detect_format(file_name: str) -> str | None:
+        """
+        Определить формат архива по имени файла.
+
+        Args:
+            file_name: Имя или путь архива
+
+        Returns:
+            Формат (ключ ARCHIVE_FORMATS) или None, если расширение не известно
+        """
+        name = file_name.lower()
+        # Длинные расширения первыми, чтобы ".tar.gz" не определился как ".gz"
+        for archive_format, extension in sorted(
+            ArchiveUtils.ARCHIVE_FORMATS.items(), key=lambda item: len(item[1]), reverse=True
+        ):
+            if name.endswith(extension):
+                return archive_format
+        return None
+
+    @staticmethod
+    def create_archive(
+        source_path: str,
+        output_path: str,
+        archive_format: str = "zip",
+        compression_level: int = 6,
+        exclude_patterns: list[str] | None = None,
+        progress_callback: Callable[[str, int, int], None] | None = None,
+        workers: int | None = 1,
+        files: list[str] | None = None,
+        deleted: list[str] | None = None,
+        smart_compression: bool = False,
+        hash_algorithm: str | None = None,
+    ) -> ArchiveResult:
+        """
+        Создать архив заданного формата из папки или файла.
+
+        Args:
+            source_path: Путь к исходному файлу или папке
+            output_path: Путь к создаваемому архиву
+            archive_format: Формат архива (ключ ARCHIVE_FORMATS)
+            compression_level: Уровень сжатия (0-9)
+            exclude_patterns: Паттерны для исключения (в стиле .gitignore)
+            progress_callback: Колбэк (filename, current, total)
+            workers: Число процессов для сжатия ZIP (None - по числу ядер)
+            files: Архивировать только эти пути (относительно source_path)
+            deleted: Список удаленных файлов, сохраняется в TOMBSTONE_NAME
+            smart_compression: Не сжимать несжимаемые файлы (только ZIP)
+            hash_algorithm: Алгоритм хеширования (по умолчанию DEFAULT_HASH_ALGORITHM)
+
+        Returns:
+            Путь к архиву и его хеш, посчитанный во время записи
+        """
+        ArchiveUtils.archive_extension(archive_format)
+
+        members = []
+        with _HashingWriter(output_path, hash_algorithm) as writer:
+            stored, compressed = ArchiveUtils.write_archive(
+                writer, source_path, archive_format, compression_level, exclude_patterns, progress_callback,
+                workers, files, deleted, smart_compression, members,
+            )
+
+        result = writer.result()
+        result.stored_bytes, result.compressed_bytes = stored, compressed
+        result.members = members
+        return result
+
+    @staticmethod
+    def write_archive(
+        sink: BinaryIO,
+        source_path: str,
+        archive_format: str = "zip",
+        compression_level: int = 6,
+        exclude_patterns: list[str] | None = None,
+        progress_callback: Callable[[str, int, int], None] | None = None,
+        workers: int | None = 1,
+        files: list[str] | None = None,
+        deleted: list[str] | None = None,
+        smart_compression: bool = False,
+        catalog: list[ArchiveMember] | None = None,
+    ) -> tuple[int, int]:
+        """
+        Записать архив в поток за один проход.
+
+        Поток может быть несмещаемым (pipe, сокет, загрузчик): ZIP пишется
+        с data descriptor, tar - в потоковом режиме tarfile. Поток не закрывается.
+
+        Args:
+            sink: Поток для записи
+            source_path: Путь к исходному файлу или папке
+            archive_format: Формат архива (ключ ARCHIVE_FORMATS)
+            compression_level: Уровень сжатия (0-9)
+            exclude_patterns: Паттерны для исключения (в стиле .gitignore)
+            progress_callback: Колбэк (filename, current, total)
+            workers: Число процессов для сжатия ZIP (None - по числу ядер)
+            files: Архивировать только эти пути (относительно source_path)
+            deleted: Список удаленных файлов, сохраняется в TOMBSTONE_NAME
+            smart_compression: Не сжимать несжимаемые файлы (только ZIP)
+            catalog: Список, в который добавляется каталог ZIP архива. Смещения
+                считаются от начала потока; для частей их пересчитывает split_catalog
+
+        Returns:
+            (байт записано без сжатия, байт сжато)
+        """
+        ArchiveUtils.archive_extension(archive_format)
+
+        if archive_format == "zip":
+            with zipfile.ZipFile(sink, "w", **ArchiveUtils._zip_options(compression_level)) as zf:
+                written = ArchiveUtils._write_zip_members(
+                    zf, source_path, compression_level, exclude_patterns, progress_callback, workers,
+                    files, deleted, smart_compression,
+                )
+                if catalog is not None:
+                    catalog.extend(
+                        ArchiveMember(
+                            name=info.filename, size=info.file_size, compressed_size=info.compress_size,
+                            crc=info.CRC, compress_type=info.compress_type, part_offset=info.header_offset,
+                        ) for info in zf.infolist()
+                    )
+                return written
+
+        return ArchiveUtils._write_tar_members(
+            sink, source_path, archive_format, compression_level, exclude_patterns, progress_callback,
+            files, deleted,
+        )
 
     @staticmethod
     def create_zip_archive(
@@ -153,7 +738,11 @@ class ArchiveUtils:
         compression_level: int = 6,
         exclude_patterns: list[str] | None = None,
         progress_callback: Callable[[str, int, int], None] | None = None,
-    ) -> str:
+        workers: int | None = 1,
+        files: list[str] | None = None,
+        deleted: list[str] | None = None,
+        smart_compression: bool = False,
+    ) -> ArchiveResult:
         """
         Создать ZIP архив из папки или файла.
 
@@ -161,93 +750,513 @@ class ArchiveUtils:
             source_path: Путь к исходному файлу или папке
             output_path: Путь к создаваемому архиву
             compression_level: Уровень сжатия (0-9)
-            exclude_patterns: Паттерны для исключения
+            exclude_patterns: Паттерны для исключения (в стиле .gitignore)
             progress_callback: Колбэк (filename, current, total)
+            workers: Число процессов для сжатия (None - по числу ядер)
+            files: Архивировать только эти пути (относительно source_path)
+            deleted: Список удаленных файлов, сохраняется в TOMBSTONE_NAME
+            smart_compression: Не сжимать несжимаемые файлы (медиа, архивы, шифрованные данные)
 
         Returns:
-            Путь к созданному архиву
+            Путь к архиву и его хеш, посчитанный во время записи
         """
-        exclude_patterns = exclude_patterns or []
+        return ArchiveUtils.create_archive(
+            source_path, output_path, "zip", compression_level, exclude_patterns, progress_callback,
+            workers, files, deleted, smart_compression,
+        )
 
-        source = Path(source_path)
+    @staticmethod
+    def _zip_options(compression_level: int) -> dict:
+        """Параметры ZipFile для заданного уровня сжатия."""
         compression = zipfile.ZIP_DEFLATED if compression_level > 0 else zipfile.ZIP_STORED
+        return {"compression": compression, "compresslevel": compression_level}
 
-        total_files = sum(1 for _ in source.rglob("*") if _.is_file())
-        processed = 0
+    @staticmethod
+    def _write_zip_members(
+        zf: zipfile.ZipFile,
+        source_path: str,
+        compression_level: int,
+        exclude_patterns: list[str] | None = None,
+        progress_callback: Callable[[str, int, int], None] | None = None,
+        workers: int | None = 1,
+        files: list[str] | None = None,
+        deleted: list[str] | None = None,
+        smart_compression: bool = False,
+    ) -> tuple[int, int]:
+        """
+        Записать содержимое папки в открытый ZIP архив.
 
-        with zipfile.ZipFile(output_path, "w", compression, compresslevel=compression_level) as zf:
-            for file_path in source.rglob("*"):
-                if file_path.is_file():
-                    # Проверка паттернов исключения
-                    rel_path = str(file_path.relative_to(source))
-                    should_exclude = False
-                    for pattern in exclude_patterns:
-                        if pattern in rel_path:
-                            should_exclude = True
-                            break
-
-                    if should_exclude:
-                        continue
+        Args:
+            zf: Открытый на запись архив
+            source_path: Путь к исходной папке
+            compression_level: Уровень сжатия (0-9)
+            exclude_patterns: Паттерны для исключения (в стиле .gitignore)
+            progress_callback: Колбэк (filename, current, total)
+            workers: Число процессов для сжатия (None - по числу ядер)
+            files: Архивировать только эти пути (относительно source_path)
+            deleted: Список удаленных файлов, сохраняется в TOMBSTONE_NAME
+            smart_compression: Не сжимать несжимаемые файлы
+
+        Returns:
+            (байт записано без сжатия, байт сжато)
+        """
+        prefix, entries = ArchiveUtils._collect_entries(source_path, exclude_patterns, files)
+
+        members = [
+            (entry, prefix + entry.rel_path,
+             compression_level == 0 or (smart_compression and ArchiveUtils._is_incompressible(entry)))
+            for entry in entries
+        ]
+        stored_bytes = sum(entry.size for entry, _, store in members if store)
+        compressed_bytes = sum(entry.size for entry, _, store in members if not store)
+
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and compression_level > 0 and compressed_bytes >= ArchiveUtils.PARALLEL_MIN_BYTES:
+            ArchiveUtils._write_zip_members_parallel(zf, members, compression_level, workers, progress_callback)
+        else:
+            for processed, (entry, arcname, store) in enumerate(members, start=1):
+                # Добавляем файл в архив
+                zf.write(entry.path, arcname, compress_type=zipfile.ZIP_STORED if store else None)
+
+                if progress_callback:
+                    progress_callback(entry.path, processed, len(members))
+
+        if deleted is not None:
+            zf.writestr(ArchiveUtils.TOMBSTONE_NAME, json.dumps(deleted, ensure_ascii=False))
+
+        return stored_bytes, compressed_bytes
+
+    @staticmethod
+    def _collect_entries(
+        source_path: str,
+        exclude_patterns: list[str] | None = None,
+        files: list[str] | None = None,
+    ) -> tuple[str, list[TreeEntry]]:
+        """Файлы для архива и префикс имен внутри него (имя папки-источника)."""
+        source = Path(source_path)
+        prefix = f"{source.name}/" if source.is_dir() else ""
+
+        if files is None:
+            return prefix, ArchiveUtils.scan_tree(source_path, exclude_patterns).entries
 
-                    # Добавляем файл в архив
-                    arcname = file_path.relative_to(source.parent)
-                    zf.write(file_path, arcname)
+        entries = []
+        for rel_path in files:
+            file_path = os.path.join(source_path, rel_path)
+            entries.append(TreeEntry.from_stat(file_path, Path(rel_path).as_posix(), os.stat(file_path)))
+        return prefix, entries
+
+    @staticmethod
+    def _write_tar_members(
+        sink: BinaryIO,
+        source_path: str,
+        archive_format: str,
+        compression_level: int,
+        exclude_patterns: list[str] | None = None,
+        progress_callback: Callable[[str, int, int], None] | None = None,
+        files: list[str] | None = None,
+        deleted: list[str] | None = None,
+    ) -> tuple[int, int]:
+        """
+        Записать tar поток, сжатый кодеком формата целиком.
+
+        Returns:
+            (байт записано без сжатия, байт сжато)
+        """
+        prefix, entries = ArchiveUtils._collect_entries(source_path, exclude_patterns, files)
+        total_bytes = sum(entry.size for entry in entries)
+
+        codec = ArchiveUtils._open_tar_codec(archive_format, sink, compression_level)
+        try:
+            with tarfile.open(fileobj=codec or sink, mode="w|", format=tarfile.PAX_FORMAT) as tf:
+                for processed, entry in enumerate(entries, start=1):
+                    info = tarfile.TarInfo(prefix + entry.rel_path)
+                    info.size = entry.size
+                    info.mtime = entry.mtime_ns // 1_000_000_000
+                    info.mode = stat.S_IMODE(entry.mode)
+                    with open(entry.path, "rb") as f:
+                        tf.addfile(info, f)
 
-                    processed += 1
                     if progress_callback:
-                        progress_callback(str(file_path), processed, total_files)
+                        progress_callback(entry.path, processed, len(entries))
+
+                if deleted is not None:
+                    data = json.dumps(deleted, ensure_ascii=False).encode("utf-8")
+                    info = tarfile.TarInfo(ArchiveUtils.TOMBSTONE_NAME)
+                    info.size = len(data)
+                    info.mtime = int(time.time())
+                    tf.addfile(info, io.BytesIO(data))
+        finally:
+            if codec is not None:
+                codec.close()
 
-        return output_path
+        return (total_bytes, 0) if codec is None else (0, total_bytes)
 
     @staticmethod
-    def create_split_zip_archive(
+    def _open_tar_codec(archive_format: str, sink: BinaryIO, compression_level: int) -> BinaryIO | None:
+        """Обернуть поток в кодек формата (None для несжатого tar)."""
+        if archive_format == "tar.gz":
+            return gzip.GzipFile(fileobj=sink, mode="wb", compresslevel=compression_level, mtime=0)
+        if archive_format == "tar.xz":
+            return lzma.LZMAFile(sink, "wb", preset=compression_level)
+        if archive_format == "tar.zst":
+            # Уровень 0 у zstd означает "по умолчанию", поэтому минимум - 1
+            return zstd.ZstdFile(sink, "wb", level=max(compression_level, 1))
+        return None
+
+    @staticmethod
+    def _is_incompressible(entry: TreeEntry) -> bool:
+        """
+        Оценить, стоит ли сжимать файл.
+
+        Сначала проверяется расширение, затем первый блок файла пробно
+        сжимается на уровне 1: если он почти не уменьшился, deflate
+        на всем файле потратит CPU впустую.
+        """
+        if os.path.splitext(entry.rel_path)[1].lower() in ArchiveUtils.INCOMPRESSIBLE_EXTENSIONS:
+            return True
+        if entry.size < ArchiveUtils.MIN_SAMPLED_SIZE:
+            return False
+        try:
+            with open(entry.path, "rb") as f:
+                sample = f.read(ArchiveUtils.SAMPLE_SIZE)
+        except OSError:
+            return False
+        if not sample:
+            return False
+        return len(zlib.compress(sample, 1)) >= len(sample) * ArchiveUtils.INCOMPRESSIBLE_RATIO
+
+    @staticmethod
+    def iter_tree(
+        source_path: str, exclude_patterns: list[str] | ExcludeMatcher | None = None
+    ) -> Iterator[TreeEntry]:
+        """
+        Обойти дерево за один проход os.scandir.
+
+        Исключенные папки отсекаются целиком, без обхода содержимого.
+        Ссылки на папки не раскрываются, как и в Path.rglob.
+
+        Args:
+            source_path: Путь к папке или файлу
+            exclude_patterns: Паттерны в стиле .gitignore или готовый ExcludeMatcher
+
+        Yields:
+            Файлы с результатами stat
+        """
+        matcher = exclude_patterns if isinstance(exclude_patterns, ExcludeMatcher) else ExcludeMatcher(exclude_patterns)
+
+        if not os.path.isdir(source_path):
+            if os.path.isfile(source_path):
+                name = os.path.basename(source_path)
+                yield TreeEntry.from_stat(source_path, name, os.stat(source_path))
+            return
+
+        stack = [(source_path, "")]
+        while stack:
+            dir_path, rel_dir = stack.pop()
+            try:
+                with os.scandir(dir_path) as it:
+                    dir_entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue
+
+            subdirs = []
+            for entry in dir_entries:
+                rel_path = rel_dir + entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not (matcher and matcher.is_excluded(rel_path, is_dir=True)):
+                            subdirs.append((entry.path, rel_path + "/"))
+                        continue
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if not stat.S_ISREG(st.st_mode) or (matcher and matcher.is_excluded(rel_path)):
+                    continue
+                yield TreeEntry.from_stat(entry.path, rel_path, st)
+
+            # Обратный порядок в стеке - обход в алфавитном порядке
+            stack.extend(reversed(subdirs))
+
+    @staticmethod
+    def scan_tree(source_path: str, exclude_patterns: list[str] | ExcludeMatcher | None = None) -> TreeScan:
+        """
+        Собрать список файлов дерева с итогами для прогресса.
+
+        Args:
+            source_path: Путь к папке или файлу
+            exclude_patterns: Паттерны в стиле .gitignore или готовый ExcludeMatcher
+
+        Returns:
+            Файлы, их количество и общий размер
+        """
+        scan = TreeScan()
+        for entry in ArchiveUtils.iter_tree(source_path, exclude_patterns):
+            scan.entries.append(entry)
+            scan.total_bytes += entry.size
+        return scan
+
+    @staticmethod
+    def _zipinfo_from_entry(entry: TreeEntry, arcname: str) -> zipfile.ZipInfo:
+        """ZipInfo по закешированному stat, без повторного обращения к диску."""
+        date_time = time.localtime(entry.mtime_ns / 1e9)[:6]
+        if date_time[0] < 1980:
+            date_time = (1980, 1, 1, 0, 0, 0)
+        zinfo = zipfile.ZipInfo(arcname, date_time)
+        zinfo.external_attr = (entry.mode & 0xFFFF) << 16
+        zinfo.file_size = entry.size
+        return zinfo
+
+    @staticmethod
+    def _iter_parallel_work(members: list[tuple[TreeEntry, str, bool]]):
+        """
+        Разбить файлы на пакеты блоков для пула процессов.
+
+        Большие файлы режутся на блоки PARALLEL_BLOCK_SIZE, мелкие
+        объединяются в пакеты до PARALLEL_BLOCK_SIZE байт и PARALLEL_BATCH_FILES
+        файлов, чтобы не платить за IPC на каждый файл, но и не отдавать
+        все дерево мелких файлов одному процессу.
+        Файлы без сжатия в пул не отправляются - их пишет основной процесс.
+
+        Yields:
+            ("deflate", [(индекс файла, путь, смещение, длина, последний ли блок)])
+            или ("store", индекс файла)
+        """
+        block_size = ArchiveUtils.PARALLEL_BLOCK_SIZE
+        batch = []
+        batch_bytes = 0
+        for index, (entry, _, store) in enumerate(members):
+            if store:
+                if batch:
+                    yield "deflate", batch
+                    batch = []
+                    batch_bytes = 0
+                yield "store", index
+                continue
+
+            size = entry.size
+            offset = 0
+            while True:
+                final = size - offset <= block_size
+                length = size - offset if final else block_size
+                batch.append((index, entry.path, offset, length, final))
+                batch_bytes += length
+                if batch_bytes >= block_size or len(batch) >= ArchiveUtils.PARALLEL_BATCH_FILES:
+                    yield "deflate", batch
+                    batch = []
+                    batch_bytes = 0
+                if final:
+                    break
+                offset += length
+        if batch:
+            yield "deflate", batch
+
+    @staticmethod
+    def _write_zip_members_parallel(
+        zf: zipfile.ZipFile,
+        members: list[tuple[TreeEntry, str, bool]],
+        compression_level: int,
+        workers: int,
+        progress_callback: Callable[[str, int, int], None] | None = None,
+    ) -> None:
+        """
+        Сжать файлы в пуле процессов и дописать готовые deflate потоки в архив.
+
+        Блоки сжимаются параллельно, но записываются строго в исходном порядке.
+        Число пакетов в работе ограничено, поэтому память не зависит от
+        размера файлов. Каждый файл пишется с data descriptor: заголовок
+        выводится до того, как известны CRC и размеры.
+        """
+        fp = zf.fp
+        processed = 0
+        current = None
+        max_in_flight = workers * 2
+
+        def begin_member(index: int, compress_type: int):
+            nonlocal current
+            entry, arcname, _ = members[index]
+            zinfo = ArchiveUtils._zipinfo_from_entry(entry, arcname)
+            zinfo.compress_type = compress_type
+            zinfo.flag_bits |= _DATA_DESCRIPTOR_FLAG
+            zinfo.header_offset = fp.tell()
+            zip64 = zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+            fp.write(zinfo.FileHeader(zip64))
+            zinfo.CRC = 0
+            zinfo.compress_size = 0
+            zinfo.file_size = 0
+            current = (zinfo, zip64)
+
+        def write_data(data: bytes, crc: int, length: int):
+            zinfo, _ = current
+            fp.write(data)
+            # Первый блок (у маленьких файлов - весь файл) уже посчитан целиком в процессе
+            # пула: склейка CRC на Python дорогая, поэтому нужна только для следующих блоков
+            zinfo.CRC = crc if zinfo.file_size == 0 else _crc32_combine(zinfo.CRC, crc, length)
+            zinfo.compress_size += len(data)
+            zinfo.file_size += length
+
+        def end_member(index: int):
+            nonlocal current, processed
+            zinfo, zip64 = current
+            fmt = "<LLQQ" if zip64 else "<LLLL"
+            fp.write(struct.pack(fmt, _DATA_DESCRIPTOR_SIGNATURE, zinfo.CRC, zinfo.compress_size, zinfo.file_size))
+            zf.filelist.append(zinfo)
+            zf.NameToInfo[zinfo.filename] = zinfo
+            zf.start_dir = fp.tell()
+            current = None
+            processed += 1
+            if progress_callback:
+                progress_callback(members[index][0].path, processed, len(members))
+
+        def write_stored(index: int):
+            begin_member(index, zipfile.ZIP_STORED)
+            zinfo, _ = current
+            with open(members[index][0].path, "rb") as f:
+                while chunk := f.read(ArchiveUtils.CHUNK_SIZE):
+                    fp.write(chunk)
+                    zinfo.CRC = zlib.crc32(chunk, zinfo.CRC)
+                    zinfo.file_size += len(chunk)
+            zinfo.compress_size = zinfo.file_size
+            end_member(index)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = deque()
+            work = ArchiveUtils._iter_parallel_work(members)
+
+            def submit_next() -> bool:
+                item = next(work, None)
+                if item is None:
+                    return False
+                kind, payload = item
+                if kind == "store":
+                    in_flight.append((payload, None))
+                else:
+                    blocks = [(path, offset, length, final) for _, path, offset, length, final in payload]
+                    in_flight.append((payload, pool.submit(_deflate_blocks, blocks, compression_level)))
+                return True
+
+            while len(in_flight) < max_in_flight and submit_next():
+                pass
+
+            while in_flight:
+                payload, future = in_flight.popleft()
+                if future is None:
+                    write_stored(payload)
+                else:
+                    for (index, _, _, _, final), (compressed, crc, length) in zip(payload, future.result()):
+                        if current is None:
+                            begin_member(index, zipfile.ZIP_DEFLATED)
+                        write_data(compressed, crc, length)
+                        if final:
+                            end_member(index)
+                submit_next()
+
+    @staticmethod
+    def create_split_archive(
         source_path: str,
         output_dir: str,
         max_part_size: int,
+        archive_format: str = "zip",
         compression_level: int = 6,
         exclude_patterns: list[str] | None = None,
         progress_callback: Callable[[str, int, int], None] | None = None,
-    ) -> list[str]:
+        workers: int | None = 1,
+        files: list[str] | None = None,
+        deleted: list[str] | None = None,
+        smart_compression: bool = False,
+        hash_algorithm: str | None = None,
+    ) -> ArchiveResult:
         """
-        Создать ZIP архив с разбиением на части.
+        Создать архив заданного формата с разбиением на части.
 
         Args:
             source_path: Путь к исходному файлу или папке
             output_dir: Директория для сохранения
             max_part_size: Максимальный размер части
+            archive_format: Формат архива (ключ ARCHIVE_FORMATS)
             compression_level: Уровень сжатия
-            exclude_patterns: Паттерны для исключения
+            exclude_patterns: Паттерны для исключения (в стиле .gitignore)
             progress_callback: Колбэк
+            workers: Число процессов для сжатия ZIP (None - по числу ядер)
+            files: Архивировать только эти пути (относительно source_path)
+            deleted: Список удаленных файлов, сохраняется в TOMBSTONE_NAME
+            smart_compression: Не сжимать несжимаемые файлы (только ZIP)
+            hash_algorithm: Алгоритм хеширования (по умолчанию DEFAULT_HASH_ALGORITHM)
 
         Returns:
-            Список путей к частям архива
+            Части архива и хеши всего архива и каждой части
         """
+        extension = ArchiveUtils.archive_extension(archive_format)
         Path(output_dir).mkdir(parents=True, exist_ok=True)
 
-        source = Path(source_path)
-        archive_name = source.name + ".zip"
-        temp_archive = os.path.join(output_dir, archive_name)
-
-        # Создаем полный архив во временную папку
-        temp_dir = os.path.join(output_dir, "_temp_archive")
-        Path(temp_dir).mkdir(parents=True, exist_ok=True)
-        temp_archive_path = os.path.join(temp_dir, archive_name)
-
-        ArchiveUtils.create_zip_archive(
-            source_path,
-            temp_archive_path,
-            compression_level,
-            exclude_patterns,
-            progress_callback,
-        )
+        # Архив пишется сразу в части, без промежуточного полного файла
+        members = []
+        with _SplitFileWriter(
+            output_dir, Path(source_path).name, extension, max_part_size, hash_algorithm
+        ) as writer:
+            stored, compressed = ArchiveUtils.write_archive(
+                writer, source_path, archive_format, compression_level, exclude_patterns, progress_callback,
+                workers, files, deleted, smart_compression, members,
+            )
+
+        result = writer.result()
+        result.stored_bytes, result.compressed_bytes = stored, compressed
+        result.part_size = max_part_size
+        result.members = ArchiveUtils.split_catalog(members, max_part_size)
+        return result
 
-        # Разбиваем архив на части
-        parts = ArchiveUtils.split_file(temp_archive_path, output_dir, max_part_size)
+    @staticmethod
+    def split_catalog(members: list[ArchiveMember], part_size: int) -> list[ArchiveMember]:
+        """
+        Пересчитать смещения каталога от начала архива в (часть, смещение в части).
+
+        Args:
+            members: Каталог со смещениями от начала архива (из write_archive)
+            part_size: Размер частей
+
+        Returns:
+            Тот же список с заполненными part_index и part_offset
+        """
+        for member in members:
+            member.part_index, member.part_offset = divmod(member.part_offset, part_size)
+        return members
+
+    @staticmethod
+    def create_split_zip_archive(
+        source_path: str,
+        output_dir: str,
+        max_part_size: int,
+        compression_level: int = 6,
+        exclude_patterns: list[str] | None = None,
+        progress_callback: Callable[[str, int, int], None] | None = None,
+        workers: int | None = 1,
+        files: list[str] | None = None,
+        deleted: list[str] | None = None,
+        smart_compression: bool = False,
+    ) -> ArchiveResult:
+        """
+        Создать ZIP архив с разбиением на части.
 
-        # Удаляем временный архив
-        shutil.rmtree(temp_dir)
+        Args:
+            source_path: Путь к исходному файлу или папке
+            output_dir: Директория для сохранения
+            max_part_size: Максимальный размер части
+            compression_level: Уровень сжатия
+            exclude_patterns: Паттерны для исключения (в стиле .gitignore)
+            progress_callback: Колбэк
+            workers: Число процессов для сжатия (None - по числу ядер)
+            files: Архивировать только эти пути (относительно source_path)
+            deleted: Список удаленных файлов, сохраняется в TOMBSTONE_NAME
+            smart_compression: Не сжимать несжимаемые файлы (медиа, архивы, шифрованные данные)
 
-        return parts
+        Returns:
+            Части архива и хеши всего архива и каждой части
+        """
+        return ArchiveUtils.create_split_archive(
+            source_path, output_dir, max_part_size, "zip", compression_level, exclude_patterns,
+            progress_callback, workers, files, deleted, smart_compression,
+        )
 
     @staticmethod
     def get_directory_size(path: str) -> int:
@@ -260,13 +1269,7 @@ class ArchiveUtils:
         Returns:
             Общий размер в байтах
         """
-        total = 0
-        for entry in os.scandir(path):
-            if entry.is_file():
-                total += entry.stat().st_size
-            elif entry.is_dir():
-                total += ArchiveUtils.get_directory_size(entry.path)
-        return total
+        return sum(entry.size for entry in ArchiveUtils.iter_tree(path))
 
     @staticmethod
     def format_size(size_bytes: int) -> str:
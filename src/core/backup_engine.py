@@ -0,0 +1,351 @@
+"""Конвейер бэкапа: сжатие, разбиение и загрузка одновременно."""
+
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Callable
+
+from ..models import ArchiveMember
+from .archive_utils import ArchiveUtils, _SplitFileWriter
+
+if TYPE_CHECKING:
+    from ..connectors.base import BaseConnector
+
+
+@dataclass
+class BackupRunResult:
+    """
+    Итоги запуска конвейера.
+    """
+
+    archive_name: str
+    file_hash: str = ""
+    hash_algorithm: str = ""
+    size: int = 0
+    parts: list[str] = field(default_factory=list)  # Имена частей по порядку
+    part_hashes: list[str] = field(default_factory=list)
+    part_size: int = 0
+    members: list[ArchiveMember] = field(default_factory=list)  # Каталог ZIP с привязкой к частям
+    remote_refs: dict[str, list[str]] = field(default_factory=dict)  # Хранилище -> ссылки на все части
+    errors: dict[str, str] = field(default_factory=dict)  # Хранилище -> текст ошибки
+    stored_bytes: int = 0
+    compressed_bytes: int = 0
+    file_count: int = 0
+    stage_seconds: dict[str, float] = field(default_factory=dict)  # Этап -> секунды (см. models.backup_run.STAGES)
+    upload_seconds: dict[str, float] = field(default_factory=dict)  # Хранилище -> секунды загрузки
+
+    @property
+    def success(self) -> bool:
+        """Архив целиком загружен во все хранилища."""
+        return not self.errors
+
+
+class _QueuedPartWriter(_SplitFileWriter):
+    """
+    Поток записи по частям, отдающий каждую готовую часть в колбэк.
+
+    Часть считается готовой, когда начинается следующая или поток закрывается.
+    Если часть оказалась единственной, она переименовывается в имя архива.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        archive_name: str,
+        extension: str,
+        max_part_size: int,
+        on_part: Callable[[int, str], None],
+        hash_algorithm: str | None = None,
+    ):
+        super().__init__(
+            output_dir, archive_name.removesuffix(extension), extension, max_part_size, hash_algorithm
+        )
+        self.archive_name = archive_name
+        self._on_part = on_part
+        self._final = False
+        self._aborted = False
+        self.wait_seconds = 0.0  # Ожидание места в очередях загрузки (входит в split_seconds)
+
+    def _close_part(self):
+        if self._current is None:
+            return
+        super()._close_part()
+        if self._aborted:
+            return
+        if self._final and len(self.parts) == 1:
+            single_path = os.path.join(self.output_dir, self.archive_name)
+            os.replace(self.parts[0], single_path)
+            self.parts[0] = single_path
+        start = time.perf_counter()
+        self._on_part(len(self.parts) - 1, self.parts[-1])
+        self.wait_seconds += time.perf_counter() - start
+
+    def close(self):
+        if self.closed:
+            return
+        # Последняя часть отдается здесь, вне write(): ее ожидание тоже входит в split_seconds
+        self._final = True
+        start = time.perf_counter()
+        super().close()
+        self.split_seconds += time.perf_counter() - start
+
+    def abort(self):
+        """Закрыть поток, не отдавая недописанную часть."""
+        self._aborted = True
+        super().close()
+
+
+class _TargetUploader(threading.Thread):
+    """Поток загрузки частей в одно хранилище из собственной ограниченной очереди."""
+
+    def __init__(
+        self,
+        target_id: str,
+        connector: "BaseConnector",
+        queue_depth: int,
+        on_done: Callable[[str], None],
+        cancelled: threading.Event,
+        log_callback: Callable[[str], None] | None = None,
+    ):
+        super().__init__(name=f"upload-{target_id}", daemon=True)
+        self.target_id = target_id
+        self.connector = connector
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_depth)
+        self.refs: list[str] = []
+        self.error: str | None = None
+        self.seconds = 0.0
+        self._on_done = on_done
+        self._cancelled = cancelled
+        self._log = log_callback
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            index, part_path, remote_name = item
+            try:
+                # После ошибки или отмены части только пропускаются, чтобы не держать очередь
+                if self.error is None and not self._cancelled.is_set():
+                    start = time.perf_counter()
+                    success, result = self.connector.upload_file(part_path, remote_path=remote_name)
+                    self.seconds += time.perf_counter() - start
+                    if success:
+                        self.refs.append(result)
+                        if self._log:
+                            self._log(f"Часть {index + 1} загружена в {self.connector.name}: {result}")
+                    else:
+                        self.error = result
+                        if self._log:
+                            self._log(f"Ошибка загрузки части {index + 1} в {self.connector.name}: {result}")
+            except Exception as e:
+                self.error = str(e)
+            finally:
+                self._on_done(part_path)
+
+
+class BackupEngine:
+    """
+    Конвейер бэкапа.
+
+    Архив пишется по частям в спул-папку. Каждая готовая часть сразу
+    ставится в очереди загрузки всех хранилищ, пока сжимается следующая.
+    Очереди ограничены queue_depth: если загрузка отстает, запись архива
+    ждет. Поэтому на диске одновременно не больше
+    (queue_depth + 2) частей на хранилище, а общее время приближается к
+    max(сжатие, загрузка), а не к их сумме. Часть удаляется, как только
+    ее обработали все хранилища.
+    """
+
+    DEFAULT_PART_SIZE = 512 * 1024 * 1024
+
+    def __init__(
+        self,
+        connectors: dict[str, "BaseConnector"],
+        spool_dir: str | None = None,
+        queue_depth: int = 2,
+        part_size: int | None = None,
+    ):
+        if not connectors:
+            raise ValueError("Не выбрано ни одного хранилища")
+        if queue_depth < 1:
+            raise ValueError("Глубина очереди должна быть не меньше 1")
+        self.connectors = connectors
+        self.spool_dir = spool_dir or tempfile.gettempdir()
+        self.queue_depth = queue_depth
+        self.part_size = part_size or self.DEFAULT_PART_SIZE
+
+    def effective_part_size(self) -> int:
+        """Размер части: не больше лимита самого строгого хранилища."""
+        limits = [self.part_size]
+        for connector in self.connectors.values():
+            limit = connector.get_max_file_size()
+            if limit:
+                limits.append(limit)
+        return min(limits)
+
+    def run(
+        self,
+        archive_name: str,
+        write_archive: Callable[[BinaryIO], tuple[int, int]],
+        hash_algorithm: str | None = None,
+        log_callback: Callable[[str], None] | None = None,
+        catalog: list[ArchiveMember] | None = None,
+        run_tag: str | None = None,
+    ) -> BackupRunResult:
+        """
+        Записать архив через write_archive и загрузить его части во все хранилища.
+
+        Args:
+            archive_name: Имя архива (с расширением формата)
+            write_archive: Функция, пишущая архив в переданный поток и
+                возвращающая (байт без сжатия, байт сжато), как ArchiveUtils.write_archive
+            hash_algorithm: Алгоритм хеша архива и частей (по умолчанию DEFAULT_HASH_ALGORITHM)
+            log_callback: Колбэк для сообщений о загрузке частей
+            catalog: Список, который write_archive заполняет каталогом ZIP
+                (смещения пересчитываются в части)
+            run_tag: Метка запуска в именах частей в хранилищах (по умолчанию
+                время запуска и случайный суффикс). Без нее каждый запуск
+                перезаписывал бы объекты предыдущего, и ссылки старых записей
+                истории указывали бы на новый архив
+
+        Returns:
+            Итоги запуска
+        """
+        run_tag = run_tag or f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        extension = ArchiveUtils.ARCHIVE_FORMATS.get(ArchiveUtils.detect_format(archive_name), "")
+        stem = archive_name.removesuffix(extension)
+        work_dir = tempfile.mkdtemp(prefix="spool_", dir=self.spool_dir)
+        pending: dict[str, int] = {}
+        lock = threading.Lock()
+        cancelled = threading.Event()
+
+        def on_done(part_path: str):
+            # Часть удаляется, когда ее обработали все хранилища
+            with lock:
+                pending[part_path] -= 1
+                if pending[part_path] == 0:
+                    del pending[part_path]
+                    Path(part_path).unlink(missing_ok=True)
+
+        uploaders = [
+            _TargetUploader(target_id, connector, self.queue_depth, on_done, cancelled, log_callback)
+            for target_id, connector in self.connectors.items()
+        ]
+
+        def on_part(index: int, part_path: str):
+            if all(uploader.error for uploader in uploaders):
+                raise RuntimeError("Загрузка не удалась ни в одно хранилище")
+            with lock:
+                pending[part_path] = len(uploaders)
+            # Имя части начинается с имени архива без расширения: метка ставится сразу после него
+            remote_name = f"{stem}_{run_tag}{os.path.basename(part_path)[len(stem):]}"
+            for uploader in uploaders:
+                uploader.queue.put((index, part_path, remote_name))
+
+        for uploader in uploaders:
+            uploader.start()
+
+        result = BackupRunResult(archive_name=archive_name)
+        part_size = self.effective_part_size()
+        writer = _QueuedPartWriter(work_dir, archive_name, extension, part_size, on_part, hash_algorithm)
+        start = time.perf_counter()
+        try:
+            result.stored_bytes, result.compressed_bytes = write_archive(writer)
+            writer.close()
+        finally:
+            # Хеширование и разбиение идут внутри записи архива: сжатие - остаток ее времени
+            elapsed = time.perf_counter() - start
+            result.stage_seconds = {
+                "compress": max(0.0, elapsed - writer.hash_seconds - writer.split_seconds),
+                "hash": writer.hash_seconds,
+                "split": max(0.0, writer.split_seconds - writer.wait_seconds),
+                "wait": writer.wait_seconds,
+            }
+            if not writer.closed:
+                # Архив не дописан: уже поставленные в очередь части не загружаем
+                cancelled.set()
+                writer.abort()
+            for uploader in uploaders:
+                uploader.queue.put(None)
+            for uploader in uploaders:
+                uploader.join()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        archive = writer.result()
+        result.file_hash = archive.file_hash
+        result.hash_algorithm = archive.hash_algorithm
+        result.size = archive.size
+        result.parts = [os.path.basename(part) for part in archive.parts]
+        result.part_hashes = archive.part_hashes
+        result.part_size = part_size
+        if catalog is not None:
+            result.members = ArchiveUtils.split_catalog(catalog, part_size)
+            result.file_count = len(catalog)
+        for uploader in uploaders:
+            result.upload_seconds[uploader.target_id] = uploader.seconds
+            if uploader.error is None and len(uploader.refs) == len(archive.parts):
+                result.remote_refs[uploader.target_id] = uploader.refs
+            else:
+                result.errors[uploader.target_id] = uploader.error or "Загружены не все части"
+        return result
+
+    def backup(
+        self,
+        source_path: str,
+        archive_name: str,
+        archive_format: str = "zip",
+        compression_level: int = 6,
+        exclude_patterns: list[str] | None = None,
+        progress_callback: Callable[[str, int, int], None] | None = None,
+        workers: int | None = None,
+        smart_compression: bool = True,
+        log_callback: Callable[[str], None] | None = None,
+        run_tag: str | None = None,
+    ) -> BackupRunResult:
+        """
+        Полный бэкап папки через конвейер.
+
+        Args:
+            source_path: Путь к исходной папке
+            archive_name: Имя архива
+            archive_format: Формат архива (ключ ArchiveUtils.ARCHIVE_FORMATS)
+            compression_level: Уровень сжатия (0-9)
+            exclude_patterns: Паттерны для исключения
+            progress_callback: Колбэк (filename, current, total)
+            workers: Число процессов для сжатия ZIP (None - по числу ядер)
+            smart_compression: Не сжимать несжимаемые файлы
+            log_callback: Колбэк для сообщений о загрузке частей
+            run_tag: Метка запуска в именах частей в хранилищах (см. run)
+
+        Returns:
+            Итоги запуска
+        """
+        catalog = []
+        total_files = 0
+
+        def on_progress(filename: str, current: int, total: int):
+            nonlocal total_files
+            total_files = total
+            if progress_callback:
+                progress_callback(filename, current, total)
+
+        result = self.run(
+            archive_name,
+            lambda sink: ArchiveUtils.write_archive(
+                sink, source_path, archive_format, compression_level, exclude_patterns, on_progress,
+                workers, smart_compression=smart_compression, catalog=catalog,
+            ),
+            log_callback=log_callback,
+            catalog=catalog,
+            run_tag=run_tag,
+        )
+        # Каталог есть только у ZIP; для tar число файлов берется из прогресса
+        result.file_count = result.file_count or total_files
+        return result
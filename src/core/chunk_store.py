@@ -0,0 +1,346 @@
+"""Хранилище чанков с дедупликацией между запусками."""
+
+import hashlib
+import os
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Callable, Iterator
+
+from .archive_utils import ArchiveUtils
+from .database import Database
+
+try:
+    import numpy as np
+except ImportError:  # Без numpy граница ищется медленным циклом по байтам
+    np = None
+
+if TYPE_CHECKING:
+    from ..connectors.base import BaseConnector
+
+# Таблица gear-хеша: 256 фиксированных 64-битных чисел, одинаковых между запусками
+_GEAR = tuple(
+    int.from_bytes(hashlib.blake2b(bytes([i]), digest_size=8).digest(), "little") for i in range(256)
+)
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+_GEAR_NP = np.array(_GEAR, dtype=np.uint64) if np is not None else None
+_CUT_BLOCK = 16 * 1024  # Сколько байт хешируется за один проход numpy (блок помещается в кэш)
+
+
+def _high_bits_mask(bits: int) -> int:
+    """Маска из старших бит - они зависят от последних 64 байт окна."""
+    return ((1 << bits) - 1) << (64 - bits)
+
+
+class ContentDefinedChunker:
+    """
+    Нарезка данных на чанки по содержимому (gear-хеш, нормализация как в FastCDC).
+
+    Границы чанков определяются самими данными, поэтому вставка или удаление
+    байт в начале файла сдвигает только соседние чанки, а не все последующие.
+    """
+
+    def __init__(self, min_size: int = 256 * 1024, avg_size: int = 1024 * 1024, max_size: int = 4 * 1024 * 1024):
+        if not 0 < min_size <= avg_size <= max_size:
+            raise ValueError("Ожидается 0 < min_size <= avg_size <= max_size")
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+        bits = max(avg_size.bit_length() - 1, 1)
+        # До среднего размера граница ставится реже, после - чаще
+        self._mask_small = _high_bits_mask(bits + 2)
+        self._mask_large = _high_bits_mask(max(bits - 2, 1))
+
+    def _cut_point(self, data: bytes) -> int:
+        """Найти длину первого чанка в data."""
+        size = len(data)
+        if size <= self.min_size:
+            return size
+        if np is not None:
+            return self._cut_point_vectorized(data)
+        return self._cut_point_loop(data)
+
+    def _cut_point_vectorized(self, data: bytes) -> int:
+        """
+        То же, что _cut_point_loop, но хеш всех позиций блока считается разом.
+
+        После сдвига на 64 бита байт выпадает из хеша, поэтому хеш позиции i -
+        это сумма gear[data[i - j]] << j по последним 64 байтам. Она считается
+        удвоением окна (1, 2, 4, ... 64) за 6 векторных сложений.
+        """
+        size = len(data)
+        normal = min(self.avg_size, size)
+        end = min(self.max_size, size)
+        pos = self.min_size
+        while pos < end:
+            stop = min(pos + _CUT_BLOCK, end)
+            # 63 байта перед блоком входят в окно; до min_size хеш начинается с нуля
+            start = max(pos - 63, self.min_size)
+            h = _GEAR_NP[np.frombuffer(data, dtype=np.uint8, count=stop - start, offset=start)]
+            spare = np.empty_like(h)
+            shift = 1
+            while shift < 64:
+                spare[:shift] = h[:shift]
+                np.left_shift(h[:-shift], np.uint64(shift), out=spare[shift:])
+                np.add(spare[shift:], h[shift:], out=spare[shift:])
+                h, spare = spare, h
+                shift *= 2
+
+            # До среднего размера действует строгая маска, после - мягкая
+            segments = ((pos, min(stop, normal), self._mask_small), (max(pos, normal), stop, self._mask_large))
+            for lo, hi, mask in segments:
+                if lo < hi:
+                    hits = np.flatnonzero((h[lo - start:hi - start] & np.uint64(mask)) == 0)
+                    if hits.size:
+                        return lo + int(hits[0]) + 1
+            pos = stop
+        return end
+
+    def _cut_point_loop(self, data: bytes) -> int:
+        size = len(data)
+        gear = _GEAR
+        h = 0
+        normal = min(self.avg_size, size)
+        end = min(self.max_size, size)
+
+        mask = self._mask_small
+        for i in range(self.min_size, normal):
+            h = ((h << 1) + gear[data[i]]) & _MASK64
+            if not h & mask:
+                return i + 1
+
+        mask = self._mask_large
+        for i in range(normal, end):
+            h = ((h << 1) + gear[data[i]]) & _MASK64
+            if not h & mask:
+                return i + 1
+
+        return end
+
+    def split(self, stream: BinaryIO) -> Iterator[bytes]:
+        """
+        Нарезать поток на чанки.
+
+        Args:
+            stream: Открытый на чтение бинарный поток
+
+        Yields:
+            Данные очередного чанка
+        """
+        buffer = b""
+        eof = False
+        while True:
+            while not eof and len(buffer) < self.max_size:
+                data = stream.read(self.max_size)
+                if not data:
+                    eof = True
+                buffer += data
+            if not buffer:
+                return
+            cut = self._cut_point(buffer)
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+
+
+@dataclass
+class ChunkSnapshotStats:
+    """
+    Итоги сохранения снимка в хранилище чанков.
+    """
+
+    snapshot_id: str
+    files: int = 0
+    total_bytes: int = 0
+    chunks: int = 0
+    new_chunks: int = 0
+    new_bytes: int = 0
+    uploaded_bytes: int = 0
+    packs: list[str] = field(default_factory=list)
+
+
+class _PackWriter:
+    """Пак с новыми чанками для одного хранилища."""
+
+    def __init__(self, work_dir: str, target_id: str):
+        self.id = str(uuid.uuid4())
+        self.target_id = target_id
+        self.path = os.path.join(work_dir, f"pack-{self.id}.bin")
+        self.chunks: list[tuple[bytes, int, int]] = []
+        self.size = 0
+        self._file = open(self.path, "wb")
+
+    def add(self, chunk_hash: bytes, data: bytes):
+        self._file.write(data)
+        self.chunks.append((chunk_hash, self.size, len(data)))
+        self.size += len(data)
+
+    def close(self):
+        self._file.close()
+
+
+class ChunkStore:
+    """
+    Дедупликация на уровне чанков с выгрузкой паками через коннекторы.
+
+    Файлы режутся ContentDefinedChunker, чанк идентифицируется SHA-256.
+    В пак попадают только чанки, которых еще нет в хранилище: индекс
+    чанков (хранилище, хеш) -> (пак, смещение, длина) лежит в SQLite.
+    Пак выгружается, когда достигает pack_size, поэтому объем выгрузки
+    пропорционален измененным данным, а не размеру всего дерева.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        targets: dict[str, "BaseConnector"],
+        work_dir: str,
+        pack_size: int = 64 * 1024 * 1024,
+        chunker: ContentDefinedChunker | None = None,
+        compression_level: int = 6,
+    ):
+        self.db = db
+        self.targets = targets
+        self.work_dir = work_dir
+        self.pack_size = pack_size
+        self.chunker = chunker or ContentDefinedChunker()
+        self.compression_level = compression_level
+        self._packs: dict[str, _PackWriter] = {}
+        self._known: dict[str, set[bytes]] = {}
+
+    def backup(
+        self,
+        source_path: str,
+        backup_point_id: str,
+        exclude_patterns: list[str] | None = None,
+        progress_callback: Callable[[str, int, int], None] | None = None,
+    ) -> ChunkSnapshotStats:
+        """
+        Сохранить снимок папки.
+
+        Args:
+            source_path: Путь к исходной папке
+            backup_point_id: ID точки бэкапа
+            exclude_patterns: Паттерны для исключения
+            progress_callback: Колбэк (filename, current, total)
+
+        Returns:
+            Статистика снимка
+        """
+        Path(self.work_dir).mkdir(parents=True, exist_ok=True)
+
+        files = ArchiveUtils.scan_tree(source_path, exclude_patterns).entries
+
+        stats = ChunkSnapshotStats(snapshot_id=str(uuid.uuid4()))
+        # Индекс чанков читается один раз на хранилище, дальше проверка - поиск в множестве
+        self._known = {target_id: self.db.get_chunk_hashes(target_id) for target_id in self.targets}
+        recipes = []
+
+        try:
+            for processed, entry in enumerate(files, start=1):
+                recipe = bytearray()
+                size = 0
+                with open(entry.path, "rb") as f:
+                    for data in self.chunker.split(f):
+                        chunk_hash = hashlib.sha256(data).digest()
+                        recipe += chunk_hash
+                        size += len(data)
+                        stats.chunks += 1
+                        if self._store_chunk(chunk_hash, data, stats):
+                            stats.new_chunks += 1
+                            stats.new_bytes += len(data)
+
+                recipes.append((entry.rel_path, size, bytes(recipe)))
+                stats.files += 1
+                stats.total_bytes += size
+
+                if progress_callback:
+                    progress_callback(entry.path, processed, len(files))
+
+            for target_id in list(self._packs):
+                self._flush_pack(target_id, stats)
+        finally:
+            for pack in self._packs.values():
+                pack.close()
+                Path(pack.path).unlink(missing_ok=True)
+            self._packs = {}
+            self._known = {}
+
+        self.db.add_chunk_snapshot(stats.snapshot_id, backup_point_id, recipes)
+        return stats
+
+    def _store_chunk(self, chunk_hash: bytes, data: bytes, stats: ChunkSnapshotStats) -> bool:
+        """Положить чанк в паки тех хранилищ, где его еще нет."""
+        missing = [target_id for target_id in self.targets if chunk_hash not in self._known[target_id]]
+        if not missing:
+            return False
+
+        compressed = zlib.compress(data, self.compression_level)
+        for target_id in missing:
+            pack = self._packs.get(target_id)
+            if pack is None:
+                pack = self._packs[target_id] = _PackWriter(self.work_dir, target_id)
+            pack.add(chunk_hash, compressed)
+            self._known[target_id].add(chunk_hash)
+            if pack.size >= self.pack_size:
+                self._flush_pack(target_id, stats)
+        return True
+
+    def _flush_pack(self, target_id: str, stats: ChunkSnapshotStats):
+        """Выгрузить пак и записать его чанки в индекс."""
+        pack = self._packs.pop(target_id)
+        pack.close()
+        try:
+            success, remote_ref = self.targets[target_id].upload_file(pack.path)
+            if not success:
+                raise RuntimeError(f"Ошибка загрузки пака в {target_id}: {remote_ref}")
+            self.db.add_pack(pack.id, target_id, remote_ref, pack.size, pack.chunks)
+        finally:
+            Path(pack.path).unlink(missing_ok=True)
+
+        stats.uploaded_bytes += pack.size
+        stats.packs.append(pack.id)
+
+    def restore(
+        self,
+        snapshot_id: str,
+        target_id: str,
+        output_dir: str,
+        fetch_pack: Callable[[str], str],
+    ) -> int:
+        """
+        Восстановить снимок из паков хранилища.
+
+        Args:
+            snapshot_id: ID снимка
+            target_id: ID хранилища, из которого берутся паки
+            output_dir: Папка для восстановленных файлов
+            fetch_pack: Функция, скачивающая пак по remote_ref и возвращающая локальный путь
+
+        Returns:
+            Число восстановленных файлов
+
+        Raises:
+            RuntimeError: Если чанк в паке не совпадает с хешем из снимка
+        """
+        pack_paths: dict[str, str] = {}
+        restored = 0
+        for rel_path, _, recipe in self.db.get_chunk_snapshot_files(snapshot_id):
+            hashes = [recipe[i:i + 32] for i in range(0, len(recipe), 32)]
+            locations = self.db.get_chunk_locations(target_id, hashes)
+
+            out_path = Path(output_dir) / rel_path
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(out_path, "wb") as out:
+                for chunk_hash in hashes:
+                    remote_ref, offset, length = locations[chunk_hash]
+                    if remote_ref not in pack_paths:
+                        pack_paths[remote_ref] = fetch_pack(remote_ref)
+                    with open(pack_paths[remote_ref], "rb") as pack:
+                        pack.seek(offset)
+                        data = zlib.decompress(pack.read(length))
+                    if hashlib.sha256(data).digest() != chunk_hash:
+                        raise RuntimeError(f"Чанк {chunk_hash.hex()} файла {rel_path} поврежден")
+                    out.write(data)
+            restored += 1
+        return restored
@@ -1,34 +1,180 @@
 """Модуль работы с SQLite базой данных."""
 
 import json
+import math
 import os
 import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import replace
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator
 
-from ..models import BackupPoint, ConnectionConfig, FileRecord
+from ..models import (
+    ArchiveMember, BackupPoint, BackupRun, ConnectionConfig, ConnectionType, FileRecord, HistoryFilter,
+    ManifestEntry, RetentionPolicy,
+)
+from ..models.backup_run import UPLOAD_STAGE
+
+
+class _RowCache:
+    """
+    Кэш объектов таблицы по id с признаком полной загрузки.
+
+    Поколение увеличивается при каждой инвалидации: результат чтения,
+    начатого до записи, в кэш не попадает.
+    """
+
+    def __init__(self):
+        self._items: dict[str, Any] = {}
+        self._order: list[str] | None = None  # Порядок полной выборки; None - таблица не загружена целиком
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, load: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._items:
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            generation = self._generation
+        item = load()
+        with self._lock:
+            if item is not None and generation == self._generation:
+                self._items[key] = item
+        return item
+
+    def get_all(self, load: Callable[[], list[Any]]) -> list[Any]:
+        with self._lock:
+            if self._order is not None:
+                self.hits += 1
+                return [self._items[key] for key in self._order]
+            self.misses += 1
+            generation = self._generation
+        items = load()
+        with self._lock:
+            if generation == self._generation:
+                self._items = {item.id: item for item in items}
+                self._order = list(self._items)
+        return items
+
+    def invalidate(self, key: str | None = None):
+        with self._lock:
+            self._generation += 1
+            self._order = None
+            if key is None:
+                self._items.clear()
+            else:
+                self._items.pop(key, None)
 
 
 class Database:
-    """Работа с SQLite базой данных."""
+    """
+    Работа с SQLite базой данных.
+
+    Каждый поток держит одно открытое соединение на все вызовы: открытие
+    файла, чтение схемы и fsync на каждый запрос больше не повторяются.
+    Журнал WAL позволяет читать из других потоков во время записи, а
+    synchronous=NORMAL в этом режиме не делает fsync на каждый коммит
+    (при сбое питания теряется только последняя транзакция, БД остается целой).
+    """
+
+    CACHED_STATEMENTS = 256
+    MMAP_SIZE = 64 * 1024 * 1024
+    BUSY_TIMEOUT = 5.0  # Секунды ожидания блокировки записи другим потоком
+    SCHEMA_VERSION = 4
 
     def __init__(self, db_path: str | None = None):
         if db_path is None:
             base_dir = Path(__file__).parent.parent.parent
             db_path = str(base_dir / "data" / "backup_history.db")
         self.db_path = db_path
+        self._local = threading.local()
+        self._connections: dict[threading.Thread, sqlite3.Connection] = {}
+        self._connections_lock = threading.Lock()
+        # Точки и подключения читаются при каждом обновлении вкладок и запуске бэкапа.
+        # Возвращаются общие экземпляры: изменения сохраняйте через update_*/add_*
+        self._point_cache = _RowCache()
+        self._connection_cache = _RowCache()
         self._ensure_db_exists()
 
-    def _get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+    def _get_connection(self) -> sqlite3.Connection:
+        """Соединение текущего потока (открывается при первом обращении)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: транзакции открываются явно в transaction(),
+            # чтения идут без них. check_same_thread=False нужен только для close()
+            conn = sqlite3.connect(
+                self.db_path, timeout=self.BUSY_TIMEOUT, isolation_level=None,
+                check_same_thread=False, cached_statements=self.CACHED_STATEMENTS,
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={self.MMAP_SIZE}")
+            # INSERT OR REPLACE должен вызывать триггеры удаления, иначе статистика хранилищ задвоится
+            conn.execute("PRAGMA recursive_triggers=ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                # Соединения завершившихся потоков (воркеры бэкапа) больше не нужны
+                for thread in [t for t in self._connections if not t.is_alive()]:
+                    self._connections.pop(thread).close()
+                self._connections[threading.current_thread()] = conn
         return conn
 
-    def _ensure_db_exists(self):
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Транзакция на соединении текущего потока: коммит при выходе, откат при ошибке.
+
+        Вложенный вызов выполняется внутри внешней транзакции, поэтому
+        несколько методов записи можно объединить в один коммит:
+
+            with db.transaction():
+                db.add_file_records(records)
+                db.save_manifest(point_id, entries, deleted)
+        """
         conn = self._get_connection()
+        if conn.in_transaction:
+            yield conn.cursor()
+            return
+        # IMMEDIATE: блокировка записи берется сразу и ждет BUSY_TIMEOUT; отложенная
+        # транзакция при повышении до записи в WAL сразу падает с "database is locked"
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.invalidations = []
         try:
-            cursor = conn.cursor()
+            yield conn.cursor()
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+        finally:
+            # Повторная инвалидация после коммита: другой поток мог успеть
+            # закэшировать строку, прочитав ее до коммита
+            for cache, key in self._local.invalidations:
+                cache.invalidate(key)
+            self._local.invalidations = []
+
+    def _invalidate(self, cache: _RowCache, key: str):
+        cache.invalidate(key)
+        if self._get_connection().in_transaction:
+            self._local.invalidations.append((cache, key))
+
+    def _ensure_db_exists(self):
+        conn = self._get_connection()
+        rebuild_search = False
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Режим INCREMENTAL нужен compact(); у существующей БД он включается только через VACUUM
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            # VACUUM может перенумеровать rowid, на которые ссылается поисковый индекс
+            rebuild_search = True
+
+        with self.transaction() as cursor:
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS backup_points (
                     id TEXT PRIMARY KEY,
@@ -38,7 +184,10 @@ class Database:
                     compression_level INTEGER DEFAULT 6,
                     exclude_patterns TEXT,
                     created_at TEXT NOT NULL,
-                    last_run TEXT
+                    last_run TEXT,
+                    incremental INTEGER NOT NULL DEFAULT 0,
+                    archive_format TEXT NOT NULL DEFAULT 'zip',
+                    retention TEXT
                 )
             """)
             cursor.execute("""
@@ -58,181 +207,1126 @@ class Database:
                     file_hash TEXT NOT NULL,
                     file_size INTEGER NOT NULL,
                     uploaded_at TEXT NOT NULL,
-                    targets TEXT,
                     archive_parts TEXT,
+                    parent_id TEXT,
+                    hash_algorithm TEXT NOT NULL DEFAULT 'md5',
+                    part_hashes TEXT,
+                    part_size INTEGER NOT NULL DEFAULT 0,
                     FOREIGN KEY (backup_point_id) REFERENCES backup_points(id)
                 )
             """)
+            # Каталог ZIP архивов: где в частях лежит каждый файл
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS archive_members (
+                    record_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    compressed_size INTEGER NOT NULL,
+                    crc INTEGER NOT NULL,
+                    compress_type INTEGER NOT NULL,
+                    part_index INTEGER NOT NULL,
+                    part_offset INTEGER NOT NULL,
+                    PRIMARY KEY (record_id, name),
+                    FOREIGN KEY (record_id) REFERENCES file_records(id)
+                )
+            """)
+            # Хранилища записи. Хеш продублирован, чтобы проверка дедупликации
+            # была поиском по индексу (file_hash, target_id)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS file_record_targets (
+                    record_id TEXT NOT NULL,
+                    target_id TEXT NOT NULL,
+                    file_hash TEXT NOT NULL,
+                    hash_algorithm TEXT NOT NULL,
+                    remote_ref TEXT,
+                    uploaded_at TEXT NOT NULL,
+                    PRIMARY KEY (record_id, target_id),
+                    FOREIGN KEY (record_id) REFERENCES file_records(id)
+                ) WITHOUT ROWID
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS file_manifest (
+                    backup_point_id TEXT NOT NULL,
+                    rel_path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    PRIMARY KEY (backup_point_id, rel_path)
+                ) WITHOUT ROWID
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS packs (
+                    id TEXT PRIMARY KEY,
+                    target_id TEXT NOT NULL,
+                    remote_ref TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    target_id TEXT NOT NULL,
+                    hash BLOB NOT NULL,
+                    pack_id TEXT NOT NULL,
+                    pack_offset INTEGER NOT NULL,
+                    pack_length INTEGER NOT NULL,
+                    PRIMARY KEY (target_id, hash),
+                    FOREIGN KEY (pack_id) REFERENCES packs(id)
+                ) WITHOUT ROWID
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chunk_snapshots (
+                    id TEXT PRIMARY KEY,
+                    backup_point_id TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS snapshot_files (
+                    snapshot_id TEXT NOT NULL,
+                    rel_path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    chunks BLOB NOT NULL,
+                    PRIMARY KEY (snapshot_id, rel_path),
+                    FOREIGN KEY (snapshot_id) REFERENCES chunk_snapshots(id)
+                ) WITHOUT ROWID
+            """)
+            # Журнал запусков: по строке на запуск и на каждый этап (загрузка - по хранилищам)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS backup_runs (
+                    id TEXT PRIMARY KEY,
+                    backup_point_id TEXT NOT NULL,
+                    record_id TEXT,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT,
+                    bytes_in INTEGER NOT NULL DEFAULT 0,
+                    bytes_out INTEGER NOT NULL DEFAULT 0,
+                    file_count INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS backup_run_stages (
+                    run_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    target_id TEXT NOT NULL DEFAULT '',
+                    seconds REAL,
+                    bytes INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    PRIMARY KEY (run_id, stage, target_id),
+                    FOREIGN KEY (run_id) REFERENCES backup_runs(id)
+                ) WITHOUT ROWID
+            """)
+            self._add_missing_columns(cursor, "backup_points", {
+                "incremental": "INTEGER NOT NULL DEFAULT 0",
+                "archive_format": "TEXT NOT NULL DEFAULT 'zip'",
+                "retention": "TEXT",
+            })
+            # Записи до появления выбора алгоритма посчитаны MD5
+            self._add_missing_columns(cursor, "file_records", {
+                "parent_id": "TEXT",
+                "hash_algorithm": "TEXT NOT NULL DEFAULT 'md5'",
+                "part_hashes": "TEXT",
+                "part_size": "INTEGER NOT NULL DEFAULT 0",
+            })
+            # Полнотекстовый индекс путей (trigram - поиск по любой подстроке от 3 символов).
+            # Содержимое берется из file_records по rowid: после VACUUM индекс нужно перестроить
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS file_records_fts USING fts5(
+                    file_path, content='file_records', content_rowid='rowid', tokenize='trigram'
+                )
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS file_records_fts_insert AFTER INSERT ON file_records BEGIN
+                    INSERT INTO file_records_fts(rowid, file_path) VALUES (new.rowid, new.file_path);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS file_records_fts_delete AFTER DELETE ON file_records BEGIN
+                    INSERT INTO file_records_fts(file_records_fts, rowid, file_path)
+                    VALUES ('delete', old.rowid, old.file_path);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS file_records_fts_update AFTER UPDATE OF file_path ON file_records BEGIN
+                    INSERT INTO file_records_fts(file_records_fts, rowid, file_path)
+                    VALUES ('delete', old.rowid, old.file_path);
+                    INSERT INTO file_records_fts(rowid, file_path) VALUES (new.rowid, new.file_path);
+                END
+            """)
+            # Такой же индекс по именам файлов внутри архивов (rowid из archive_members)
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS archive_members_fts USING fts5(
+                    name, content='archive_members', content_rowid='rowid', tokenize='trigram'
+                )
+            """)
+            self._create_usage_tables(cursor)
+            self._migrate(cursor)
+            # Триггеры каталога создаются после миграции: она может пересоздать таблицу
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS archive_members_fts_insert AFTER INSERT ON archive_members BEGIN
+                    INSERT INTO archive_members_fts(rowid, name) VALUES (new.rowid, new.name);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS archive_members_fts_delete AFTER DELETE ON archive_members BEGIN
+                    INSERT INTO archive_members_fts(archive_members_fts, rowid, name)
+                    VALUES ('delete', old.rowid, old.name);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS archive_members_fts_update AFTER UPDATE OF name ON archive_members BEGIN
+                    INSERT INTO archive_members_fts(archive_members_fts, rowid, name)
+                    VALUES ('delete', old.rowid, old.name);
+                    INSERT INTO archive_members_fts(rowid, name) VALUES (new.rowid, new.name);
+                END
+            """)
+            if rebuild_search:
+                cursor.execute("INSERT INTO file_records_fts(file_records_fts) VALUES ('rebuild')")
+                cursor.execute("INSERT INTO archive_members_fts(archive_members_fts) VALUES ('rebuild')")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_file_hash ON file_records(file_hash)")
-            conn.commit()
-        finally:
-            conn.close()
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_record_targets_hash ON file_record_targets(file_hash, target_id)"
+            )
+            # Индексы под постраничную выборку истории по ключу (uploaded_at, id)
+            cursor.execute("DROP INDEX IF EXISTS idx_backup_point")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_backup_point_uploaded ON file_records(backup_point_id, uploaded_at, id)"
+            )
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_uploaded ON file_records(uploaded_at, id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_chunks_pack ON chunks(pack_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_runs_point ON backup_runs(backup_point_id, started_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_runs_started ON backup_runs(started_at)")
+
+    def _migrate(self, cursor: sqlite3.Cursor):
+        """Перенести данные старых версий БД (версия хранится в PRAGMA user_version)."""
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
+        if version < 1:
+            # Хранилища и ссылки переезжают из JSON-колонок file_records в file_record_targets
+            cursor.execute("PRAGMA table_info(file_records)")
+            columns = {row["name"] for row in cursor.fetchall()}
+            if "targets" in columns:
+                remote_ref = "json_extract(f.remote_refs, '$.\"' || t.value || '\"')" if "remote_refs" in columns else "NULL"
+                cursor.execute(
+                    f"""INSERT OR IGNORE INTO file_record_targets
+                        SELECT f.id, t.value, f.file_hash, f.hash_algorithm, {remote_ref}, f.uploaded_at
+                        FROM file_records f, json_each(COALESCE(f.targets, '[]')) t"""
+                )
+                cursor.execute("ALTER TABLE file_records DROP COLUMN targets")
+            if "remote_refs" in columns:
+                cursor.execute(
+                    """INSERT OR IGNORE INTO file_record_targets
+                       SELECT f.id, t.key, f.file_hash, f.hash_algorithm, t.value, f.uploaded_at
+                       FROM file_records f, json_each(COALESCE(f.remote_refs, '{}')) t"""
+                )
+                cursor.execute("ALTER TABLE file_records DROP COLUMN remote_refs")
+        if version < 2:
+            # Записи, сохраненные до появления поискового индекса
+            cursor.execute("INSERT INTO file_records_fts(file_records_fts) VALUES ('rebuild')")
+        if version < 3:
+            # Записи, сохраненные до появления статистики
+            self._rebuild_usage(cursor)
+        if version < 4:
+            # Каталог архивов был WITHOUT ROWID, а поисковому индексу имен нужен rowid
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'archive_members'")
+            if "WITHOUT ROWID" in cursor.fetchone()[0].upper():
+                cursor.execute("ALTER TABLE archive_members RENAME TO archive_members_old")
+                cursor.execute(
+                    """SELECT replace(sql, 'archive_members_old', 'archive_members') FROM sqlite_master
+                       WHERE type = 'table' AND name = 'archive_members_old'"""
+                )
+                sql = cursor.fetchone()[0]
+                cursor.execute(sql[:sql.upper().rindex("WITHOUT ROWID")])
+                cursor.execute("INSERT INTO archive_members SELECT * FROM archive_members_old")
+                cursor.execute("DROP TABLE archive_members_old")
+            cursor.execute("INSERT INTO archive_members_fts(archive_members_fts) VALUES ('rebuild')")
+        cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    @staticmethod
+    def _create_usage_tables(cursor: sqlite3.Cursor):
+        """
+        Статистика хранения по хранилищам, точкам и дням, которую триггеры
+        обновляют при каждой записи и удалении.
+
+        usage_hashes считает записи с одним хешем в хранилище: unique_bytes
+        растет только на первой из них. Разница с bytes - повторно загруженные
+        одинаковые архивы: бэкап не пропускает загрузку по хешу, так что эти
+        байты действительно лежат в хранилище.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS usage_by_target (
+                target_id TEXT PRIMARY KEY,
+                records INTEGER NOT NULL,
+                bytes INTEGER NOT NULL,
+                unique_bytes INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS usage_hashes (
+                target_id TEXT NOT NULL,
+                file_hash TEXT NOT NULL,
+                refs INTEGER NOT NULL,
+                PRIMARY KEY (target_id, file_hash)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS usage_by_point (
+                backup_point_id TEXT PRIMARY KEY,
+                records INTEGER NOT NULL,
+                bytes INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS usage_by_day (
+                day TEXT PRIMARY KEY,
+                records INTEGER NOT NULL,
+                bytes INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS usage_records_insert AFTER INSERT ON file_records BEGIN
+                INSERT INTO usage_by_point VALUES (new.backup_point_id, 1, new.file_size)
+                    ON CONFLICT (backup_point_id) DO UPDATE SET records = records + 1, bytes = bytes + excluded.bytes;
+                INSERT INTO usage_by_day VALUES (substr(new.uploaded_at, 1, 10), 1, new.file_size)
+                    ON CONFLICT (day) DO UPDATE SET records = records + 1, bytes = bytes + excluded.bytes;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS usage_records_delete AFTER DELETE ON file_records BEGIN
+                UPDATE usage_by_point SET records = records - 1, bytes = bytes - old.file_size
+                    WHERE backup_point_id = old.backup_point_id;
+                DELETE FROM usage_by_point WHERE backup_point_id = old.backup_point_id AND records <= 0;
+                UPDATE usage_by_day SET records = records - 1, bytes = bytes - old.file_size
+                    WHERE day = substr(old.uploaded_at, 1, 10);
+                DELETE FROM usage_by_day WHERE day = substr(old.uploaded_at, 1, 10) AND records <= 0;
+            END
+        """)
+        # Размер берется из file_records: хранилища записываются после записи и удаляются до нее
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS usage_targets_insert AFTER INSERT ON file_record_targets BEGIN
+                INSERT INTO usage_hashes VALUES (new.target_id, new.file_hash, 1)
+                    ON CONFLICT (target_id, file_hash) DO UPDATE SET refs = refs + 1;
+                INSERT INTO usage_by_target
+                    SELECT new.target_id, 1, f.file_size, iif(h.refs = 1, f.file_size, 0)
+                    FROM file_records f, usage_hashes h
+                    WHERE f.id = new.record_id AND h.target_id = new.target_id AND h.file_hash = new.file_hash
+                    ON CONFLICT (target_id) DO UPDATE SET records = records + 1,
+                        bytes = bytes + excluded.bytes, unique_bytes = unique_bytes + excluded.unique_bytes;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS usage_targets_delete AFTER DELETE ON file_record_targets BEGIN
+                UPDATE usage_by_target SET
+                    records = records - 1,
+                    bytes = bytes - ifnull((SELECT file_size FROM file_records WHERE id = old.record_id), 0),
+                    unique_bytes = unique_bytes - ifnull((
+                        SELECT f.file_size FROM file_records f, usage_hashes h
+                        WHERE f.id = old.record_id AND h.target_id = old.target_id
+                          AND h.file_hash = old.file_hash AND h.refs = 1
+                    ), 0)
+                    WHERE target_id = old.target_id;
+                DELETE FROM usage_by_target WHERE target_id = old.target_id AND records <= 0;
+                UPDATE usage_hashes SET refs = refs - 1 WHERE target_id = old.target_id AND file_hash = old.file_hash;
+                DELETE FROM usage_hashes WHERE target_id = old.target_id AND file_hash = old.file_hash AND refs <= 0;
+            END
+        """)
+
+    @staticmethod
+    def _rebuild_usage(cursor: sqlite3.Cursor):
+        """Пересчитать статистику хранения по всем записям."""
+        for table in ("usage_by_target", "usage_hashes", "usage_by_point", "usage_by_day"):
+            cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(
+            """INSERT INTO usage_hashes
+               SELECT target_id, file_hash, COUNT(*) FROM file_record_targets GROUP BY target_id, file_hash"""
+        )
+        cursor.execute(
+            """INSERT INTO usage_by_target
+               SELECT t.target_id, COUNT(*), SUM(f.file_size), SUM(iif(t.first, f.file_size, 0))
+               FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY target_id, file_hash) = 1 AS first
+                     FROM file_record_targets) t
+               JOIN file_records f ON f.id = t.record_id
+               GROUP BY t.target_id"""
+        )
+        cursor.execute(
+            """INSERT INTO usage_by_point
+               SELECT backup_point_id, COUNT(*), SUM(file_size) FROM file_records GROUP BY backup_point_id"""
+        )
+        cursor.execute(
+            """INSERT INTO usage_by_day
+               SELECT substr(uploaded_at, 1, 10), COUNT(*), SUM(file_size) FROM file_records
+               GROUP BY substr(uploaded_at, 1, 10)"""
+        )
+
+    @staticmethod
+    def _add_missing_columns(cursor: sqlite3.Cursor, table: str, columns: dict[str, str]):
+        """Добавить колонки, которых нет в таблице из старой версии БД."""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row["name"] for row in cursor.fetchall()}
+        for name, definition in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
 
     def add_backup_point(self, point: BackupPoint) -> str:
-        conn = self._get_connection()
-        try:
-            cursor = conn.cursor()
+        with self.transaction() as cursor:
             cursor.execute(
-                """INSERT INTO backup_points VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                """INSERT INTO backup_points (id, name, source_path, schedule, compression_level,
+                   exclude_patterns, created_at, last_run, incremental, archive_format, retention)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
                 (point.id, point.name, point.source_path, point.schedule,
                  point.compression_level, json.dumps(point.exclude_patterns),
-                 point.created_at.isoformat(), point.last_run.isoformat() if point.last_run else None),
+                 point.created_at.isoformat(), point.last_run.isoformat() if point.last_run else None,
+                 int(point.incremental), point.archive_format, json.dumps(point.retention.to_dict())),
             )
-            conn.commit()
-            return point.id
-        finally:
-            conn.close()
+        self._invalidate(self._point_cache, point.id)
+        return point.id
+
+    @staticmethod
+    def _row_to_backup_point(row: sqlite3.Row) -> BackupPoint:
+        return BackupPoint(
+            id=row["id"], name=row["name"], source_path=row["source_path"],
+            schedule=row["schedule"], compression_level=row["compression_level"],
+            exclude_patterns=json.loads(row["exclude_patterns"] or "[]"),
+            incremental=bool(row["incremental"]),
+            archive_format=row["archive_format"],
+            retention=RetentionPolicy.from_dict(json.loads(row["retention"] or "{}")),
+            created_at=datetime.fromisoformat(row["created_at"]),
+            last_run=datetime.fromisoformat(row["last_run"]) if row["last_run"] else None,
+        )
 
     def get_backup_point(self, point_id: str) -> BackupPoint | None:
-        conn = self._get_connection()
-        try:
-            cursor = conn.cursor()
+        def load() -> BackupPoint | None:
+            cursor = self._get_connection().cursor()
             cursor.execute("SELECT * FROM backup_points WHERE id = ?", (point_id,))
             row = cursor.fetchone()
-            if row:
-                return BackupPoint(
-                    id=row["id"], name=row["name"], source_path=row["source_path"],
-                    schedule=row["schedule"], compression_level=row["compression_level"],
-                    exclude_patterns=json.loads(row["exclude_patterns"] or "[]"),
-                    created_at=datetime.fromisoformat(row["created_at"]),
-                    last_run=datetime.fromisoformat(row["last_run"]) if row["last_run"] else None,
-                )
-            return None
-        finally:
-            conn.close()
+            return self._row_to_backup_point(row) if row else None
+
+        return self._point_cache.get(point_id, load)
 
     def get_all_backup_points(self) -> list[BackupPoint]:
-        conn = self._get_connection()
-        try:
-            cursor = conn.cursor()
+        def load() -> list[BackupPoint]:
+            cursor = self._get_connection().cursor()
             cursor.execute("SELECT * FROM backup_points ORDER BY created_at DESC")
-            return [
-                BackupPoint(
-                    id=row["id"], name=row["name"], source_path=row["source_path"],
-                    schedule=row["schedule"], compression_level=row["compression_level"],
-                    exclude_patterns=json.loads(row["exclude_patterns"] or "[]"),
-                    created_at=datetime.fromisoformat(row["created_at"]),
-                    last_run=datetime.fromisoformat(row["last_run"]) if row["last_run"] else None,
-                ) for row in cursor.fetchall()
-            ]
-        finally:
-            conn.close()
+            return [self._row_to_backup_point(row) for row in cursor.fetchall()]
+
+        return self._point_cache.get_all(load)
 
     def delete_backup_point(self, point_id: str) -> bool:
-        conn = self._get_connection()
-        try:
-            cursor = conn.cursor()
+        with self.transaction() as cursor:
             cursor.execute("DELETE FROM backup_points WHERE id = ?", (point_id,))
-            conn.commit()
-            return cursor.rowcount > 0
-        finally:
-            conn.close()
+            deleted = cursor.rowcount > 0
+        self._invalidate(self._point_cache, point_id)
+        return deleted
 
     def update_backup_point(self, point: BackupPoint) -> bool:
-        conn = self._get_connection()
-        try:
-            cursor = conn.cursor()
+        with self.transaction() as cursor:
             cursor.execute(
-                """UPDATE backup_points SET name=?, source_path=?, schedule=?, compression_level=?, exclude_patterns=?, last_run=? WHERE id=?""",
+                """UPDATE backup_points SET name=?, source_path=?, schedule=?, compression_level=?, exclude_patterns=?, last_run=?, incremental=?, archive_format=?, retention=? WHERE id=?""",
                 (point.name, point.source_path, point.schedule, point.compression_level,
-                 json.dumps(point.exclude_patterns), point.last_run.isoformat() if point.last_run else None, point.id),
+                 json.dumps(point.exclude_patterns), point.last_run.isoformat() if point.last_run else None,
+                 int(point.incremental), point.archive_format, json.dumps(point.retention.to_dict()), point.id),
             )
-            conn.commit()
-            return cursor.rowcount > 0
-        finally:
-            conn.close()
+            updated = cursor.rowcount > 0
+        self._invalidate(self._point_cache, point.id)
+        return updated
 
     def add_connection(self, config: ConnectionConfig) -> str:
-        conn = self._get_connection()
-        try:
-            cursor = conn.cursor()
+        with self.transaction() as cursor:
             cursor.execute(
                 """INSERT INTO connection_configs VALUES (?, ?, ?, ?, ?)""",
                 (config.id, config.name, config.type.value, json.dumps(config.config), config.created_at.isoformat()),
             )
-            conn.commit()
-            return config.id
-        finally:
-            conn.close()
+        self._invalidate(self._connection_cache, config.id)
+        return config.id
+
+    @staticmethod
+    def _row_to_connection(row: sqlite3.Row) -> ConnectionConfig:
+        return ConnectionConfig(
+            id=row["id"], name=row["name"], type=ConnectionType(row["type"]),
+            config=json.loads(row["config"]), created_at=datetime.fromisoformat(row["created_at"]),
+        )
 
     def get_connection(self, config_id: str) -> ConnectionConfig | None:
-        conn = self._get_connection()
-        try:
-            cursor = conn.cursor()
+        def load() -> ConnectionConfig | None:
+            cursor = self._get_connection().cursor()
             cursor.execute("SELECT * FROM connection_configs WHERE id = ?", (config_id,))
             row = cursor.fetchone()
-            if row:
-                return ConnectionConfig(
-                    id=row["id"], name=row["name"], type=row["type"],
-                    config=json.loads(row["config"]), created_at=datetime.fromisoformat(row["created_at"]),
-                )
-            return None
-        finally:
-            conn.close()
+            return self._row_to_connection(row) if row else None
+
+        return self._connection_cache.get(config_id, load)
 
     def get_all_connections(self) -> list[ConnectionConfig]:
-        conn = self._get_connection()
-        try:
-            cursor = conn.cursor()
+        def load() -> list[ConnectionConfig]:
+            cursor = self._get_connection().cursor()
             cursor.execute("SELECT * FROM connection_configs ORDER BY created_at DESC")
-            return [
-                ConnectionConfig(
-                    id=row["id"], name=row["name"], type=row["type"],
-                    config=json.loads(row["config"]), created_at=datetime.fromisoformat(row["created_at"]),
-                ) for row in cursor.fetchall()
-            ]
-        finally:
-            conn.close()
+            return [self._row_to_connection(row) for row in cursor.fetchall()]
+
+        return self._connection_cache.get_all(load)
 
     def delete_connection(self, config_id: str) -> bool:
-        conn = self._get_connection()
-        try:
-            cursor = conn.cursor()
+        with self.transaction() as cursor:
             cursor.execute("DELETE FROM connection_configs WHERE id = ?", (config_id,))
-            conn.commit()
-            return cursor.rowcount > 0
-        finally:
-            conn.close()
+            deleted = cursor.rowcount > 0
+        self._invalidate(self._connection_cache, config_id)
+        return deleted
+
+    def get_usage_stats(self, days: int = 30) -> dict[str, Any]:
+        """
+        Статистика хранения из таблиц, которые поддерживают триггеры (без обхода записей).
+
+        Args:
+            days: За сколько последних дней с бэкапами вернуть прирост
+
+        Returns:
+            {"total": {"records", "bytes"},
+             "targets": {ID хранилища: {"records", "bytes", "unique_bytes", "duplicate_bytes"}},
+             "points": {ID точки: {"records", "bytes"}},
+             "days": {"YYYY-MM-DD": {"records", "bytes"}}} - дни от новых к старым
+
+            duplicate_bytes - байты записей, чей хеш уже есть в хранилище.
+            Это не сэкономленное место, а занятое копиями: сколько освободила
+            бы дедупликация по хешу архива.
+        """
+        cursor = self._get_connection().cursor()
+        cursor.execute("SELECT * FROM usage_by_target")
+        targets = {
+            row["target_id"]: {
+                "records": row["records"], "bytes": row["bytes"], "unique_bytes": row["unique_bytes"],
+                "duplicate_bytes": row["bytes"] - row["unique_bytes"],
+            } for row in cursor.fetchall()
+        }
+        cursor.execute("SELECT * FROM usage_by_point")
+        points = {row["backup_point_id"]: {"records": row["records"], "bytes": row["bytes"]} for row in cursor.fetchall()}
+        cursor.execute("SELECT * FROM usage_by_day ORDER BY day DESC LIMIT ?", (days,))
+        daily = {row["day"]: {"records": row["records"], "bytes": row["bytes"]} for row in cursor.fetchall()}
+        return {
+            "total": {
+                "records": sum(point["records"] for point in points.values()),
+                "bytes": sum(point["bytes"] for point in points.values()),
+            },
+            "targets": targets,
+            "points": points,
+            "days": daily,
+        }
+
+    def rebuild_usage_stats(self):
+        """Пересчитать статистику хранения заново (например, после ручной правки БД)."""
+        with self.transaction() as cursor:
+            self._rebuild_usage(cursor)
+
+    def cache_stats(self) -> dict[str, int]:
+        """Попадания и промахи кэша точек бэкапа и подключений."""
+        return {
+            "hits": self._point_cache.hits + self._connection_cache.hits,
+            "misses": self._point_cache.misses + self._connection_cache.misses,
+        }
 
     def add_file_record(self, record: FileRecord) -> str:
-        conn = self._get_connection()
-        try:
-            cursor = conn.cursor()
+        self.add_file_records([record])
+        return record.id
+
+    def add_file_records(self, records: list[FileRecord]):
+        """Записать несколько записей одним коммитом."""
+        with self.transaction() as cursor:
+            cursor.executemany(
+                """INSERT INTO file_records (id, backup_point_id, file_path, file_hash, file_size,
+                   uploaded_at, archive_parts, parent_id, hash_algorithm, part_hashes, part_size)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                ((record.id, record.backup_point_id, record.file_path, record.file_hash,
+                  record.file_size, record.uploaded_at.isoformat(), json.dumps(record.archive_parts),
+                  record.parent_id, record.hash_algorithm, json.dumps(record.part_hashes), record.part_size)
+                 for record in records),
+            )
+            cursor.executemany(
+                """INSERT OR REPLACE INTO file_record_targets VALUES (?, ?, ?, ?, ?, ?)""",
+                (self._record_target_row(record, target_id, record.uploaded_at)
+                 for record in records
+                 for target_id in dict.fromkeys([*record.targets, *record.remote_refs])),
+            )
+
+    def add_record_target(self, record: FileRecord, target_id: str, remote_refs: list[str] | None = None):
+        """Отметить, что запись загружена еще в одно хранилище."""
+        record.add_target(target_id)
+        if remote_refs is not None:
+            record.remote_refs[target_id] = remote_refs
+        with self.transaction() as cursor:
             cursor.execute(
-                """INSERT INTO file_records VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                (record.id, record.backup_point_id, record.file_path, record.file_hash,
-                 record.file_size, record.uploaded_at.isoformat(),
-                 json.dumps(record.targets), json.dumps(record.archive_parts)),
+                """INSERT OR REPLACE INTO file_record_targets VALUES (?, ?, ?, ?, ?, ?)""",
+                self._record_target_row(record, target_id, datetime.now()),
             )
-            conn.commit()
-            return record.id
-        finally:
-            conn.close()
+
+    @staticmethod
+    def _record_target_row(record: FileRecord, target_id: str, uploaded_at: datetime) -> tuple:
+        refs = record.remote_refs.get(target_id)
+        return (record.id, target_id, record.file_hash, record.hash_algorithm,
+                json.dumps(refs) if refs is not None else None, uploaded_at.isoformat())
+
+    @staticmethod
+    def _row_to_file_record(row: sqlite3.Row) -> FileRecord:
+        return FileRecord(
+            id=row["id"], backup_point_id=row["backup_point_id"], file_path=row["file_path"],
+            file_hash=row["file_hash"], file_size=row["file_size"], hash_algorithm=row["hash_algorithm"],
+            uploaded_at=datetime.fromisoformat(row["uploaded_at"]),
+            archive_parts=json.loads(row["archive_parts"] or "[]"), parent_id=row["parent_id"],
+            part_hashes=json.loads(row["part_hashes"] or "[]"), part_size=row["part_size"],
+        )
+
+    def _load_file_records(self, cursor: sqlite3.Cursor, rows: list[sqlite3.Row]) -> list[FileRecord]:
+        """Собрать записи вместе с их хранилищами из file_record_targets."""
+        records = [self._row_to_file_record(row) for row in rows]
+        by_id = {record.id: record for record in records}
+        ids = list(by_id)
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            cursor.execute(
+                f"""SELECT record_id, target_id, remote_ref FROM file_record_targets
+                    WHERE record_id IN ({",".join("?" * len(batch))}) ORDER BY uploaded_at, target_id""",
+                batch,
+            )
+            for row in cursor.fetchall():
+                record = by_id[row["record_id"]]
+                record.targets.append(row["target_id"])
+                if row["remote_ref"] is not None:
+                    record.remote_refs[row["target_id"]] = json.loads(row["remote_ref"])
+        return records
+
+    def get_file_record(self, record_id: str) -> FileRecord | None:
+        cursor = self._get_connection().cursor()
+        cursor.execute("SELECT * FROM file_records WHERE id = ?", (record_id,))
+        records = self._load_file_records(cursor, cursor.fetchall())
+        return records[0] if records else None
 
     def get_files_by_backup_point(self, backup_point_id: str) -> list[FileRecord]:
-        conn = self._get_connection()
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM file_records WHERE backup_point_id = ? ORDER BY uploaded_at DESC", (backup_point_id,))
-            return [
-                FileRecord(
-                    id=row["id"], backup_point_id=row["backup_point_id"], file_path=row["file_path"],
-                    file_hash=row["file_hash"], file_size=row["file_size"],
-                    uploaded_at=datetime.fromisoformat(row["uploaded_at"]),
-                    targets=json.loads(row["targets"] or "[]"), archive_parts=json.loads(row["archive_parts"] or "[]"),
-                ) for row in cursor.fetchall()
-            ]
-        finally:
-            conn.close()
+        cursor = self._get_connection().cursor()
+        cursor.execute("SELECT * FROM file_records WHERE backup_point_id = ? ORDER BY uploaded_at DESC", (backup_point_id,))
+        return self._load_file_records(cursor, cursor.fetchall())
+
+    def get_latest_file_record(self, backup_point_id: str) -> FileRecord | None:
+        cursor = self._get_connection().cursor()
+        cursor.execute(
+            "SELECT * FROM file_records WHERE backup_point_id = ? ORDER BY uploaded_at DESC LIMIT 1",
+            (backup_point_id,),
+        )
+        records = self._load_file_records(cursor, cursor.fetchall())
+        return records[0] if records else None
+
+    def get_backup_chain(self, record_id: str) -> list[FileRecord]:
+        """Цепочка записей от полного бэкапа до указанного инкремента."""
+        cursor = self._get_connection().cursor()
+        cursor.execute(
+            """WITH RECURSIVE chain(id, depth) AS (
+                   SELECT id, 0 FROM file_records WHERE id = ?
+                   UNION ALL
+                   SELECT f.parent_id, chain.depth + 1 FROM file_records f
+                   JOIN chain ON f.id = chain.id WHERE f.parent_id IS NOT NULL
+               )
+               SELECT f.* FROM chain JOIN file_records f ON f.id = chain.id ORDER BY chain.depth DESC""",
+            (record_id,),
+        )
+        return self._load_file_records(cursor, cursor.fetchall())
+
+    @staticmethod
+    def _history_conditions(filters: HistoryFilter | None) -> tuple[list[str], list[Any]]:
+        """Условия WHERE и параметры для фильтра истории."""
+        conditions, params = [], []
+        if filters is None:
+            return conditions, params
+        if filters.backup_point_id is not None:
+            conditions.append("f.backup_point_id = ?")
+            params.append(filters.backup_point_id)
+        if filters.target_id is not None:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM file_record_targets t WHERE t.record_id = f.id AND t.target_id = ?)"
+            )
+            params.append(filters.target_id)
+        if filters.path_contains:
+            subquery, subquery_params = Database._path_match(filters.path_contains)
+            conditions.append(f"f.rowid IN ({subquery})")
+            params.extend(subquery_params)
+        if filters.uploaded_from is not None:
+            conditions.append("f.uploaded_at >= ?")
+            params.append(filters.uploaded_from.isoformat())
+        if filters.uploaded_to is not None:
+            conditions.append("f.uploaded_at < ?")
+            params.append(filters.uploaded_to.isoformat())
+        return conditions, params
+
+    @staticmethod
+    def _path_condition(text: str, table: str = "file_records_fts", column: str = "file_path") -> tuple[str, str]:
+        """
+        Условие поиска подстроки в trigram-индексе table по колонке column.
+
+        Trigram-индекс ищет подстроки от 3 символов, более короткие
+        проверяются через LIKE по таблице индекса без ускорения.
+        """
+        if len(text) >= 3:
+            return f"{table} MATCH ?", '"' + text.replace('"', '""') + '"'
+        escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"{column} LIKE ? ESCAPE '\\'", f"%{escaped}%"
+
+    @staticmethod
+    def _path_match(text: str) -> tuple[str, list[str]]:
+        """Подзапрос rowid записей, у которых путь архива или имя файла в нем содержит text."""
+        condition, param = Database._path_condition(text)
+        member_condition, member_param = Database._path_condition(text, "archive_members_fts", "name")
+        subquery = f"""SELECT rowid FROM file_records_fts WHERE {condition}
+                    UNION
+                    SELECT r.rowid FROM archive_members m JOIN file_records r ON r.id = m.record_id
+                    WHERE m.rowid IN (SELECT rowid FROM archive_members_fts WHERE {member_condition})"""
+        return subquery, [param, member_param]
+
+    def search_paths(self, query: str, limit: int = 50) -> list[FileRecord]:
+        """
+        Найти записи по подстроке пути архива или имени файла в нем
+        (без учета регистра), от новых к старым.
+
+        Args:
+            query: Подстрока пути
+            limit: Максимум записей
+
+        Returns:
+            Найденные записи
+        """
+        if not query:
+            return []
+        subquery, params = self._path_match(query)
+        cursor = self._get_connection().cursor()
+        # rowid растет вместе со временем записи, а порядок по rowid индекс отдает без сортировки
+        cursor.execute(
+            f"SELECT f.* FROM file_records f WHERE f.rowid IN ({subquery}) ORDER BY f.rowid DESC LIMIT ?",
+            [*params, limit],
+        )
+        return self._load_file_records(cursor, cursor.fetchall())
+
+    def query_history(
+        self,
+        filters: HistoryFilter | None = None,
+        after_cursor: tuple[str, str] | None = None,
+        limit: int = 50,
+    ) -> tuple[list[FileRecord], tuple[str, str] | None]:
+        """
+        Страница истории от новых записей к старым.
+
+        Пагинация по ключу (uploaded_at, id): следующая страница начинается
+        сразу после курсора по индексу, без OFFSET, поэтому любая страница
+        читается за одно и то же время независимо от размера таблицы.
+
+        Args:
+            filters: Фильтр записей
+            after_cursor: Курсор из предыдущего вызова (None - первая страница)
+            limit: Размер страницы
+
+        Returns:
+            (записи, курсор следующей страницы или None, если страница последняя)
+        """
+        conditions, params = self._history_conditions(filters)
+        if after_cursor is not None:
+            conditions.append("(f.uploaded_at, f.id) < (?, ?)")
+            params.extend(after_cursor)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self._get_connection().cursor()
+        cursor.execute(
+            f"SELECT f.* FROM file_records f {where} ORDER BY f.uploaded_at DESC, f.id DESC LIMIT ?",
+            (*params, limit + 1),
+        )
+        rows = cursor.fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1]["uploaded_at"], rows[-1]["id"])
+        return self._load_file_records(cursor, rows), next_cursor
+
+    def count_history(self, filters: HistoryFilter | None = None, limit: int | None = None) -> int:
+        """
+        Число записей истории по фильтру.
+
+        Без фильтра и с фильтром только по точке число берется из статистики
+        usage_by_point, которую поддерживают триггеры. Остальные фильтры
+        считаются по записям; limit прекращает подсчет, когда найдено
+        столько записей (поиск по частой подстроке иначе обходит всю историю).
+
+        Args:
+            filters: Фильтр записей
+            limit: Больше скольких записей не считать (None - без ограничения)
 
-    def is_file_uploaded(self, file_hash: str, target_id: str) -> bool:
+        Returns:
+            Число записей, но не больше limit
+        """
+        cursor = self._get_connection().cursor()
+        filters = filters or HistoryFilter()
+        if replace(filters, backup_point_id=None) == HistoryFilter():
+            if filters.backup_point_id is None:
+                cursor.execute("SELECT COALESCE(SUM(records), 0) FROM usage_by_point")
+            else:
+                cursor.execute(
+                    "SELECT COALESCE(SUM(records), 0) FROM usage_by_point WHERE backup_point_id = ?",
+                    (filters.backup_point_id,),
+                )
+        else:
+            conditions, params = self._history_conditions(filters)
+            cursor.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM file_records f WHERE {' AND '.join(conditions)} LIMIT ?)",
+                [*params, -1 if limit is None else limit],
+            )
+        count = cursor.fetchone()[0]
+        return count if limit is None else min(count, limit)
+
+    def add_archive_members(self, record_id: str, members: list[ArchiveMember]):
+        with self.transaction() as cursor:
+            cursor.executemany(
+                """INSERT OR REPLACE INTO archive_members VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                ((record_id, m.name, m.size, m.compressed_size, m.crc, m.compress_type, m.part_index, m.part_offset)
+                 for m in members),
+            )
+
+    @staticmethod
+    def _row_to_archive_member(row: sqlite3.Row) -> ArchiveMember:
+        return ArchiveMember(
+            name=row["name"], size=row["size"], compressed_size=row["compressed_size"], crc=row["crc"],
+            compress_type=row["compress_type"], part_index=row["part_index"], part_offset=row["part_offset"],
+        )
+
+    def get_archive_members(self, record_id: str) -> list[ArchiveMember]:
+        cursor = self._get_connection().cursor()
+        cursor.execute("SELECT * FROM archive_members WHERE record_id = ? ORDER BY name", (record_id,))
+        return [self._row_to_archive_member(row) for row in cursor.fetchall()]
+
+    def get_archive_member(self, record_id: str, name: str) -> ArchiveMember | None:
+        cursor = self._get_connection().cursor()
+        cursor.execute("SELECT * FROM archive_members WHERE record_id = ? AND name = ?", (record_id, name))
+        row = cursor.fetchone()
+        return self._row_to_archive_member(row) if row else None
+
+    def get_expired_records(self, backup_point_id: str, policy: RetentionPolicy) -> list[FileRecord]:
+        """
+        Записи точки, которые не оставляет ни одно правило хранения, от старых к новым.
+
+        Полные бэкапы и инкременты, на которых стоят оставленные записи,
+        тоже остаются - иначе цепочку нельзя будет восстановить.
+        """
+        if not policy.is_enabled:
+            return []
+        cursor = self._get_connection().cursor()
+        cursor.execute(
+            """WITH RECURSIVE ranked AS (
+                   SELECT id,
+                       ROW_NUMBER() OVER newest AS n,
+                       ROW_NUMBER() OVER (PARTITION BY substr(uploaded_at, 1, 10)
+                                          ORDER BY uploaded_at DESC, id DESC) AS day_n,
+                       ROW_NUMBER() OVER (PARTITION BY strftime('%Y-%W', uploaded_at)
+                                          ORDER BY uploaded_at DESC, id DESC) AS week_n,
+                       ROW_NUMBER() OVER (PARTITION BY substr(uploaded_at, 1, 7)
+                                          ORDER BY uploaded_at DESC, id DESC) AS month_n
+                   FROM file_records WHERE backup_point_id = :point
+                   WINDOW newest AS (ORDER BY uploaded_at DESC, id DESC)
+               ),
+               buckets AS (
+                   -- Номер периода: сколько периодов с бэкапами от самого нового до этой записи
+                   SELECT id, n, day_n, week_n, month_n,
+                       SUM(day_n = 1) OVER (ORDER BY n) AS day_rank,
+                       SUM(week_n = 1) OVER (ORDER BY n) AS week_rank,
+                       SUM(month_n = 1) OVER (ORDER BY n) AS month_rank
+                   FROM ranked
+               ),
+               kept(id) AS (
+                   SELECT id FROM buckets
+                   WHERE n <= :last
+                      OR (day_n = 1 AND day_rank <= :daily)
+                      OR (week_n = 1 AND week_rank <= :weekly)
+                      OR (month_n = 1 AND month_rank <= :monthly)
+                   UNION
+                   SELECT f.parent_id FROM file_records f JOIN kept ON f.id = kept.id
+                   WHERE f.parent_id IS NOT NULL
+               )
+               SELECT * FROM file_records
+               WHERE backup_point_id = :point AND id NOT IN (SELECT id FROM kept)
+               ORDER BY uploaded_at, id""",
+            {"point": backup_point_id, "last": policy.keep_last, "daily": policy.keep_daily,
+             "weekly": policy.keep_weekly, "monthly": policy.keep_monthly},
+        )
+        return self._load_file_records(cursor, cursor.fetchall())
+
+    def remove_record_targets(self, record_id: str, target_ids: list[str]):
+        with self.transaction() as cursor:
+            cursor.executemany(
+                "DELETE FROM file_record_targets WHERE record_id = ? AND target_id = ?",
+                ((record_id, target_id) for target_id in target_ids),
+            )
+
+    def get_ref_owners(self, target_id: str, remote_refs: list[str]) -> dict[str, set[str]]:
+        """Ссылка на объект хранилища -> ID записей, которые на нее ссылаются."""
+        owners: dict[str, set[str]] = {}
+        cursor = self._get_connection().cursor()
+        for start in range(0, len(remote_refs), 500):
+            batch = remote_refs[start:start + 500]
+            cursor.execute(
+                f"""SELECT t.record_id, j.value FROM file_record_targets t, json_each(t.remote_ref) j
+                    WHERE t.target_id = ? AND t.remote_ref IS NOT NULL
+                      AND j.value IN ({",".join("?" * len(batch))})""",
+                [target_id, *batch],
+            )
+            for record_id, ref in cursor.fetchall():
+                owners.setdefault(ref, set()).add(record_id)
+        return owners
+
+    def delete_file_records(self, record_ids: list[str]) -> int:
+        """Удалить записи вместе с хранилищами и каталогом архивов."""
+        deleted = 0
+        with self.transaction() as cursor:
+            for start in range(0, len(record_ids), 500):
+                batch = record_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                cursor.execute(f"DELETE FROM archive_members WHERE record_id IN ({placeholders})", batch)
+                cursor.execute(f"DELETE FROM file_record_targets WHERE record_id IN ({placeholders})", batch)
+                cursor.execute(f"DELETE FROM file_records WHERE id IN ({placeholders})", batch)
+                deleted += cursor.rowcount
+        return deleted
+
+    def compact(self) -> int:
+        """
+        Вернуть файловой системе свободные страницы (incremental vacuum).
+
+        Returns:
+            Число освобожденных страниц
+        """
         conn = self._get_connection()
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1 FROM file_records WHERE file_hash = ? AND targets LIKE ?", (file_hash, f'%"{target_id}"%'))
-            return cursor.fetchone() is not None
-        finally:
-            conn.close()
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+        conn.execute("PRAGMA optimize")
+        return free_pages
+
+    def checkpoint(self) -> bool:
+        """
+        Перенести WAL в файл БД (wal_checkpoint(FULL)).
+
+        При synchronous=NORMAL коммит не ждет fsync WAL; чекпоинт сбрасывает
+        на диск и WAL, и файл БД, после него закоммиченное переживает и сбой питания.
+
+        Returns:
+            True, если перенесен весь WAL (False - мешали другие соединения)
+        """
+        busy, _, _ = self._get_connection().execute("PRAGMA wal_checkpoint(FULL)").fetchone()
+        return not busy
+
+    def add_backup_run(self, run: BackupRun) -> str:
+        """Записать запуск в журнал (повторная запись того же запуска заменяет его)."""
+        # Байты этапа нужны для пропускной способности: сжатие читает исходные файлы,
+        # хеширование, разбиение и загрузка обрабатывают архив
+        stage_bytes = {"scan": run.bytes_in, "compress": run.bytes_in, "hash": run.bytes_out, "split": run.bytes_out}
+        rows = [
+            (run.id, stage, "", seconds, stage_bytes.get(stage, 0), run.errors.get(stage))
+            for stage, seconds in run.stages.items()
+        ]
+        rows += [
+            (run.id, stage, "", None, 0, error)
+            for stage, error in run.errors.items()
+            if stage not in run.stages and not stage.startswith(f"{UPLOAD_STAGE}:")
+        ]
+        for target_id in dict.fromkeys([
+            *run.uploads,
+            *(key.partition(":")[2] for key in run.errors if key.startswith(f"{UPLOAD_STAGE}:")),
+        ]):
+            error = run.errors.get(f"{UPLOAD_STAGE}:{target_id}")
+            rows.append((run.id, UPLOAD_STAGE, target_id, run.uploads.get(target_id),
+                         0 if error else run.bytes_out, error))
+
+        with self.transaction() as cursor:
+            cursor.execute(
+                """INSERT OR REPLACE INTO backup_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (run.id, run.backup_point_id, run.record_id, run.started_at.isoformat(),
+                 run.finished_at.isoformat() if run.finished_at else None,
+                 run.bytes_in, run.bytes_out, run.file_count),
+            )
+            cursor.execute("DELETE FROM backup_run_stages WHERE run_id = ?", (run.id,))
+            cursor.executemany("""INSERT INTO backup_run_stages VALUES (?, ?, ?, ?, ?, ?)""", rows)
+        return run.id
+
+    def get_recent_runs(self, backup_point_id: str | None = None, limit: int = 20) -> list[BackupRun]:
+        cursor = self._get_connection().cursor()
+        if backup_point_id is None:
+            cursor.execute("SELECT * FROM backup_runs ORDER BY started_at DESC LIMIT ?", (limit,))
+        else:
+            cursor.execute(
+                "SELECT * FROM backup_runs WHERE backup_point_id = ? ORDER BY started_at DESC LIMIT ?",
+                (backup_point_id, limit),
+            )
+        runs = {
+            row["id"]: BackupRun(
+                id=row["id"], backup_point_id=row["backup_point_id"], record_id=row["record_id"],
+                bytes_in=row["bytes_in"], bytes_out=row["bytes_out"], file_count=row["file_count"],
+                started_at=datetime.fromisoformat(row["started_at"]),
+                finished_at=datetime.fromisoformat(row["finished_at"]) if row["finished_at"] else None,
+            ) for row in cursor.fetchall()
+        }
+        if runs:
+            placeholders = ",".join("?" * len(runs))
+            cursor.execute(f"SELECT * FROM backup_run_stages WHERE run_id IN ({placeholders})", list(runs))
+            for row in cursor.fetchall():
+                run = runs[row["run_id"]]
+                if row["stage"] == UPLOAD_STAGE:
+                    key = f"{UPLOAD_STAGE}:{row['target_id']}"
+                    if row["seconds"] is not None:
+                        run.uploads[row["target_id"]] = row["seconds"]
+                else:
+                    key = row["stage"]
+                    if row["seconds"] is not None:
+                        run.stages[row["stage"]] = row["seconds"]
+                if row["error"]:
+                    run.errors[key] = row["error"]
+        return list(runs.values())
+
+    def get_run_percentiles(
+        self,
+        backup_point_id: str | None = None,
+        target_id: str | None = None,
+        last_runs: int = 100,
+        percentiles: tuple[int, ...] = (50, 90, 99),
+    ) -> dict[tuple[str, str], dict[str, float]]:
+        """
+        Перцентили длительности и скорости этапов по последним запускам.
+
+        Args:
+            backup_point_id: Только запуски этой точки (None - все)
+            target_id: Только загрузка в это хранилище (None - все этапы)
+            last_runs: Сколько последних запусков учитывать
+            percentiles: Какие перцентили считать
+
+        Returns:
+            (этап, ID хранилища или "") -> {"count": число замеров,
+            "p50": секунды, ..., "rate_p50": байт в секунду, ...}.
+            Этапы с ошибкой не учитываются.
+        """
+        conditions = ["s.seconds IS NOT NULL", "s.error IS NULL"]
+        params: list[Any] = []
+        if target_id is not None:
+            conditions.append("s.stage = ? AND s.target_id = ?")
+            params += [UPLOAD_STAGE, target_id]
+        point_condition = "WHERE backup_point_id = ?" if backup_point_id is not None else ""
+        cursor = self._get_connection().cursor()
+        cursor.execute(
+            f"""SELECT s.stage, s.target_id, s.seconds, s.bytes FROM backup_run_stages s
+                JOIN (SELECT id FROM backup_runs {point_condition} ORDER BY started_at DESC LIMIT ?) r
+                  ON r.id = s.run_id
+                WHERE {" AND ".join(conditions)}""",
+            ([backup_point_id] if backup_point_id is not None else []) + [last_runs] + params,
+        )
+        samples: dict[tuple[str, str], list[tuple[float, float]]] = {}
+        for row in cursor.fetchall():
+            rate = row["bytes"] / row["seconds"] if row["seconds"] > 0 else 0.0
+            samples.setdefault((row["stage"], row["target_id"]), []).append((row["seconds"], rate))
+
+        result = {}
+        for key, values in samples.items():
+            durations = sorted(seconds for seconds, _ in values)
+            # Для скорости "хуже" - меньше, поэтому p90 берется с медленного конца
+            rates = sorted((rate for _, rate in values), reverse=True)
+            stats: dict[str, float] = {"count": len(values)}
+            for p in percentiles:
+                rank = max(1, math.ceil(p / 100 * len(values))) - 1
+                stats[f"p{p}"] = durations[rank]
+                stats[f"rate_p{p}"] = rates[rank]
+            result[key] = stats
+        return result
+
+    def get_manifest(self, backup_point_id: str) -> dict[str, ManifestEntry]:
+        cursor = self._get_connection().cursor()
+        cursor.execute("SELECT * FROM file_manifest WHERE backup_point_id = ?", (backup_point_id,))
+        return {
+            row["rel_path"]: ManifestEntry(
+                rel_path=row["rel_path"], size=row["size"], mtime_ns=row["mtime_ns"],
+                inode=row["inode"], content_hash=row["content_hash"],
+            ) for row in cursor.fetchall()
+        }
+
+    def save_manifest(self, backup_point_id: str, entries: list[ManifestEntry], deleted: list[str]):
+        """Обновить манифест точки: записать новые/измененные записи и удалить пропавшие файлы."""
+        with self.transaction() as cursor:
+            cursor.executemany(
+                """INSERT OR REPLACE INTO file_manifest VALUES (?, ?, ?, ?, ?, ?)""",
+                ((backup_point_id, e.rel_path, e.size, e.mtime_ns, e.inode, e.content_hash) for e in entries),
+            )
+            cursor.executemany(
+                "DELETE FROM file_manifest WHERE backup_point_id = ? AND rel_path = ?",
+                ((backup_point_id, rel_path) for rel_path in deleted),
+            )
+
+    def is_file_uploaded(self, file_hash: str, target_id: str, hash_algorithm: str | None = None) -> bool:
+        cursor = self._get_connection().cursor()
+        if hash_algorithm is None:
+            cursor.execute(
+                "SELECT 1 FROM file_record_targets WHERE file_hash = ? AND target_id = ? LIMIT 1",
+                (file_hash, target_id),
+            )
+        else:
+            cursor.execute(
+                "SELECT 1 FROM file_record_targets WHERE file_hash = ? AND target_id = ? AND hash_algorithm = ? LIMIT 1",
+                (file_hash, target_id, hash_algorithm),
+            )
+        return cursor.fetchone() is not None
+
+    def has_chunk(self, target_id: str, chunk_hash: bytes) -> bool:
+        cursor = self._get_connection().cursor()
+        cursor.execute("SELECT 1 FROM chunks WHERE target_id = ? AND hash = ?", (target_id, chunk_hash))
+        return cursor.fetchone() is not None
+
+    def get_chunk_hashes(self, target_id: str) -> set[bytes]:
+        """Хеши всех чанков, уже загруженных в хранилище."""
+        cursor = self._get_connection().cursor()
+        cursor.execute("SELECT hash FROM chunks WHERE target_id = ?", (target_id,))
+        return {row[0] for row in cursor}
+
+    def add_pack(self, pack_id: str, target_id: str, remote_ref: str, size: int,
+                 chunks: list[tuple[bytes, int, int]]) -> str:
+        with self.transaction() as cursor:
+            cursor.execute(
+                """INSERT INTO packs VALUES (?, ?, ?, ?, ?)""",
+                (pack_id, target_id, remote_ref, size, datetime.now().isoformat()),
+            )
+            cursor.executemany(
+                """INSERT OR IGNORE INTO chunks VALUES (?, ?, ?, ?, ?)""",
+                ((target_id, chunk_hash, pack_id, offset, length) for chunk_hash, offset, length in chunks),
+            )
+            return pack_id
+
+    def get_chunk_locations(self, target_id: str, hashes: list[bytes]) -> dict[bytes, tuple[str, int, int]]:
+        """Где лежат чанки в хранилище: хеш -> (remote_ref пака, смещение, длина)."""
+        cursor = self._get_connection().cursor()
+        locations = {}
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            cursor.execute(
+                f"""SELECT c.hash, p.remote_ref, c.pack_offset, c.pack_length
+                    FROM chunks c JOIN packs p ON p.id = c.pack_id
+                    WHERE c.target_id = ? AND c.hash IN ({",".join("?" * len(batch))})""",
+                (target_id, *batch),
+            )
+            for row in cursor.fetchall():
+                locations[row["hash"]] = (row["remote_ref"], row["pack_offset"], row["pack_length"])
+        return locations
+
+    def add_chunk_snapshot(self, snapshot_id: str, backup_point_id: str, files: list[tuple[str, int, bytes]]) -> str:
+        with self.transaction() as cursor:
+            cursor.execute(
+                """INSERT INTO chunk_snapshots VALUES (?, ?, ?)""",
+                (snapshot_id, backup_point_id, datetime.now().isoformat()),
+            )
+            cursor.executemany(
+                """INSERT INTO snapshot_files VALUES (?, ?, ?, ?)""",
+                ((snapshot_id, rel_path, size, recipe) for rel_path, size, recipe in files),
+            )
+            return snapshot_id
+
+    def get_chunk_snapshot_files(self, snapshot_id: str) -> list[tuple[str, int, bytes]]:
+        cursor = self._get_connection().cursor()
+        cursor.execute("SELECT rel_path, size, chunks FROM snapshot_files WHERE snapshot_id = ?", (snapshot_id,))
+        return [(row["rel_path"], row["size"], row["chunks"]) for row in cursor.fetchall()]
 
     def close(self):
-        pass
+        """Закрыть соединения всех потоков. Следующий вызов откроет новое."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, {}
+            self._local = threading.local()
+        for conn in connections.values():
+            conn.close()
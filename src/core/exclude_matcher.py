@@ -0,0 +1,125 @@
+"""Паттерны исключения в стиле .gitignore."""
+
+import re
+
+
+def _translate(pattern: str) -> tuple[str, bool, bool] | None:
+    """
+    Перевести строку .gitignore в регулярное выражение.
+
+    Args:
+        pattern: Строка паттерна
+
+    Returns:
+        (регулярное выражение, отрицание, только папки) или None для пустой строки/комментария
+    """
+    pattern = pattern.rstrip()
+    if not pattern or pattern.startswith("#"):
+        return None
+
+    negated = pattern.startswith("!")
+    if negated:
+        pattern = pattern[1:]
+    elif pattern.startswith(("\\!", "\\#")):
+        pattern = pattern[1:]
+
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    # Паттерн со слешем привязан к корню, без слеша - совпадает на любой глубине
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    if not pattern:
+        return None
+
+    parts = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i) and (i == 0 or pattern[i - 1] == "/"):
+                end = i + 2
+                if end == n:
+                    parts.append(".*")
+                    i = end
+                    continue
+                if pattern[end] == "/":
+                    parts.append("(?:.*/)?")
+                    i = end + 1
+                    continue
+            while i < n and pattern[i] == "*":
+                i += 1
+            parts.append("[^/]*")
+            continue
+        if c == "?":
+            parts.append("[^/]")
+        elif c == "[":
+            close = pattern.find("]", i + 2 if pattern.startswith(("[!", "[^"), i) else i + 1)
+            if close == -1:
+                parts.append(re.escape(c))
+            else:
+                body = pattern[i + 1:close]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append("[" + body.replace("\\", "\\\\") + "]")
+                i = close
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        else:
+            parts.append(re.escape(c))
+        i += 1
+
+    regex = "".join(parts)
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return regex, negated, dir_only
+
+
+class ExcludeMatcher:
+    """
+    Набор паттернов исключения, скомпилированный в одно регулярное выражение.
+
+    Поддерживаются *, ?, [...], ** и отрицание "!" с семантикой .gitignore:
+    выигрывает последний совпавший паттерн. Пути - POSIX относительно
+    корня бэкапа. Исключенная папка отсекается при обходе целиком, поэтому
+    отрицание не может вернуть файл из нее, как и в git.
+    """
+
+    def __init__(self, patterns: list[str] | None = None):
+        self.patterns = list(patterns or [])
+        rules = [rule for rule in map(_translate, self.patterns) if rule]
+        self._file_regex, self._file_negated = self._compile([r for r in rules if not r[2]])
+        self._dir_regex, self._dir_negated = self._compile(rules)
+
+    @staticmethod
+    def _compile(rules: list[tuple[str, bool, bool]]) -> tuple[re.Pattern | None, list[bool]]:
+        """Собрать альтернативу: последние паттерны первыми, у каждого своя группа."""
+        if not rules:
+            return None, []
+        rules = rules[::-1]
+        regex = re.compile("|".join(f"({body})" for body, _, _ in rules), re.DOTALL)
+        return regex, [False] + [negated for _, negated, _ in rules]
+
+    def __bool__(self) -> bool:
+        return self._dir_regex is not None
+
+    def is_excluded(self, rel_path: str, is_dir: bool = False) -> bool:
+        """
+        Проверить путь.
+
+        Args:
+            rel_path: POSIX-путь относительно корня
+            is_dir: Путь - папка
+
+        Returns:
+            True если путь исключен
+        """
+        regex, negated = (self._dir_regex, self._dir_negated) if is_dir else (self._file_regex, self._file_negated)
+        if regex is None:
+            return False
+        match = regex.fullmatch(rel_path)
+        return match is not None and not negated[match.lastindex]
+
+    def __repr__(self) -> str:
+        return f"ExcludeMatcher(patterns={self.patterns})"
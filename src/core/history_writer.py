@@ -0,0 +1,261 @@
+"""Фоновая запись истории бэкапов в БД."""
+
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any
+
+from ..models import ArchiveMember, BackupRun, FileRecord, ManifestEntry
+from .database import Database
+
+_STOP = object()
+
+
+class HistoryWriter:
+    """
+    Поток записи истории с групповым коммитом.
+
+    Потоки загрузки и сжатия только ставят записи в очередь и не ждут
+    SQLite. Поток записи забирает из очереди все, что накопилось (до
+    MAX_BATCH операций, дожидаясь новых не дольше COMMIT_DELAY), и
+    применяет одной транзакцией. Методы записи повторяют одноименные
+    методы Database.
+
+    Каждая операция перед постановкой в очередь дописывается в журнал
+    рядом с БД и сбрасывается на диск. Журнал очищается, когда все
+    записанные в него операции закоммичены и перенесены чекпоинтом в файл
+    БД: при synchronous=NORMAL сам коммит может пропасть при сбое питания.
+    Если процесс или система упали раньше, операции из журнала применяются
+    при следующем запуске. Операция
+    применяется целиком или не применяется совсем, поэтому все, что
+    должно появиться вместе, пишется одной операцией (см. add_backup).
+
+    Если поток записи упал, flush() сразу сообщает об ошибке, а не
+    ждет; непримененные операции остаются в журнале.
+    """
+
+    MAX_BATCH = 256
+    COMMIT_DELAY = 0.05  # Секунды ожидания следующих операций перед коммитом
+
+    def __init__(self, db: Database, journal_path: str | None = None):
+        self.db = db
+        self.journal_path = journal_path or f"{db.db_path}.journal"
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._journaled = 0
+        self._applied = 0
+        self._errors: list[str] = []
+        self.replayed = self._replay()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def add_file_record(self, record: FileRecord) -> str:
+        self._submit({"op": "records", "records": [record.to_dict()]})
+        return record.id
+
+    def add_file_records(self, records: list[FileRecord]):
+        self._submit({"op": "records", "records": [record.to_dict() for record in records]})
+
+    def add_backup(
+        self,
+        record: FileRecord,
+        members: list[ArchiveMember],
+        entries: list[ManifestEntry] | None = None,
+        deleted: list[str] | None = None,
+    ) -> str:
+        """
+        Записать итог бэкапа одной операцией.
+
+        Запись, каталог ее архива и манифест точки (если передан entries)
+        коммитятся одной транзакцией: манифест не может опередить запись,
+        по которой он построен.
+        """
+        self._submit({
+            "op": "backup", "record": record.to_dict(), "members": [m.to_dict() for m in members],
+            "manifest": None if entries is None else {
+                "entries": [entry.to_dict() for entry in entries], "deleted": deleted or [],
+            },
+        })
+        return record.id
+
+    def add_archive_members(self, record_id: str, members: list[ArchiveMember]):
+        self._submit({"op": "members", "record_id": record_id, "members": [m.to_dict() for m in members]})
+
+    def save_manifest(self, backup_point_id: str, entries: list[ManifestEntry], deleted: list[str]):
+        self._submit({
+            "op": "manifest", "backup_point_id": backup_point_id,
+            "entries": [entry.to_dict() for entry in entries], "deleted": deleted,
+        })
+
+    def add_backup_run(self, run: BackupRun) -> str:
+        self._submit({"op": "run", "run": run.to_dict()})
+        return run.id
+
+    def flush(self, timeout: float | None = None):
+        """
+        Дождаться коммита всех поставленных ранее операций.
+
+        Raises:
+            RuntimeError: Если часть операций не удалось записать
+        """
+        done = threading.Event()
+        self._queue.put(done)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not done.wait(0.1):
+            if not self._thread.is_alive():
+                raise RuntimeError("Поток записи истории остановлен, операции остались в журнале")
+            if deadline is not None and time.monotonic() > deadline:
+                raise RuntimeError("Запись истории не завершилась вовремя")
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise RuntimeError(f"Не удалось записать историю: {'; '.join(errors)}")
+
+    def close(self):
+        """Записать оставшиеся операции и остановить поток."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._journal.close()
+
+    def _submit(self, op: dict[str, Any]):
+        # Журнал и очередь пополняются под одной блокировкой, чтобы порядок совпадал
+        with self._lock:
+            self._journal.write(json.dumps(op, ensure_ascii=False) + "\n")
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journaled += 1
+            self._queue.put(op)
+
+    def _run(self):
+        try:
+            self._loop()
+        except Exception as e:
+            # Без этого flush() ждал бы барьер, который уже никто не отметит
+            with self._lock:
+                self._errors.append(f"Поток записи истории упал: {e}")
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+
+            batch = [item]
+            barriers = []
+            stop = False
+            deadline = time.monotonic() + self.COMMIT_DELAY
+            while len(batch) < self.MAX_BATCH:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    # Барьер: коммитим то, что уже набрано, не дожидаясь остального
+                    barriers.append(item)
+                    break
+                batch.append(item)
+
+            try:
+                self._commit(batch)
+            finally:
+                for barrier in barriers:
+                    barrier.set()
+            if stop:
+                return
+
+    def _commit(self, batch: list[dict[str, Any]]):
+        try:
+            with self.db.transaction():
+                for op in batch:
+                    self._apply(op)
+        except Exception:
+            # Одна ошибочная операция не должна откатывать остальные
+            for op in batch:
+                try:
+                    with self.db.transaction():
+                        self._apply(op)
+                except Exception as e:
+                    with self._lock:
+                        self._errors.append(f"{op['op']}: {e}")
+
+        with self._lock:
+            self._applied += len(batch)
+            drained = self._applied == self._journaled
+        # Чекпоинт вне блокировки: потоки загрузки продолжают ставить операции в журнал
+        if not drained or not self.db.checkpoint():
+            return
+        with self._lock:
+            # Пока шел чекпоинт, в журнал могли дописать новые операции
+            if self._applied == self._journaled:
+                self._journal.truncate(0)
+                self._journal.seek(0)
+
+    def _apply(self, op: dict[str, Any], replay: bool = False):
+        if op["op"] == "backup":
+            record = FileRecord.from_dict(op["record"])
+            if replay and self.db.get_file_record(record.id) is not None:
+                # Операция коммитится целиком: раз запись есть, есть и остальное
+                return
+            self.db.add_file_records([record])
+            self.db.add_archive_members(record.id, [ArchiveMember.from_dict(m) for m in op["members"]])
+            if op["manifest"] is not None:
+                self.db.save_manifest(
+                    record.backup_point_id, [ManifestEntry.from_dict(e) for e in op["manifest"]["entries"]],
+                    op["manifest"]["deleted"],
+                )
+        elif op["op"] == "records":
+            records = [FileRecord.from_dict(data) for data in op["records"]]
+            if replay:
+                # Коммит мог пройти до того, как журнал был очищен
+                records = [record for record in records if self.db.get_file_record(record.id) is None]
+            self.db.add_file_records(records)
+        elif op["op"] == "members":
+            self.db.add_archive_members(op["record_id"], [ArchiveMember.from_dict(m) for m in op["members"]])
+        elif op["op"] == "manifest":
+            self.db.save_manifest(
+                op["backup_point_id"], [ManifestEntry.from_dict(e) for e in op["entries"]], op["deleted"]
+            )
+        elif op["op"] == "run":
+            self.db.add_backup_run(BackupRun.from_dict(op["run"]))
+        else:
+            raise ValueError(f"Неизвестная операция журнала: {op['op']}")
+
+    def _replay(self) -> int:
+        """Применить операции, оставшиеся в журнале после сбоя."""
+        if not os.path.exists(self.journal_path):
+            return 0
+        ops = []
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    ops.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Последняя строка могла быть дописана не полностью
+                    break
+        for op in ops:
+            try:
+                with self.db.transaction():
+                    self._apply(op, replay=True)
+            except Exception as e:
+                # Ошибка отдается первому flush(), запуск приложения она не блокирует
+                self._errors.append(f"{op.get('op')}: {e}")
+        if self.db.checkpoint():
+            os.truncate(self.journal_path, 0)
+        return len(ops)
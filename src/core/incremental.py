@@ -0,0 +1,152 @@
+"""Инкрементальные бэкапы на основе манифеста файлов."""
+
+import os
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable
+
+from ..models import ArchiveMember, BackupPoint, ManifestEntry
+from .archive_utils import ArchiveResult, ArchiveUtils
+from .database import Database
+
+
+@dataclass
+class IncrementalPlan:
+    """
+    План запуска: какие файлы архивировать и какие пометить удаленными.
+    """
+
+    entries: list[ManifestEntry] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+    parent_id: str | None = None
+
+    @property
+    def is_full(self) -> bool:
+        """Полный бэкап - нет предыдущей записи в цепочке."""
+        return self.parent_id is None
+
+    @property
+    def has_changes(self) -> bool:
+        return self.is_full or bool(self.changed or self.deleted)
+
+
+class IncrementalBackup:
+    """
+    Инкрементальный бэкап точки.
+
+    Манифест в SQLite хранит для каждого файла размер, mtime_ns, inode и
+    хеш содержимого. Файл с неизменными метаданными не читается вовсе,
+    с измененными - хешируется и попадает в архив, только если поменялось
+    содержимое. Манифест обновляется через commit() после успешной загрузки,
+    поэтому неудачный запуск не теряет изменения.
+    """
+
+    def __init__(self, db: Database, point: BackupPoint):
+        self.db = db
+        self.point = point
+
+    def plan(self) -> IncrementalPlan:
+        """
+        Сравнить текущее состояние папки с манифестом.
+
+        Returns:
+            План запуска. Если манифеста или базовой записи нет - полный бэкап.
+        """
+        stored = self.db.get_manifest(self.point.id)
+        parent = self.db.get_latest_file_record(self.point.id) if stored else None
+        previous = stored if parent else {}
+
+        plan = IncrementalPlan(parent_id=parent.id if parent else None)
+        seen = set()
+
+        for entry in ArchiveUtils.iter_tree(self.point.source_path, self.point.exclude_patterns):
+            rel_path = entry.rel_path
+            seen.add(rel_path)
+            old = previous.get(rel_path)
+            if old and old.same_metadata(entry.size, entry.mtime_ns, entry.inode):
+                continue
+
+            content_hash = ArchiveUtils.calculate_file_hash(entry.path)
+            plan.entries.append(ManifestEntry(
+                rel_path=rel_path, size=entry.size, mtime_ns=entry.mtime_ns,
+                inode=entry.inode, content_hash=content_hash,
+            ))
+            # Файл только "тронут" - метаданные обновятся, в архив не идет
+            if old is None or old.content_hash != content_hash:
+                plan.changed.append(rel_path)
+
+        plan.deleted = sorted(set(stored) - seen)
+        return plan
+
+    def create_archive(
+        self,
+        plan: IncrementalPlan,
+        output_path: str,
+        progress_callback: Callable[[str, int, int], None] | None = None,
+        workers: int | None = 1,
+        smart_compression: bool = False,
+    ) -> ArchiveResult:
+        """
+        Создать архив с измененными файлами и списком удаленных.
+
+        Args:
+            plan: План запуска
+            output_path: Путь к создаваемому архиву
+            progress_callback: Колбэк (filename, current, total)
+            workers: Число процессов для сжатия (None - по числу ядер)
+            smart_compression: Не сжимать несжимаемые файлы
+
+        Returns:
+            Результат записи архива
+        """
+        return ArchiveUtils.create_archive(
+            self.point.source_path,
+            output_path,
+            self.point.archive_format,
+            self.point.compression_level,
+            progress_callback=progress_callback,
+            workers=workers,
+            files=[rel_path.replace("/", os.sep) for rel_path in plan.changed],
+            deleted=None if plan.is_full else plan.deleted,
+            smart_compression=smart_compression,
+        )
+
+    def write_archive(
+        self,
+        plan: IncrementalPlan,
+        sink: BinaryIO,
+        progress_callback: Callable[[str, int, int], None] | None = None,
+        workers: int | None = 1,
+        smart_compression: bool = False,
+        catalog: list[ArchiveMember] | None = None,
+    ) -> tuple[int, int]:
+        """
+        Записать архив запуска в поток (например, в конвейер BackupEngine).
+
+        Args:
+            plan: План запуска
+            sink: Поток для записи
+            progress_callback: Колбэк (filename, current, total)
+            workers: Число процессов для сжатия (None - по числу ядер)
+            smart_compression: Не сжимать несжимаемые файлы
+            catalog: Список для каталога ZIP (см. ArchiveUtils.write_archive)
+
+        Returns:
+            (байт без сжатия, байт сжато)
+        """
+        return ArchiveUtils.write_archive(
+            sink,
+            self.point.source_path,
+            self.point.archive_format,
+            self.point.compression_level,
+            progress_callback=progress_callback,
+            workers=workers,
+            files=[rel_path.replace("/", os.sep) for rel_path in plan.changed],
+            deleted=None if plan.is_full else plan.deleted,
+            smart_compression=smart_compression,
+            catalog=catalog,
+        )
+
+    def commit(self, plan: IncrementalPlan):
+        """Сохранить манифест после успешной загрузки архива."""
+        self.db.save_manifest(self.point.id, plan.entries, plan.deleted)
@@ -0,0 +1,440 @@
+"""Восстановление бэкапов из хранилищ."""
+
+import io
+import json
+import os
+import shutil
+import struct
+import tarfile
+import tempfile
+import zipfile
+import zlib
+from collections import deque
+from contextlib import closing
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Callable, Iterator
+
+from ..models import ArchiveMember, FileRecord
+from .archive_utils import ArchiveUtils, _copy_file_range, _new_hash, zstd
+from .database import Database
+
+if TYPE_CHECKING:
+    from ..connectors.base import BaseConnector
+
+
+class _PartDownloader:
+    """
+    Параллельное скачивание частей с выдачей их строго по порядку.
+
+    Одновременно в работе не больше max_workers * 2 частей, поэтому на
+    диске лежит ограниченное число скачанных, но еще не обработанных частей.
+    Хеш части проверяется в потоке скачивания, сразу по ее прибытии.
+    """
+
+    def __init__(
+        self,
+        connector: "BaseConnector",
+        refs: list[str],
+        part_hashes: list[str],
+        hash_algorithm: str,
+        work_dir: str,
+        max_workers: int,
+    ):
+        self.connector = connector
+        self.refs = refs
+        self.part_hashes = part_hashes
+        self.hash_algorithm = hash_algorithm
+        self.work_dir = work_dir
+        self.max_workers = max_workers
+
+    def _download(self, index: int) -> str:
+        """Скачать часть и проверить ее хеш (выполняется в пуле потоков)."""
+        part_path = os.path.join(self.work_dir, f"part{index + 1:03d}")
+        success, result = self.connector.download_to_file(self.refs[index], part_path)
+        if not success:
+            raise RuntimeError(f"Ошибка скачивания части {index + 1}: {result}")
+
+        if index < len(self.part_hashes):
+            actual = ArchiveUtils.calculate_file_hash(part_path, self.hash_algorithm)
+            if actual != self.part_hashes[index]:
+                Path(part_path).unlink(missing_ok=True)
+                raise RuntimeError(f"Хеш части {index + 1} не совпадает: {actual} != {self.part_hashes[index]}")
+        return part_path
+
+    def __iter__(self) -> Iterator[str]:
+        """Пути к проверенным частям по порядку. Часть удаляется, когда берется следующая."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            in_flight: deque[Future] = deque()
+            pending = iter(range(len(self.refs)))
+            try:
+                for index in pending:
+                    in_flight.append(pool.submit(self._download, index))
+                    if len(in_flight) >= self.max_workers * 2:
+                        break
+
+                while in_flight:
+                    part_path = in_flight.popleft().result()
+                    index = next(pending, None)
+                    if index is not None:
+                        in_flight.append(pool.submit(self._download, index))
+
+                    try:
+                        yield part_path
+                    finally:
+                        Path(part_path).unlink(missing_ok=True)
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+
+class _PartStream(io.RawIOBase):
+    """
+    Поток для чтения частей как одного файла, по мере их готовности.
+
+    Позволяет tarfile распаковывать архив, пока следующие части еще качаются.
+    """
+
+    def __init__(self, parts: Iterator[str], hash_obj=None):
+        super().__init__()
+        self._parts = parts
+        self._current: BinaryIO | None = None
+        self._hash = hash_obj
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while True:
+            if self._current is None:
+                part_path = next(self._parts, None)
+                if part_path is None:
+                    return 0
+                self._current = open(part_path, "rb")
+
+            size = self._current.readinto(buffer)
+            if size:
+                if self._hash is not None:
+                    self._hash.update(memoryview(buffer)[:size])
+                return size
+            self._current.close()
+            self._current = None
+
+    def drain(self):
+        """Дочитать поток до конца (tarfile не читает хвост после маркера конца архива)."""
+        buffer = bytearray(ArchiveUtils.CHUNK_SIZE)
+        while self.readinto(buffer):
+            pass
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        super().close()
+
+
+class _RangeReader:
+    """
+    Чтение диапазонов байт архива, разбитого на части, по смещению от начала архива.
+
+    Если хранилище умеет читать диапазон (SUPPORTS_RANGE_READ), качаются
+    только нужные байты. Иначе скачивается целиком только та часть, в
+    которую попал диапазон.
+    """
+
+    CHUNK_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, connector: "BaseConnector", refs: list[str], part_size: int, work_dir: str):
+        self.connector = connector
+        self.refs = refs
+        self.part_size = part_size
+        self.work_dir = work_dir
+        self._downloaded: dict[int, str] = {}
+
+    def _read_part(self, index: int, offset: int, length: int) -> bytes:
+        if self.connector.SUPPORTS_RANGE_READ:
+            success, result = self.connector.read_range(self.refs[index], offset, length)
+            if not success:
+                raise RuntimeError(f"Ошибка чтения части {index + 1}: {result}")
+            return result
+
+        part_path = self._downloaded.get(index)
+        if part_path is None:
+            part_path = os.path.join(self.work_dir, f"part{index + 1:03d}")
+            success, result = self.connector.download_to_file(self.refs[index], part_path)
+            if not success:
+                raise RuntimeError(f"Ошибка скачивания части {index + 1}: {result}")
+            self._downloaded[index] = part_path
+        with open(part_path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def iter_range(self, offset: int, length: int) -> Iterator[bytes]:
+        """Выдать length байт начиная с offset блоками не больше CHUNK_SIZE."""
+        while length > 0:
+            if self.part_size:
+                index, part_offset = divmod(offset, self.part_size)
+                size = min(length, self.CHUNK_SIZE, self.part_size - part_offset)
+            else:
+                index, part_offset, size = 0, offset, min(length, self.CHUNK_SIZE)
+            if index >= len(self.refs):
+                raise RuntimeError("Диапазон выходит за пределы архива")
+            data = self._read_part(index, part_offset, size)
+            if len(data) != size:
+                raise RuntimeError(f"Часть {index + 1} короче, чем указано в каталоге")
+            yield data
+            offset += size
+            length -= size
+
+    def read(self, offset: int, length: int) -> bytes:
+        return b"".join(self.iter_range(offset, length))
+
+
+class RestoreEngine:
+    """
+    Восстановление записей истории из хранилищ.
+
+    Части качаются параллельно прямо на диск и сразу проверяются по хешам.
+    Tar-архивы распаковываются потоком, пока качаются следующие части.
+    ZIP требует центральный каталог в конце файла, поэтому части склеиваются
+    в архив по мере прибытия, а распаковка начинается после последней части.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        connectors: dict[str, "BaseConnector"],
+        work_dir: str | None = None,
+        max_workers: int = 4,
+    ):
+        self.db = db
+        self.connectors = connectors
+        self.work_dir = work_dir or tempfile.gettempdir()
+        self.max_workers = max_workers
+
+    def restore(
+        self,
+        record: FileRecord,
+        output_dir: str,
+        target_id: str | None = None,
+        extract: bool = True,
+        progress_callback: Callable[[int, int], None] | None = None,
+    ) -> str:
+        """
+        Восстановить одну запись истории.
+
+        Args:
+            record: Запись истории
+            output_dir: Папка для результата
+            target_id: Хранилище, из которого качать (по умолчанию - первое доступное)
+            extract: Распаковать архив; иначе в output_dir кладется собранный архив
+            progress_callback: Колбэк (готово частей, всего частей)
+
+        Returns:
+            Путь к папке с распакованными файлами или к собранному архиву
+        """
+        _, connector, refs = self._select_target(record, target_id)
+        archive_format = ArchiveUtils.detect_format(record.file_path)
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+        part_hashes = record.part_hashes
+        if not part_hashes and len(refs) == 1:
+            part_hashes = [record.file_hash]
+        # Для старых записей без хешей частей проверяется хеш всего архива
+        full_hash = None if part_hashes else _new_hash(record.hash_algorithm)
+
+        temp_dir = tempfile.mkdtemp(prefix="restore_", dir=self.work_dir)
+        try:
+            downloader = _PartDownloader(
+                connector, refs, part_hashes, record.hash_algorithm, temp_dir,
+                min(self.max_workers, connector.MAX_PARALLEL_DOWNLOADS),
+            )
+            # closing() останавливает скачивание, если распаковка упала на середине
+            with closing(self._track_progress(iter(downloader), len(refs), progress_callback)) as parts:
+                if extract and archive_format and archive_format != "zip":
+                    with _PartStream(parts, full_hash) as stream:
+                        self._extract_tar(stream, archive_format, output_dir)
+                        stream.drain()
+                    if full_hash is not None and full_hash.hexdigest() != record.file_hash:
+                        raise RuntimeError("Хеш восстановленного архива не совпадает с историей")
+                    return output_dir
+
+                archive_path = os.path.join(temp_dir if extract else output_dir, os.path.basename(record.file_path))
+                with open(archive_path, "wb", buffering=0) as out:
+                    for part_path in parts:
+                        with open(part_path, "rb", buffering=0) as part:
+                            _copy_file_range(part.fileno(), out.fileno(), 0, os.fstat(part.fileno()).st_size)
+
+            if full_hash is not None:
+                if ArchiveUtils.calculate_file_hash(archive_path, record.hash_algorithm) != record.file_hash:
+                    raise RuntimeError("Хеш восстановленного архива не совпадает с историей")
+
+            if not extract:
+                return archive_path
+            if archive_format != "zip":
+                raise RuntimeError(f"Неизвестный формат архива: {record.file_path}")
+            with zipfile.ZipFile(archive_path) as zf:
+                zf.extractall(output_dir)
+            return output_dir
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def restore_member(
+        self,
+        record: FileRecord,
+        member_name: str,
+        output_dir: str,
+        target_id: str | None = None,
+    ) -> str:
+        """
+        Восстановить один файл ZIP архива по каталогу, не скачивая архив целиком.
+
+        Читается только локальный заголовок и сжатые данные файла; если
+        хранилище не умеет читать диапазоны - только части, в которые они попали.
+
+        Args:
+            record: Запись истории
+            member_name: Имя файла внутри архива (как в каталоге)
+            output_dir: Папка для результата
+            target_id: Хранилище, из которого читать
+
+        Returns:
+            Путь к восстановленному файлу
+        """
+        member = self.db.get_archive_member(record.id, member_name)
+        if member is None:
+            raise RuntimeError(f"Файла {member_name} нет в каталоге записи {record.id}")
+        if member.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise RuntimeError(f"Неподдерживаемый метод сжатия: {member.compress_type}")
+
+        output_path = os.path.realpath(os.path.join(output_dir, member_name))
+        if not output_path.startswith(os.path.realpath(output_dir) + os.sep):
+            raise RuntimeError(f"Недопустимое имя файла в каталоге: {member_name}")
+
+        _, connector, refs = self._select_target(record, target_id)
+        temp_dir = tempfile.mkdtemp(prefix="restore_", dir=self.work_dir)
+        try:
+            reader = _RangeReader(connector, refs, record.part_size, temp_dir)
+            header_offset = member.part_index * record.part_size + member.part_offset
+            header = reader.read(header_offset, 30)
+            if header[:4] != b"PK\x03\x04":
+                raise RuntimeError(f"По смещению из каталога нет заголовка файла {member_name}")
+            name_length, extra_length = struct.unpack("<HH", header[26:30])
+            data_offset = header_offset + 30 + name_length + extra_length
+
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            self._write_member(reader.iter_range(data_offset, member.compressed_size), member, output_path)
+            return output_path
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _write_member(chunks: Iterator[bytes], member: ArchiveMember, output_path: str):
+        """Распаковать данные файла ZIP и сверить CRC."""
+        decompressor = zlib.decompressobj(-15) if member.compress_type == zipfile.ZIP_DEFLATED else None
+        crc = 0
+        size = 0
+        with open(output_path, "wb") as out:
+            for chunk in chunks:
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                out.write(chunk)
+            if decompressor is not None:
+                tail = decompressor.flush()
+                crc = zlib.crc32(tail, crc)
+                size += len(tail)
+                out.write(tail)
+        if crc != member.crc or size != member.size:
+            Path(output_path).unlink(missing_ok=True)
+            raise RuntimeError(f"CRC файла {member.name} не совпадает с каталогом")
+
+    def restore_chain(
+        self,
+        record: FileRecord,
+        output_dir: str,
+        target_id: str | None = None,
+        progress_callback: Callable[[int, int], None] | None = None,
+    ) -> str:
+        """
+        Восстановить состояние на момент инкремента: полный бэкап и все инкременты после него.
+
+        Args:
+            record: Запись истории (полная или инкрементальная)
+            output_dir: Папка для результата
+            target_id: Хранилище, из которого качать
+            progress_callback: Колбэк (восстановлено записей, всего записей)
+
+        Returns:
+            Путь к папке с восстановленными файлами
+        """
+        chain = self.db.get_backup_chain(record.id)
+        for processed, item in enumerate(chain, start=1):
+            self.restore(item, output_dir, target_id)
+            if item.is_incremental:
+                self._apply_tombstone(item, output_dir)
+            if progress_callback:
+                progress_callback(processed, len(chain))
+        return output_dir
+
+    def _select_target(self, record: FileRecord, target_id: str | None) -> tuple[str, "BaseConnector", list[str]]:
+        """Выбрать хранилище, из которого можно скачать запись."""
+        candidates = [target_id] if target_id else list(record.remote_refs)
+        for candidate in candidates:
+            refs = record.remote_refs.get(candidate)
+            connector = self.connectors.get(candidate)
+            if refs and connector:
+                return candidate, connector, refs
+        raise RuntimeError(f"Нет доступного хранилища для записи {record.id}")
+
+    @staticmethod
+    def _track_progress(
+        parts: Iterator[str], total: int, progress_callback: Callable[[int, int], None] | None
+    ) -> Iterator[str]:
+        """Сообщать о прогрессе по мере обработки частей."""
+        for processed, part_path in enumerate(parts, start=1):
+            yield part_path
+            if progress_callback:
+                progress_callback(processed, total)
+
+    @staticmethod
+    def _extract_tar(stream: BinaryIO, archive_format: str, output_dir: str):
+        """Распаковать tar поток, не требуя seek."""
+        codec = None
+        mode = {"tar": "r|", "tar.gz": "r|gz", "tar.xz": "r|xz", "tar.zst": "r|"}[archive_format]
+        if archive_format == "tar.zst":
+            if zstd is None:
+                raise RuntimeError("Формат tar.zst требует модуль compression.zstd (Python 3.14+)")
+            codec = zstd.ZstdFile(stream)
+        try:
+            with tarfile.open(fileobj=codec or stream, mode=mode) as tf:
+                # Фильтр "data" отклоняет абсолютные пути, ".." и спецфайлы
+                if hasattr(tarfile, "data_filter"):
+                    tf.extractall(output_dir, filter="data")
+                else:
+                    tf.extractall(output_dir)
+        finally:
+            if codec is not None:
+                codec.close()
+
+    def _apply_tombstone(self, record: FileRecord, output_dir: str):
+        """Удалить файлы, помеченные удаленными в инкременте."""
+        tombstone = Path(output_dir) / ArchiveUtils.TOMBSTONE_NAME
+        if not tombstone.exists():
+            return
+        deleted = json.loads(tombstone.read_text(encoding="utf-8"))
+        root = Path(output_dir) / self._source_prefix(record, output_dir)
+        for rel_path in deleted:
+            (root / rel_path).unlink(missing_ok=True)
+        shutil.rmtree(tombstone.parent, ignore_errors=True)
+
+    def _source_prefix(self, record: FileRecord, output_dir: str) -> str:
+        """Имя папки-источника, под которым файлы лежат в архиве."""
+        point = self.db.get_backup_point(record.backup_point_id)
+        if point:
+            return Path(point.source_path).name
+        # Точка удалена - берем единственную папку верхнего уровня
+        service_dir = Path(ArchiveUtils.TOMBSTONE_NAME).parts[0]
+        dirs = [p.name for p in Path(output_dir).iterdir() if p.is_dir() and p.name != service_dir]
+        return dirs[0] if len(dirs) == 1 else ""
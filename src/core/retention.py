@@ -0,0 +1,174 @@
+"""Правила хранения: удаление устаревших бэкапов из хранилищ и истории."""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable
+
+from ..models import BackupPoint, FileRecord
+from .database import Database
+
+if TYPE_CHECKING:
+    from ..connectors.base import BaseConnector
+
+
+@dataclass
+class RetentionResult:
+    """
+    Итоги применения правил хранения.
+    """
+
+    expired: list[FileRecord] = field(default_factory=list)  # Записи, которые не оставляет ни одно правило
+    deleted_records: int = 0
+    deleted_objects: int = 0
+    failed: dict[str, str] = field(default_factory=dict)  # Ссылка на объект -> текст ошибки
+    undeletable: dict[str, str] = field(default_factory=dict)  # Ссылка -> почему хранилище не может ее удалить
+    shared_objects: int = 0  # Объекты, на которые ссылаются оставленные записи
+    freed_pages: int = 0
+
+    @property
+    def success(self) -> bool:
+        """Все устаревшие объекты удалены."""
+        return not self.failed
+
+
+class RetentionEngine:
+    """
+    Сборщик мусора для точки бэкапа.
+
+    Объекты в каждом хранилище удаляются параллельно, не больше
+    MAX_PARALLEL_DELETES коннектора одновременно. Объект, на который
+    ссылается оставленная запись, не удаляется. Запись удаляется из
+    истории, только когда удалены все ее объекты; иначе из нее убираются
+    хранилища, где удаление прошло, и запись дождется следующего запуска.
+    Запись с хранилищем без ссылок на объекты остается в истории: удалить
+    ее архив можно только вручную.
+
+    Объекты, которые хранилище не может удалить совсем (коннектор без
+    удаления или старше DELETE_MAX_AGE), не повторяются: они попадают в
+    undeletable, и хранилище убирается из записи.
+    """
+
+    def __init__(self, db: Database, connectors: dict[str, "BaseConnector"]):
+        self.db = db
+        self.connectors = connectors
+
+    def expired_records(self, point: BackupPoint) -> list[FileRecord]:
+        """Записи точки, которые удалит apply()."""
+        return self.db.get_expired_records(point.id, point.retention)
+
+    def apply(
+        self,
+        point: BackupPoint,
+        dry_run: bool = False,
+        log_callback: Callable[[str], None] | None = None,
+    ) -> RetentionResult:
+        """
+        Удалить устаревшие бэкапы точки.
+
+        Args:
+            point: Точка бэкапа с правилами хранения
+            dry_run: Только найти устаревшие записи, ничего не удаляя
+            log_callback: Колбэк для сообщений об удалении
+
+        Returns:
+            Итоги применения правил
+        """
+        result = RetentionResult(expired=self.expired_records(point))
+        if dry_run or not result.expired:
+            return result
+
+        # Хранилище -> ссылка -> записи; одна запись может состоять из многих частей
+        jobs: dict[str, dict[str, list[FileRecord]]] = {}
+        failed_targets: dict[str, set[str]] = {record.id: set() for record in result.expired}
+        now = datetime.now()
+        for record in result.expired:
+            for target_id in record.targets:
+                refs = record.remote_refs.get(target_id, [])
+                connector = self.connectors.get(target_id)
+                if not refs:
+                    # Без ссылок объекты не найти: запись остается, чтобы архив не потерялся
+                    failed_targets[record.id].add(target_id)
+                    result.failed[f"{target_id}:{record.file_path}"] = "Нет ссылок на объекты в хранилище"
+                    continue
+                if connector is None:
+                    failed_targets[record.id].add(target_id)
+                    result.failed[f"{target_id}:{record.file_path}"] = "Хранилище не найдено"
+                    continue
+                reason = self._undeletable_reason(connector, record, now)
+                if reason:
+                    result.undeletable.update(dict.fromkeys(refs, reason))
+                    if log_callback:
+                        log_callback(f"{reason}, удалите вручную: {', '.join(refs)}")
+                    continue
+                for ref in refs:
+                    jobs.setdefault(target_id, {}).setdefault(ref, []).append(record)
+
+        # Одинаковая ссылка у оставленной записи значит, что объект еще нужен
+        expired_ids = {record.id for record in result.expired}
+        for target_id, refs in jobs.items():
+            for ref, owners in self.db.get_ref_owners(target_id, list(refs)).items():
+                if owners - expired_ids:
+                    del refs[ref]
+                    result.shared_objects += 1
+
+        executors = {
+            target_id: ThreadPoolExecutor(
+                max_workers=max(1, self.connectors[target_id].MAX_PARALLEL_DELETES),
+                thread_name_prefix=f"delete-{target_id}",
+            )
+            for target_id, refs in jobs.items()
+            if refs
+        }
+        try:
+            futures = [
+                (target_id, records, ref, executors[target_id].submit(self.connectors[target_id].delete_file, ref))
+                for target_id, refs in jobs.items()
+                for ref, records in refs.items()
+            ]
+            for target_id, records, ref, future in futures:
+                try:
+                    success, message = future.result()
+                except Exception as e:
+                    success, message = False, str(e)
+                if success:
+                    result.deleted_objects += 1
+                else:
+                    for record in records:
+                        failed_targets[record.id].add(target_id)
+                    result.failed[ref] = message
+                    if log_callback:
+                        log_callback(f"Не удалось удалить {ref} из {self.connectors[target_id].name}: {message}")
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+        deleted_ids = []
+        with self.db.transaction():
+            for record in result.expired:
+                if not failed_targets[record.id]:
+                    deleted_ids.append(record.id)
+                    continue
+                cleaned = [target_id for target_id in record.targets if target_id not in failed_targets[record.id]]
+                if cleaned:
+                    self.db.remove_record_targets(record.id, cleaned)
+            result.deleted_records = self.db.delete_file_records(deleted_ids)
+
+        result.freed_pages = self.db.compact()
+        if log_callback:
+            log_callback(
+                f"Хранение ({point.retention}): удалено бэкапов {result.deleted_records} "
+                f"из {len(result.expired)}, объектов {result.deleted_objects}"
+                + (f", оставлено общих с другими бэкапами {result.shared_objects}" if result.shared_objects else "")
+            )
+        return result
+
+    @staticmethod
+    def _undeletable_reason(connector: "BaseConnector", record: FileRecord, now: datetime) -> str | None:
+        """Почему хранилище уже никогда не удалит объекты записи (None - удалить можно)."""
+        if not connector.SUPPORTS_DELETE:
+            return f"{connector.name} не поддерживает удаление"
+        if connector.DELETE_MAX_AGE is not None and now - record.uploaded_at > connector.DELETE_MAX_AGE:
+            hours = connector.DELETE_MAX_AGE.total_seconds() / 3600
+            return f"{connector.name} удаляет объекты только в течение {hours:g} ч после загрузки"
+        return None
@@ -3,6 +3,7 @@
 import customtkinter as ctk
 
 from ..core.database import Database
+from ..core.history_writer import HistoryWriter
 from .tabs.backup_tab import BackupTab
 from .tabs.connections_tab import ConnectionsTab
 from .tabs.history_tab import HistoryTab
@@ -19,6 +20,8 @@ class MainWindow(ctk.CTk):
         self.geometry("1000x700")
 
         self.db = Database()
+        # Записи, не попавшие в БД при прошлом запуске, применяются здесь
+        self.history_writer = HistoryWriter(self.db)
 
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(0, weight=1)
@@ -35,7 +38,7 @@ class MainWindow(ctk.CTk):
         self.tab_connections = self.tabview.add("Подключения")
         self.tab_history = self.tabview.add("История")
 
-        self.backup_tab = BackupTab(self.tab_backup, self.db)
+        self.backup_tab = BackupTab(self.tab_backup, self.db, self.history_writer)
         self.backup_tab.pack(fill="both", expand=True, padx=10, pady=10)
 
         self.connections_tab = ConnectionsTab(self.tab_connections, self.db)
@@ -61,5 +64,6 @@ class MainWindow(ctk.CTk):
 
     def destroy(self):
         """Закрыть приложение."""
+        self.history_writer.close()
         self.db.close()
         super().destroy()
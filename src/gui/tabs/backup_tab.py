@@ -4,20 +4,29 @@ import os
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
 import threading
+import time
+from datetime import datetime
 import customtkinter as ctk
 
 from ...core.database import Database
-from ...models import BackupPoint, ConnectionConfig
+from ...connectors.base import BaseConnector
+from ...connectors.factory import create_connector
+from ...models import BackupPoint, BackupRun, ConnectionConfig, FileRecord, RetentionPolicy
 from ...core.archive_utils import ArchiveUtils
+from ...core.backup_engine import BackupEngine, BackupRunResult
+from ...core.history_writer import HistoryWriter
+from ...core.incremental import IncrementalBackup
+from ...core.retention import RetentionEngine
 
 
 class BackupTab(ctk.CTkFrame):
     """Вкладка для создания и запуска бэкапов."""
 
-    def __init__(self, parent, db: Database):
+    def __init__(self, parent, db: Database, history_writer: HistoryWriter):
         """Инициализация."""
         super().__init__(parent)
         self.db = db
+        self.history_writer = history_writer
         self.backup_points = []
         self.connections = []
 
@@ -40,6 +49,20 @@ class BackupTab(ctk.CTkFrame):
         ctk.CTkButton(frame, text="+", width=30, command=self._add_backup_point).pack(side="left", padx=5)
         ctk.CTkButton(frame, text="-", width=30, command=self._delete_backup_point).pack(side="left", padx=5)
 
+        # Правила хранения точки: 0 - правило отключено
+        ctk.CTkLabel(frame, text="Хранить:").pack(side="left", padx=(10, 0))
+        self.retention_entries = {}
+        for key, label in (
+            ("keep_last", "последних"), ("keep_daily", "дней"), ("keep_weekly", "недель"), ("keep_monthly", "месяцев"),
+        ):
+            entry = ctk.CTkEntry(frame, width=40)
+            entry.insert(0, "0")
+            entry.pack(side="left", padx=(5, 0))
+            entry.bind("<FocusOut>", self._on_retention_changed)
+            entry.bind("<Return>", self._on_retention_changed)
+            ctk.CTkLabel(frame, text=label).pack(side="left", padx=(2, 5))
+            self.retention_entries[key] = entry
+
         # Средняя панель
         frame = ctk.CTkFrame(self)
         frame.grid(row=1, column=0, padx=10, pady=10, sticky="ew")
@@ -51,6 +74,19 @@ class BackupTab(ctk.CTkFrame):
 
         ctk.CTkButton(frame, text="Обзор...", command=self._browse_source).pack(side="left", padx=10)
 
+        self.var_incremental = tk.BooleanVar()
+        ctk.CTkCheckBox(
+            frame, text="Инкрементальный", variable=self.var_incremental, command=self._on_incremental_toggled
+        ).pack(side="left", padx=10)
+
+        ctk.CTkLabel(frame, text="Формат:").pack(side="left", padx=(10, 0))
+
+        self.combo_format = ctk.CTkComboBox(
+            frame, values=ArchiveUtils.available_formats(), width=100, command=self._on_format_selected
+        )
+        self.combo_format.set("zip")
+        self.combo_format.pack(side="left", padx=10)
+
         # Целевые хранилища
         frame = ctk.CTkFrame(self)
         frame.grid(row=2, column=0, padx=10, pady=10, sticky="ew")
@@ -126,10 +162,74 @@ class BackupTab(ctk.CTkFrame):
             if str(point) == selected:
                 self.entry_source.delete(0, "end")
                 self.entry_source.insert(0, point.source_path)
+                self.var_incremental.set(point.incremental)
+                self.combo_format.set(point.archive_format)
+                self._set_retention_entries(point.retention)
                 for conn, checkbox, var in self.checkbox_targets:
                     var.set(conn.id in point.target_ids)
                 break
 
+    def _get_selected_point(self) -> BackupPoint | None:
+        """Получить выбранную точку бэкапа."""
+        selected = self.combo_backup_point.get()
+        for point in self.backup_points:
+            if str(point) == selected:
+                return point
+        return None
+
+    def _on_incremental_toggled(self):
+        """Сохранить режим инкрементального бэкапа для выбранной точки."""
+        point = self._get_selected_point()
+        if point:
+            point.incremental = self.var_incremental.get()
+            self.db.update_backup_point(point)
+
+    def _on_format_selected(self, archive_format: str):
+        """Сохранить формат архива для выбранной точки."""
+        point = self._get_selected_point()
+        if point:
+            point.archive_format = archive_format
+            self.db.update_backup_point(point)
+
+    def _set_retention_entries(self, policy: RetentionPolicy):
+        """Показать правила хранения в полях ввода."""
+        for key, entry in self.retention_entries.items():
+            entry.delete(0, "end")
+            entry.insert(0, str(getattr(policy, key)))
+
+    def _on_retention_changed(self, event=None):
+        """Сохранить правила хранения для выбранной точки."""
+        point = self._get_selected_point()
+        if not point:
+            return
+        values = {}
+        for key, entry in self.retention_entries.items():
+            try:
+                values[key] = max(0, int(entry.get() or 0))
+            except ValueError:
+                values[key] = getattr(point.retention, key)
+        policy = RetentionPolicy(**values)
+        self._set_retention_entries(policy)
+        if policy != point.retention:
+            point.retention = policy
+            self.db.update_backup_point(point)
+
+    def _apply_retention(self, point: BackupPoint):
+        """Удалить бэкапы точки, которые не оставляют правила хранения."""
+        # Старые бэкапы могут лежать и в хранилищах, не выбранных для этого запуска
+        connectors = {}
+        for conn in self.db.get_all_connections():
+            connector = create_connector(conn)
+            if connector is not None:
+                connectors[conn.id] = connector
+        try:
+            result = RetentionEngine(self.db, connectors).apply(point, log_callback=self._log)
+        finally:
+            for connector in connectors.values():
+                connector.close()
+        if result.failed:
+            self._log(f"Не удалено объектов: {len(result.failed)}, записи остались в истории")
+
     def _browse_source(self):
         """Выбрать папку."""
         path = filedialog.askdirectory(title="Выберите папку для бэкапа")
@@ -156,44 +256,126 @@ class BackupTab(ctk.CTkFrame):
         self.btn_start.configure(state="disabled")
         self.progress.set(0)
 
-        thread = threading.Thread(target=self._backup_worker, args=(source, targets), daemon=True)
+        point = self._get_selected_point()
+        thread = threading.Thread(target=self._backup_worker, args=(source, targets, point), daemon=True)
         thread.start()
 
-    def _backup_worker(self, source: str, targets: list[ConnectionConfig]):
+    def _backup_worker(self, source: str, targets: list[ConnectionConfig], point: BackupPoint | None = None):
         """Воркер для выполнения бэкапа."""
+        # Журнал запуска: этап, на котором случилась ошибка, и длительности этапов
+        ledger = BackupRun(backup_point_id=point.id if point else "")
+        stage = "scan"
         try:
             self._log(f"Начинаем бэкап: {source}")
 
-            archive_path = os.path.join(os.path.dirname(source), f"backup_{os.path.basename(source)}.zip")
-            self._log("Создаем архив...")
-
-            ArchiveUtils.create_zip_archive(source, archive_path, progress_callback=self._archive_progress)
-
-            self._log(f"Архив создан: {archive_path}")
-
-            file_hash = ArchiveUtils.calculate_file_hash(archive_path)
-            self._log(f"Хеш файла: {file_hash}")
+            archive_format = self.combo_format.get()
+            archive_name = f"backup_{os.path.basename(source)}{ArchiveUtils.archive_extension(archive_format)}"
+            archive_path = os.path.join(os.path.dirname(source), archive_name)
 
+            connectors = {}
             for conn in targets:
-                self._log(f"Загружаем в {conn.name}...")
-
-                if self.db.is_file_uploaded(file_hash, conn.id):
-                    self._log(f"Файл уже загружен в {conn.name}, пропускаем")
+                connector = create_connector(conn)
+                if connector is None:
+                    self._log(f"Неизвестный тип подключения: {conn.name}")
                     continue
-
-                success, result = conn.upload_file(archive_path)
-                if success:
-                    self._log(f"Загружено: {result}")
-                    self._save_to_history(archive_path, file_hash, conn.id)
+                connectors[conn.id] = connector
+            if not connectors:
+                self._log("Нет доступных хранилищ")
+                return
+
+            incremental = None
+            plan = None
+            if point and point.incremental and point.source_path == source:
+                incremental = IncrementalBackup(self.db, point)
+                start = time.perf_counter()
+                plan = incremental.plan()
+                ledger.stages["scan"] = time.perf_counter() - start
+                if not plan.has_changes:
+                    incremental.commit(plan)
+                    self._log("Изменений нет, бэкап не требуется")
+                    self.progress.set(1)
+                    return
+                if not plan.is_full:
+                    self._log(f"Инкремент: изменено {len(plan.changed)}, удалено {len(plan.deleted)}")
+
+            # Части архива загружаются по мере готовности, пока сжимается следующая
+            self._log("Создаем архив и загружаем части...")
+            stage = "compress"
+            engine = BackupEngine(connectors)
+            # Метка связывает объекты в хранилищах с записью журнала запусков
+            run_tag = f"{ledger.started_at:%Y%m%d_%H%M%S}_{ledger.id[:8]}"
+            if incremental:
+                catalog = []
+                run = engine.run(
+                    archive_name,
+                    lambda sink: incremental.write_archive(
+                        plan, sink, progress_callback=self._archive_progress, workers=None,
+                        smart_compression=True, catalog=catalog,
+                    ),
+                    log_callback=self._log,
+                    catalog=catalog,
+                    run_tag=run_tag,
+                )
+            else:
+                # Без точки бэкапа - настройки по умолчанию, как в BackupEngine.backup
+                run = engine.backup(
+                    source, archive_name, archive_format,
+                    compression_level=point.compression_level if point else 6,
+                    exclude_patterns=point.exclude_patterns if point else None,
+                    progress_callback=self._archive_progress, log_callback=self._log, run_tag=run_tag,
+                )
+
+            self._log(f"Архив: {archive_name}, частей: {len(run.parts)}")
+            self._log(
+                f"Сжато: {ArchiveUtils.format_size(run.compressed_bytes)}, "
+                f"без сжатия: {ArchiveUtils.format_size(run.stored_bytes)}"
+            )
+            self._log(f"Хеш файла ({run.hash_algorithm}): {run.file_hash}")
+            for target_id, error in run.errors.items():
+                self._log(f"Ошибка загрузки в {connectors[target_id].name}: {error}")
+                ledger.errors[f"upload:{target_id}"] = error
+            ledger.stages.update(run.stage_seconds)
+            ledger.uploads = run.upload_seconds
+            ledger.bytes_in = run.stored_bytes + run.compressed_bytes
+            ledger.bytes_out = run.size
+            ledger.file_count = run.file_count or (len(plan.changed) if plan else 0)
+            self._log(str(ledger))
+
+            # История пишется потоком записи; flush() дожидается коммита перед правилами хранения
+            stage = "history"
+            if not incremental:
+                # Хеш архива известен только после загрузки: повторную копию удаляем
+                self._drop_duplicate_uploads(run, connectors)
+                if not run.remote_refs and not run.errors:
+                    self._log("Такой архив уже есть во всех хранилищах, запись в историю не нужна")
+            if run.remote_refs:
+                record = self._make_record(
+                    archive_path, run.file_hash, run.size, run.remote_refs,
+                    point.id if point else "", plan.parent_id if plan else None, run.hash_algorithm,
+                    run.part_hashes, run.parts, run.part_size,
+                )
+                # Запись, каталог и манифест коммитятся вместе. Манифест обновляем,
+                # только когда инкремент есть во всех хранилищах
+                if incremental and run.success:
+                    self.history_writer.add_backup(record, run.members, plan.entries, plan.deleted)
                 else:
-                    self._log(f"Ошибка загрузки в {conn.name}: {result}")
+                    self.history_writer.add_backup(record, run.members)
+                ledger.record_id = record.id
+            self.history_writer.flush()
+
+            if point and run.success and point.retention.is_enabled:
+                stage = "retention"
+                self._apply_retention(point)
 
             self._log("Бэкап завершен!")
             self.progress.set(1)
 
         except Exception as e:
             self._log(f"Ошибка: {e}")
+            ledger.errors[stage] = str(e)
         finally:
+            ledger.finished_at = datetime.now()
+            self.history_writer.add_backup_run(ledger)
             self.btn_start.configure(state="normal")
 
     def _archive_progress(self, filename: str, current: int, total: int):
@@ -201,14 +383,39 @@ class BackupTab(ctk.CTkFrame):
         percent = current / total if total > 0 else 0
         self.progress.set(percent * 0.5)
 
-    def _save_to_history(self, file_path: str, file_hash: str, target_id: str):
-        """Сохранить информацию о загруженном файле."""
-        from ...models import FileRecord
-        record = FileRecord(
-            backup_point_id="", file_path=file_path, file_hash=file_hash,
-            file_size=os.path.getsize(file_path), targets=[target_id],
+    def _drop_duplicate_uploads(self, run: BackupRunResult, connectors: dict[str, BaseConnector]):
+        """
+        Дедупликация по хешу архива: убрать из итогов хранилища, где такой архив уже загружен.
+
+        Только что загруженные части удаляются. Если хранилище не умеет
+        удалять или удаление не удалось, копия остается в итогах и попадает
+        в историю, чтобы ее нашли правила хранения.
+        """
+        for target_id, refs in list(run.remote_refs.items()):
+            if not self.db.is_file_uploaded(run.file_hash, target_id, run.hash_algorithm):
+                continue
+            connector = connectors[target_id]
+            if not connector.SUPPORTS_DELETE:
+                continue
+            errors = [message for success, message in map(connector.delete_file, refs) if not success]
+            if errors:
+                self._log(f"Не удалось удалить повторную копию из {connector.name}: {errors[0]}")
+                continue
+            del run.remote_refs[target_id]
+            self._log(f"Файл уже загружен в {connector.name}, повторная копия удалена")
+
+    def _make_record(
+        self, file_path: str, file_hash: str, file_size: int, remote_refs: dict[str, list[str]],
+        backup_point_id: str = "", parent_id: str | None = None, hash_algorithm: str = "md5",
+        part_hashes: list[str] | None = None, archive_parts: list[str] | None = None, part_size: int = 0,
+    ) -> FileRecord:
+        """Собрать запись истории о загруженном файле."""
+        return FileRecord(
+            backup_point_id=backup_point_id, file_path=file_path, file_hash=file_hash,
+            file_size=file_size, hash_algorithm=hash_algorithm, targets=list(remote_refs),
+            archive_parts=archive_parts or [], part_hashes=part_hashes or [], part_size=part_size,
+            remote_refs=remote_refs, parent_id=parent_id,
         )
-        self.db.add_file_record(record)
 
     def _log(self, message: str):
         """Вывести сообщение в лог."""
@@ -219,7 +426,6 @@ class BackupTab(ctk.CTkFrame):
 
     def _get_timestamp(self):
         """Получить текущее время."""
-        from datetime import datetime
         return datetime.now().strftime("%H:%M:%S")
 
     def _refresh_backup_points_combo(self):
@@ -232,5 +438,6 @@ class BackupTab(ctk.CTkFrame):
     def _clear_form(self):
         """Очистить форму."""
         self.entry_source.delete(0, "end")
+        self._set_retention_entries(RetentionPolicy())
         for conn, checkbox, var in self.checkbox_targets:
             var.set(False)
@@ -5,13 +5,7 @@ from tkinter import messagebox
 
 from ...core.database import Database
 from ...models import ConnectionConfig, ConnectionType
-from ...connectors.local import LocalConnector
-from ...connectors.telegram import TelegramConnector
-from ...connectors.ftp import FTPConnector
-from ...connectors.ssh import SSHConnector
-from ...connectors.s3 import S3Connector
-from ...connectors.google_drive import GoogleDriveConnector
-from ...connectors.email import EmailConnector
+from ...connectors.factory import create_connector
 
 
 class ConnectionsTab(ctk.CTkFrame):
@@ -145,20 +139,7 @@ class ConnectionsTab(ctk.CTkFrame):
 
     def _create_connector(self, conn: ConnectionConfig):
         """Создать экземпляр коннектора."""
-        type_map = {
-            ConnectionType.LOCAL: LocalConnector,
-            ConnectionType.TELEGRAM: TelegramConnector,
-            ConnectionType.FTP: FTPConnector,
-            ConnectionType.SSH: SSHConnector,
-            ConnectionType.S3: S3Connector,
-            ConnectionType.R2: S3Connector,
-            ConnectionType.GOOGLE_DRIVE: GoogleDriveConnector,
-            ConnectionType.EMAIL: EmailConnector,
-        }
-        cls = type_map.get(conn.type)
-        if cls:
-            return cls(conn.config)
-        return None
+        return create_connector(conn)
 
     def _delete_connection(self):
         """Удалить выбранное подключение."""
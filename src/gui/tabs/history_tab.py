@@ -5,16 +5,24 @@ from tkinter import messagebox
 
 from ...core.database import Database
 from ...core.archive_utils import ArchiveUtils
+from ...models import HistoryFilter
 
 
 class HistoryTab(ctk.CTkFrame):
     """Вкладка для просмотра истории бэкапов."""
 
+    PAGE_SIZE = 50
+    COUNT_LIMIT = 10000  # Больше записей по поиску не считаем, показываем "N+"
+    SEARCH_DELAY_MS = 300  # Поиск запускается, когда ввод затих на это время
+
     def __init__(self, parent, db: Database):
         """Инициализация."""
         super().__init__(parent)
         self.db = db
         self.records = []
+        self.filters = HistoryFilter()
+        self.next_cursor = None
+        self._search_job = None
 
         self._create_ui()
 
@@ -43,6 +51,9 @@ class HistoryTab(ctk.CTkFrame):
 
         ctk.CTkButton(frame, text="Обновить", command=self.refresh_history).pack(side="left", padx=10)
 
+        self.label_count = ctk.CTkLabel(frame, text="")
+        self.label_count.pack(side="left", padx=10)
+
     def _create_table(self):
         """Создать таблицу истории."""
         frame = ctk.CTkFrame(self)
@@ -59,36 +70,41 @@ class HistoryTab(ctk.CTkFrame):
         self.list_frame = ctk.CTkScrollableFrame(frame)
         self.list_frame.grid(row=1, column=0, columnspan=len(headers), padx=2, pady=5, sticky="nsew")
 
+        self.btn_more = ctk.CTkButton(frame, text="Показать еще", command=self._load_more)
+        self.btn_more.grid(row=2, column=0, columnspan=len(headers), padx=2, pady=5)
+
         frame.grid_rowconfigure(1, weight=1)
         frame.grid_columnconfigure(0, weight=1)
 
         self.labels = []
 
     def refresh_history(self):
-        """Обновить историю."""
-        self.records = []
-        for point in self.db.get_all_backup_points():
-            point_records = self.db.get_files_by_backup_point(point.id)
-            self.records.extend(point_records)
+        """Обновить историю: первая страница и общее число записей по фильтру."""
+        self.records, self.next_cursor = self.db.query_history(self.filters, limit=self.PAGE_SIZE)
+        count = self.db.count_history(self.filters, limit=self.COUNT_LIMIT + 1)
+        count_text = f"{self.COUNT_LIMIT}+" if count > self.COUNT_LIMIT else str(count)
+        self.label_count.configure(text=f"Записей: {count_text}")
+        self._update_list()
 
+    def _load_more(self):
+        """Догрузить следующую страницу."""
+        if self.next_cursor is None:
+            return
+        page, self.next_cursor = self.db.query_history(self.filters, self.next_cursor, self.PAGE_SIZE)
+        self.records.extend(page)
         self._update_list()
 
-    def _update_list(self, filter_text: str = ""):
+    def _update_list(self):
         """Обновить отображение списка."""
         # Очищаем старые
         for label in self.labels:
             label.destroy()
 
         self.labels = []
-
-        # Фильтруем
-        filtered = self.records
-        if filter_text:
-            filter_lower = filter_text.lower()
-            filtered = [r for r in filtered if filter_lower in r.file_path.lower()]
+        self.btn_more.configure(state="normal" if self.next_cursor else "disabled")
 
         # Добавляем
-        for i, record in enumerate(filtered[:50]):  # Ограничиваем 50 записями
+        for i, record in enumerate(self.records):
             # Имя файла
             name_label = ctk.CTkLabel(self.list_frame, text=record.file_path)
             name_label.grid(row=i, column=0, padx=2, pady=2, sticky="w")
@@ -105,7 +121,6 @@ class HistoryTab(ctk.CTkFrame):
             self.labels.append(hash_label)
 
             # Дата
-            from datetime import datetime
             date_label = ctk.CTkLabel(self.list_frame, text=record.uploaded_at.strftime("%Y-%m-%d %H:%M"))
             date_label.grid(row=i, column=3, padx=2, pady=2, sticky="w")
             self.labels.append(date_label)
@@ -119,5 +134,17 @@ class HistoryTab(ctk.CTkFrame):
             self.labels.append(targets_label)
 
     def _on_search(self, event):
-        """При изменении поиска."""
-        self._update_list(self.entry_search.get())
+        """При изменении поиска: запрос уходит после паузы в вводе, а не на каждую клавишу."""
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(self.SEARCH_DELAY_MS, self._apply_search)
+
+    def _apply_search(self):
+        """Применить строку поиска."""
+        self._search_job = None
+        text = self.entry_search.get().strip()
+        # Стрелки и Shift тоже вызывают KeyRelease, текст при этом не меняется
+        if text == self.filters.path_contains:
+            return
+        self.filters.path_contains = text
+        self.refresh_history()
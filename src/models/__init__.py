@@ -1,8 +1,23 @@
 """Модели данных приложения."""
 
+from .archive_member import ArchiveMember
 from .backup_point import BackupPoint
+from .backup_run import BackupRun
 from .connection_config import ConnectionConfig
 from .connection_type import ConnectionType
 from .file_record import FileRecord
+from .history_filter import HistoryFilter
+from .manifest_entry import ManifestEntry
+from .retention_policy import RetentionPolicy
 
-__all__ = ["BackupPoint", "ConnectionConfig", "ConnectionType", "FileRecord"]
+__all__ = [
+    "ArchiveMember",
+    "BackupPoint",
+    "BackupRun",
+    "ConnectionConfig",
+    "ConnectionType",
+    "FileRecord",
+    "HistoryFilter",
+    "ManifestEntry",
+    "RetentionPolicy",
+]
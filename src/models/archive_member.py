@@ -0,0 +1,51 @@
+"""Модель записи каталога архива."""
+
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class ArchiveMember:
+    """
+    Файл внутри ZIP архива и место его локального заголовка.
+
+    part_index и part_offset указывают часть архива и смещение заголовка в
+    ней, поэтому для восстановления одного файла достаточно прочитать
+    compressed_size байт после заголовка, не скачивая весь архив.
+    """
+
+    name: str
+    size: int
+    compressed_size: int
+    crc: int
+    compress_type: int
+    part_index: int = 0
+    part_offset: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        """Сериализация в словарь."""
+        return {
+            "name": self.name,
+            "size": self.size,
+            "compressed_size": self.compressed_size,
+            "crc": self.crc,
+            "compress_type": self.compress_type,
+            "part_index": self.part_index,
+            "part_offset": self.part_offset,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ArchiveMember":
+        """Десериализация из словаря."""
+        return cls(
+            name=data["name"],
+            size=data["size"],
+            compressed_size=data["compressed_size"],
+            crc=data["crc"],
+            compress_type=data["compress_type"],
+            part_index=data.get("part_index", 0),
+            part_offset=data.get("part_offset", 0),
+        )
+
+    def __str__(self) -> str:
+        return f"{self.name} (часть {self.part_index + 1}, смещение {self.part_offset})"
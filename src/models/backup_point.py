@@ -5,6 +5,8 @@ from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Any
 
+from .retention_policy import RetentionPolicy
+
 
 @dataclass
 class BackupPoint:
@@ -18,6 +20,9 @@ class BackupPoint:
     schedule: str | None = None
     exclude_patterns: list[str] = field(default_factory=list)
     compression_level: int = 6
+    incremental: bool = False
+    archive_format: str = "zip"
+    retention: RetentionPolicy = field(default_factory=RetentionPolicy)
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
     created_at: datetime = field(default_factory=datetime.now)
     last_run: datetime | None = None
@@ -32,6 +37,9 @@ class BackupPoint:
             "schedule": self.schedule,
             "exclude_patterns": self.exclude_patterns,
             "compression_level": self.compression_level,
+            "incremental": self.incremental,
+            "archive_format": self.archive_format,
+            "retention": self.retention.to_dict(),
             "created_at": self.created_at.isoformat(),
             "last_run": self.last_run.isoformat() if self.last_run else None,
         }
@@ -47,6 +55,9 @@ class BackupPoint:
             schedule=data.get("schedule"),
             exclude_patterns=data.get("exclude_patterns", []),
             compression_level=data.get("compression_level", 6),
+            incremental=data.get("incremental", False),
+            archive_format=data.get("archive_format", "zip"),
+            retention=RetentionPolicy.from_dict(data.get("retention", {})),
             created_at=datetime.fromisoformat(data["created_at"]),
             last_run=datetime.fromisoformat(data["last_run"]) if data.get("last_run") else None,
         )
@@ -0,0 +1,87 @@
+"""Модель записи журнала запусков бэкапа."""
+
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+# Этапы запуска. wait - запись архива стояла, потому что загрузка не успевала.
+# Загрузка считается отдельно по каждому хранилищу
+STAGES = ("scan", "compress", "hash", "split", "wait")
+UPLOAD_STAGE = "upload"
+
+
+@dataclass
+class BackupRun:
+    """
+    Один запуск бэкапа: длительность этапов, объемы и ошибки.
+
+    stages - секунды по этапам из STAGES, uploads - секунды загрузки
+    по хранилищам. Ключ ошибки - этап или "upload:<ID хранилища>".
+    """
+
+    backup_point_id: str
+    record_id: str | None = None
+    stages: dict[str, float] = field(default_factory=dict)
+    uploads: dict[str, float] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
+    bytes_in: int = 0  # Исходные байты файлов
+    bytes_out: int = 0  # Размер архива
+    file_count: int = 0
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    started_at: datetime = field(default_factory=datetime.now)
+    finished_at: datetime | None = None
+
+    @property
+    def compression_ratio(self) -> float:
+        """Во сколько раз архив меньше исходных файлов (0 - нечего сравнивать)."""
+        return self.bytes_in / self.bytes_out if self.bytes_out else 0.0
+
+    @property
+    def duration(self) -> float:
+        """Длительность запуска в секундах."""
+        if self.finished_at is None:
+            return 0.0
+        return (self.finished_at - self.started_at).total_seconds()
+
+    @property
+    def success(self) -> bool:
+        return not self.errors
+
+    def to_dict(self) -> dict[str, Any]:
+        """Сериализация в словарь."""
+        return {
+            "id": self.id,
+            "backup_point_id": self.backup_point_id,
+            "record_id": self.record_id,
+            "stages": self.stages,
+            "uploads": self.uploads,
+            "errors": self.errors,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "file_count": self.file_count,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "BackupRun":
+        """Десериализация из словаря."""
+        return cls(
+            id=data["id"],
+            backup_point_id=data["backup_point_id"],
+            record_id=data.get("record_id"),
+            stages=data.get("stages", {}),
+            uploads=data.get("uploads", {}),
+            errors=data.get("errors", {}),
+            bytes_in=data.get("bytes_in", 0),
+            bytes_out=data.get("bytes_out", 0),
+            file_count=data.get("file_count", 0),
+            started_at=datetime.fromisoformat(data["started_at"]),
+            finished_at=datetime.fromisoformat(data["finished_at"]) if data.get("finished_at") else None,
+        )
+
+    def __str__(self) -> str:
+        stages = ", ".join(f"{stage} {seconds:.1f}с" for stage, seconds in self.stages.items())
+        uploads = ", ".join(f"{target} {seconds:.1f}с" for target, seconds in self.uploads.items())
+        return f"Этапы: {stages or '-'}; загрузка: {uploads or '-'}; сжатие x{self.compression_ratio:.2f}"
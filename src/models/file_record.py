@@ -16,8 +16,13 @@ class FileRecord:
     file_path: str
     file_hash: str
     file_size: int
+    hash_algorithm: str = "md5"
     targets: list[str] = field(default_factory=list)
     archive_parts: list[str] = field(default_factory=list)
+    part_hashes: list[str] = field(default_factory=list)
+    part_size: int = 0  # Размер частей при разбиении (0 - архив не разбивался)
+    remote_refs: dict[str, list[str]] = field(default_factory=dict)  # ID хранилища -> ссылки на части по порядку
+    parent_id: str | None = None
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
     uploaded_at: datetime = field(default_factory=datetime.now)
 
@@ -28,10 +33,15 @@ class FileRecord:
             "backup_point_id": self.backup_point_id,
             "file_path": self.file_path,
             "file_hash": self.file_hash,
+            "hash_algorithm": self.hash_algorithm,
             "file_size": self.file_size,
             "uploaded_at": self.uploaded_at.isoformat(),
             "targets": self.targets,
             "archive_parts": self.archive_parts,
+            "part_hashes": self.part_hashes,
+            "part_size": self.part_size,
+            "remote_refs": self.remote_refs,
+            "parent_id": self.parent_id,
         }
 
     @classmethod
@@ -42,16 +52,26 @@ class FileRecord:
             backup_point_id=data["backup_point_id"],
             file_path=data["file_path"],
             file_hash=data["file_hash"],
+            hash_algorithm=data.get("hash_algorithm", "md5"),
             file_size=data["file_size"],
             uploaded_at=datetime.fromisoformat(data["uploaded_at"]),
             targets=data.get("targets", []),
             archive_parts=data.get("archive_parts", []),
+            part_hashes=data.get("part_hashes", []),
+            part_size=data.get("part_size", 0),
+            remote_refs=data.get("remote_refs", {}),
+            parent_id=data.get("parent_id"),
         )
 
     def is_uploaded_to(self, target_id: str) -> bool:
         """Проверка, загружен ли файл в указанное хранилище."""
         return target_id in self.targets
 
+    @property
+    def is_incremental(self) -> bool:
+        """Инкремент поверх предыдущей записи (а не полный бэкап)."""
+        return self.parent_id is not None
+
     def add_target(self, target_id: str):
         """Добавить хранилище, куда загружен файл."""
         if target_id not in self.targets:
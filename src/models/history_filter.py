@@ -0,0 +1,39 @@
+"""Модель фильтра истории бэкапов."""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+
+@dataclass
+class HistoryFilter:
+    """
+    Условия выборки записей истории. Пустое поле не ограничивает выборку.
+    """
+
+    backup_point_id: str | None = None  # "" - записи без точки бэкапа
+    target_id: str | None = None
+    path_contains: str = ""  # Подстрока пути архива или имени файла в нем
+    uploaded_from: datetime | None = None
+    uploaded_to: datetime | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        """Сериализация в словарь."""
+        return {
+            "backup_point_id": self.backup_point_id,
+            "target_id": self.target_id,
+            "path_contains": self.path_contains,
+            "uploaded_from": self.uploaded_from.isoformat() if self.uploaded_from else None,
+            "uploaded_to": self.uploaded_to.isoformat() if self.uploaded_to else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "HistoryFilter":
+        """Десериализация из словаря."""
+        return cls(
+            backup_point_id=data.get("backup_point_id"),
+            target_id=data.get("target_id"),
+            path_contains=data.get("path_contains", ""),
+            uploaded_from=datetime.fromisoformat(data["uploaded_from"]) if data.get("uploaded_from") else None,
+            uploaded_to=datetime.fromisoformat(data["uploaded_to"]) if data.get("uploaded_to") else None,
+        )
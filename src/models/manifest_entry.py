@@ -0,0 +1,45 @@
+"""Модель записи манифеста инкрементального бэкапа."""
+
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class ManifestEntry:
+    """
+    Метаданные файла на момент последнего бэкапа точки.
+    """
+
+    rel_path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    content_hash: str
+
+    def same_metadata(self, size: int, mtime_ns: int, inode: int) -> bool:
+        """Проверка, что метаданные файла не менялись."""
+        return self.size == size and self.mtime_ns == mtime_ns and self.inode == inode
+
+    def to_dict(self) -> dict[str, Any]:
+        """Сериализация в словарь."""
+        return {
+            "rel_path": self.rel_path,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "inode": self.inode,
+            "content_hash": self.content_hash,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ManifestEntry":
+        """Десериализация из словаря."""
+        return cls(
+            rel_path=data["rel_path"],
+            size=data["size"],
+            mtime_ns=data["mtime_ns"],
+            inode=data["inode"],
+            content_hash=data["content_hash"],
+        )
+
+    def __str__(self) -> str:
+        return f"{self.rel_path} ({self.content_hash[:8]}...)"
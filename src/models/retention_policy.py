@@ -0,0 +1,52 @@
+"""Модель правил хранения бэкапов."""
+
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    Сколько бэкапов точки хранить. Ноль отключает правило.
+
+    Запись остается, если ее оставляет хотя бы одно правило: она среди
+    keep_last последних или самая новая в одном из keep_daily последних
+    дней (недель, месяцев) с бэкапами.
+    """
+
+    keep_last: int = 0
+    keep_daily: int = 0
+    keep_weekly: int = 0
+    keep_monthly: int = 0
+
+    @property
+    def is_enabled(self) -> bool:
+        """Задано хотя бы одно правило (иначе хранится все)."""
+        return any((self.keep_last, self.keep_daily, self.keep_weekly, self.keep_monthly))
+
+    def to_dict(self) -> dict[str, Any]:
+        """Сериализация в словарь."""
+        return {
+            "keep_last": self.keep_last,
+            "keep_daily": self.keep_daily,
+            "keep_weekly": self.keep_weekly,
+            "keep_monthly": self.keep_monthly,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "RetentionPolicy":
+        """Десериализация из словаря."""
+        return cls(
+            keep_last=data.get("keep_last", 0),
+            keep_daily=data.get("keep_daily", 0),
+            keep_weekly=data.get("keep_weekly", 0),
+            keep_monthly=data.get("keep_monthly", 0),
+        )
+
+    def __str__(self) -> str:
+        if not self.is_enabled:
+            return "хранить все"
+        return (
+            f"последних {self.keep_last}, дней {self.keep_daily}, "
+            f"недель {self.keep_weekly}, месяцев {self.keep_monthly}"
+        )